@@ -0,0 +1,172 @@
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+
+class FrameSet:
+    """
+    A set of frame numbers kept as sorted, inclusive (start, end) runs
+
+    Memory grows with the number of gaps rather than the number of frames, a
+    million frame sequence without gaps is a single run. Membership is a binary
+    search and set operations and offsets work run by run.
+    """
+
+    __slots__ = ("_runs",)
+
+    def __init__(self, frames: Iterable[int] = ()):
+        runs: List[int] = []
+        for frame in sorted(frames):
+            if runs and frame <= runs[-1] + 1:
+                if frame > runs[-1]:
+                    runs[-1] = frame
+            else:
+                runs.extend((frame, frame))
+        # Flattened start, end, start, end...
+        self._runs = array("q", runs)
+
+    @classmethod
+    def from_runs(cls, runs: Iterable[int]) -> "FrameSet":
+        """
+        Create a frame set from flattened (start, end) runs
+        The runs must be sorted and must neither overlap nor touch, as returned by runs.
+        """
+        frame_set = cls.__new__(cls)
+        frame_set._runs = array("q", runs)
+        if len(frame_set._runs) % 2:
+            raise ValueError("Runs need an end for every start")
+        return frame_set
+
+    @classmethod
+    def from_sorted(cls, frames: Sequence[int]) -> "FrameSet":
+        """
+        Create a frame set from strictly increasing frame numbers
+        A slice of them is a single run when its last frame minus its first equals its
+        length minus one, so slices are halved only until they pass that test. The work
+        grows with the number of gaps rather than the number of frames.
+        """
+        runs: List[int] = []
+        # Inclusive index ranges, the left half is popped first to keep the runs in order
+        pending = [(0, len(frames) - 1)] if frames else []
+        while pending:
+            low, high = pending.pop()
+            if frames[high] - frames[low] == high - low:
+                if runs and frames[low] == runs[-1] + 1:
+                    runs[-1] = frames[high]
+                else:
+                    runs += (frames[low], frames[high])
+            else:
+                middle = (low + high) // 2
+                pending += ((middle + 1, high), (low, middle))
+        return cls.from_runs(runs)
+
+    @classmethod
+    def from_range(cls, first: int, last: int) -> "FrameSet":
+        """Create the frame set of first to last inclusive, empty if last is before first"""
+        return cls.from_runs((first, last) if last >= first else ())
+
+    @property
+    def runs(self) -> List[int]:
+        """Get the flattened (start, end) runs"""
+        return self._runs.tolist()
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        """Get the inclusive (start, end) runs"""
+        runs = self._runs
+        return list(zip(runs[::2], runs[1::2]))
+
+    @property
+    def first(self) -> int:
+        if not self._runs:
+            raise ValueError("An empty frame set has no first frame")
+        return self._runs[0]
+
+    @property
+    def last(self) -> int:
+        if not self._runs:
+            raise ValueError("An empty frame set has no last frame")
+        return self._runs[-1]
+
+    @property
+    def span(self) -> int:
+        """Get the number of frames from the first to the last, gaps included"""
+        return self._runs[-1] + 1 - self._runs[0] if self._runs else 0
+
+    @property
+    def missing(self) -> int:
+        """Get the number of frames missing between the first and the last frame"""
+        return self.span - len(self)
+
+    def gaps(self) -> "FrameSet":
+        """Get the frames missing between the first and the last frame"""
+        runs = self._runs
+        return FrameSet.from_runs(
+            frame for end, start in zip(runs[1:-1:2], runs[2::2]) for frame in (end + 1, start - 1)
+        )
+
+    def offset(self, offset: int) -> "FrameSet":
+        """Get the frame set with every frame moved by offset"""
+        return FrameSet.from_runs(frame + offset for frame in self._runs)
+
+    def __len__(self) -> int:
+        runs = self._runs
+        if len(runs) == 2:
+            return runs[1] + 1 - runs[0]
+        return sum(runs[1::2]) - sum(runs[::2]) + len(runs) // 2
+
+    def __bool__(self) -> bool:
+        return bool(self._runs)
+
+    def __iter__(self) -> Iterator[int]:
+        runs = self._runs
+        for i in range(0, len(runs), 2):
+            yield from range(runs[i], runs[i + 1] + 1)
+
+    def __contains__(self, frame: object) -> bool:
+        if not isinstance(frame, int):
+            return False
+        # Odd when frame is past a start but before its end, else it may still be an end
+        i = bisect_right(self._runs, frame)
+        return i % 2 == 1 or (i > 0 and self._runs[i - 1] == frame)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, FrameSet):
+            return NotImplemented
+        return self._runs == other._runs
+
+    __hash__ = None  # type: ignore
+
+    def __or__(self, other: "FrameSet") -> "FrameSet":
+        """Union, merging overlapping and touching runs"""
+        merged: List[int] = []
+        for start, end in sorted(self.ranges() + other.ranges()):
+            if merged and start <= merged[-1] + 1:
+                merged[-1] = max(merged[-1], end)
+            else:
+                merged.extend((start, end))
+        return FrameSet.from_runs(merged)
+
+    def __and__(self, other: "FrameSet") -> "FrameSet":
+        """Intersection, walking both run lists once"""
+        ours, theirs = self.ranges(), other.ranges()
+        common: List[int] = []
+        i = j = 0
+        while i < len(ours) and j < len(theirs):
+            start = max(ours[i][0], theirs[j][0])
+            end = min(ours[i][1], theirs[j][1])
+            if start <= end:
+                common.extend((start, end))
+            if ours[i][1] < theirs[j][1]:
+                i += 1
+            else:
+                j += 1
+        return FrameSet.from_runs(common)
+
+    def __str__(self) -> str:
+        """Format as comma separated runs, e.g. 1001-1010,1012,1015-1020"""
+        return ",".join(
+            str(start) if start == end else f"{start}-{end}" for start, end in self.ranges()
+        )
+
+    def __repr__(self) -> str:
+        return f"FrameSet({str(self)!r})"
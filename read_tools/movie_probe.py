@@ -0,0 +1,239 @@
+"""
+Frame count, frame rate and start timecode of QuickTime and MP4 movies, read from their atoms
+
+Only atom headers are read on the way to the moov atom, wherever it is in the file,
+then the moov atom itself, which holds the timing of every track. The first sample
+of a timecode track is the only other read. Nothing is decoded, so probing a movie
+costs a few small reads however long it is, and no Read node is needed.
+"""
+import os
+import struct
+from dataclasses import dataclass
+from typing import IO, Iterator, Optional, Tuple
+
+# Extensions probe_movie parses, lowercase
+PROBE_EXTENSIONS = frozenset({"mov", "mp4", "m4v"})
+# Nuke numbers the frames of a movie from 1
+MOVIE_FIRST_FRAME = 1
+# The moov atom grows with the sample tables, a few MB for hours of video
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+
+# Atoms a movie file may start with, anything else isn't a QuickTime or MP4 file
+TOP_LEVEL_ATOMS = frozenset(
+    {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot", b"uuid"}
+)
+# tmcd sample description flags
+TMCD_DROP_FRAME = 0x1
+TMCD_COUNTER = 0x8
+
+# Inclusive start, exclusive end of an atom's payload within the moov data
+_Span = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class MovieInfo:
+    """
+    What a movie's atoms say about its video
+    Attributes:
+        frame_count: Number of video frames
+        frame_rate: Frames per second of the video track, the most common frame duration
+        timecode: Start timecode of the timecode track, e.g. 01:00:00:00, None if there is none
+    """
+    frame_count: int
+    frame_rate: float
+    timecode: Optional[str] = None
+
+    def to_json(self) -> list:
+        return [self.frame_count, self.frame_rate, self.timecode]
+
+    @classmethod
+    def from_json(cls, data: list) -> "MovieInfo":
+        frame_count, frame_rate, timecode = data
+        return cls(frame_count, frame_rate, timecode)
+
+    @property
+    def frame_range(self) -> Tuple[int, int]:
+        """Get the first and last frame, as a Read node numbers them"""
+        return MOVIE_FIRST_FRAME, MOVIE_FIRST_FRAME + self.frame_count - 1
+
+
+@dataclass
+class _Track:
+    handler: bytes
+    timescale: int
+    sample_count: int
+    sample_delta: int
+    # Payload of the first sample description, its format first
+    description: bytes
+    first_chunk: Optional[int]
+
+
+def _atoms(data: bytes, span: _Span) -> Iterator[Tuple[bytes, _Span]]:
+    """Yield the type and payload of every atom within span"""
+    offset, end = span
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", data, offset + 8)
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise ValueError(f"Bad size of the {kind!r} atom")
+        yield kind, (offset + header, offset + size)
+        offset += size
+
+
+def _child(data: bytes, span: Optional[_Span], kind: bytes) -> Optional[_Span]:
+    """Get the payload of the first atom of a kind within span"""
+    if span is None:
+        return None
+    return next((child for child_kind, child in _atoms(data, span) if child_kind == kind), None)
+
+
+def _read_moov(f: IO[bytes]) -> bytes:
+    """Walk the top level atoms of a file and read the payload of its moov atom"""
+    file_size = os.fstat(f.fileno()).st_size
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        head = f.read(16)
+        size, kind = struct.unpack_from(">I4s", head)
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", head, 8)
+            header = 16
+        elif size == 0:
+            size = file_size - offset
+        if offset == 0 and kind not in TOP_LEVEL_ATOMS:
+            raise ValueError("Not a QuickTime or MP4 file")
+        if size < header:
+            raise ValueError(f"Bad size of the {kind!r} atom")
+        if kind == b"moov":
+            if size > MAX_MOOV_BYTES:
+                raise ValueError("moov atom too large")
+            f.seek(offset + header)
+            data = f.read(size - header)
+            if len(data) < size - header:
+                raise ValueError("Truncated moov atom")
+            return data
+        offset += size
+    raise ValueError("No moov atom, the movie may still be written")
+
+
+def _track(data: bytes, trak: _Span) -> Optional[_Track]:
+    """Read the handler, time scale and sample timing of a trak atom"""
+    mdia = _child(data, trak, b"mdia")
+    hdlr = _child(data, mdia, b"hdlr")
+    mdhd = _child(data, mdia, b"mdhd")
+    stbl = _child(data, _child(data, mdia, b"minf"), b"stbl")
+    if hdlr is None or mdhd is None or stbl is None:
+        return None
+    # Version and flags, then the component type of QuickTime, zero in MP4
+    handler = data[hdlr[0] + 8 : hdlr[0] + 12]
+    # Version 1 has 64-bit creation and modification times
+    timescale_offset = 20 if data[mdhd[0]] == 1 else 12
+    (timescale,) = struct.unpack_from(">I", data, mdhd[0] + timescale_offset)
+
+    sample_count = sample_delta = 0
+    stts = _child(data, stbl, b"stts")
+    if stts is not None:
+        (entries,) = struct.unpack_from(">I", data, stts[0] + 4)
+        most = 0
+        for i in range(entries):
+            count, delta = struct.unpack_from(">II", data, stts[0] + 8 + i * 8)
+            sample_count += count
+            if count > most:
+                most, sample_delta = count, delta
+
+    description = b""
+    stsd = _child(data, stbl, b"stsd")
+    if stsd is not None:
+        # Skip the version, flags and entry count, then the entry's size
+        (size,) = struct.unpack_from(">I", data, stsd[0] + 8)
+        description = data[stsd[0] + 12 : stsd[0] + 8 + size]
+
+    first_chunk = None
+    stco = _child(data, stbl, b"stco")
+    co64 = _child(data, stbl, b"co64")
+    if stco is not None and struct.unpack_from(">I", data, stco[0] + 4)[0]:
+        (first_chunk,) = struct.unpack_from(">I", data, stco[0] + 8)
+    elif co64 is not None and struct.unpack_from(">I", data, co64[0] + 4)[0]:
+        (first_chunk,) = struct.unpack_from(">Q", data, co64[0] + 8)
+    return _Track(handler, timescale, sample_count, sample_delta, description, first_chunk)
+
+
+def format_timecode(frame: int, frames_per_second: int, drop_frame: bool = False) -> str:
+    """
+    Format a frame count as a timecode, e.g. 01:00:00:00
+    Drop frame timecodes skip the first frame numbers of every minute but every tenth,
+    two of them at 30 fps, and separate the frames with a semicolon.
+    """
+    if drop_frame and frames_per_second % 30 == 0:
+        dropped = frames_per_second // 15
+        per_minute = frames_per_second * 60 - dropped
+        per_ten_minutes = per_minute * 10 + dropped
+        tens, rest = divmod(frame, per_ten_minutes)
+        frame += dropped * 9 * tens
+        if rest > dropped:
+            frame += dropped * ((rest - dropped) // per_minute)
+    else:
+        drop_frame = False
+    seconds, frames = divmod(frame, frames_per_second)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    separator = ";" if drop_frame else ":"
+    return f"{hours % 24:02d}:{minutes:02d}:{seconds:02d}{separator}{frames:02d}"
+
+
+def _timecode(f: IO[bytes], track: _Track) -> Optional[str]:
+    """Read the start timecode from the first sample of a tmcd track"""
+    description = track.description
+    if description[:4] != b"tmcd" or len(description) < 29 or track.first_chunk is None:
+        return None
+    # Format, six reserved bytes and the data reference index come first
+    flags, _, _, frames_per_second = struct.unpack_from(">IIIB", description, 16)
+    if flags & TMCD_COUNTER or not frames_per_second:
+        return None
+    f.seek(track.first_chunk)
+    sample = f.read(4)
+    if len(sample) < 4:
+        return None
+    (frame,) = struct.unpack(">I", sample)
+    return format_timecode(frame, frames_per_second, bool(flags & TMCD_DROP_FRAME))
+
+
+def probe_movie(path: str) -> Optional[MovieInfo]:
+    """
+    Read the frame count, frame rate and start timecode of a movie
+    Returns None if its extension has no parser.
+    Raises OSError if the file can't be read and ValueError if it isn't a movie with
+    a video track, or one whose samples are all in fragments.
+    """
+    if path.rsplit(".", 1)[-1].lower() not in PROBE_EXTENSIONS:
+        return None
+    with open(path, "rb") as f:
+        try:
+            data = _read_moov(f)
+            traks = [trak for kind, trak in _atoms(data, (0, len(data))) if kind == b"trak"]
+            tracks = [_track(data, trak) for trak in traks]
+        except struct.error:
+            raise ValueError("Truncated atom") from None
+        video = next((track for track in tracks if track and track.handler == b"vide"), None)
+        if video is None:
+            raise ValueError("No video track")
+        if not video.sample_count or not video.sample_delta:
+            raise ValueError("No video samples in the moov atom")
+        timecode = None
+        for track in tracks:
+            if track and track.handler == b"tmcd":
+                timecode = _timecode(f, track)
+                break
+    frame_rate = round(video.timescale / video.sample_delta, 3)
+    return MovieInfo(video.sample_count, frame_rate, timecode)
+
+
+def format_frame_rate(frame_rate: float) -> str:
+    """Format a frame rate without trailing zeros, e.g. 23.976 fps or 25 fps"""
+    return f"{frame_rate:.3f}".rstrip("0").rstrip(".") + " fps"
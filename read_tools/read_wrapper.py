@@ -1,11 +1,18 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Union
 
-import nuke
+try:
+    import nuke
+except ImportError:  # Outside of Nuke only the file handlers are usable
+    nuke = None
 
-from nhp.pysequitur.file_sequence import FileSequence, SequenceFactory, Components
+from nhp.pysequitur.file_sequence import FileSequence, SequenceFactory, Components, Item
 from nhp.pysequitur.file_types import MOVIE_FILE_TYPES
+from nhp.read_tools.frame_set import FrameSet
+from nhp.read_tools.movie_probe import MovieInfo, probe_movie
 
 from enum import Enum, auto
 
@@ -33,7 +40,7 @@ class ImageFile(ABC):
 
         if extension in MOVIE_FILE_TYPES:
             print("movie file")
-            return MovieFile(Path(path))
+            return MovieFile(Path(path)).probe()
 
         try:
             sequence = SequenceFactory.from_sequence_string_absolute(
@@ -169,6 +176,13 @@ class SequenceFile(ImageFile):
     def last_frame(self) -> int:
         return self.sequence.last_frame
 
+    def existing_frames(self) -> List[int]:
+        return self.sequence.existing_frames
+
+    def frame_set(self) -> FrameSet:
+        """Return the existing frames as runs, gaps included"""
+        return FrameSet(self.sequence.existing_frames)
+
     def folderize(self, folder_name: str, virtual: bool = False) -> "ImageFile":
         if virtual:
             return ImageFile.from_file_sequence(
@@ -250,14 +264,188 @@ class SequenceFile(ImageFile):
     def padding(self) -> int:
         return self.sequence.padding
 
+    @property
+    def frame_texts(self) -> Dict[int, str]:
+        """Get the frame strings that are not the frame zero-padded to padding, by frame"""
+        padding = self.padding
+        return {
+            item.frame_number: item.frame_string
+            for item in self.sequence.items
+            if item.frame_string != str(item.frame_number).zfill(padding)
+        }
+
+
+class LazySequenceFile(SequenceFile):
+    """
+    Handler for a sequence known only by its components and frame numbers
+
+    Nothing is read from disk and the FileSequence, with an Item per frame, is
+    only built once an operation needs it. From then on it is the source of truth.
+    Until then the frames are a FrameSet, which costs memory per gap rather than per frame.
+    Frame strings are rebuilt from padding, except for the listed ones in frame_texts
+    that differ, such as the 1 to 9 of an unpadded sequence.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        prefix: str,
+        delimiter: str,
+        padding: int,
+        suffix: str,
+        extension: str,
+        frames: Union[FrameSet, Iterable[int]],
+        frame_texts: Optional[Dict[int, str]] = None,
+    ):
+        frames = frames if isinstance(frames, FrameSet) else FrameSet(frames)
+        if not frames:
+            raise ValueError("A sequence needs at least one frame")
+        # Shared with the other sequences of the directory rather than copied
+        self._directory = directory if isinstance(directory, Path) else Path(directory)
+        self._prefix = prefix
+        self._delimiter = delimiter
+        self._padding = padding
+        self._suffix = suffix
+        self._extension = extension
+        self._frames = frames
+        self._frame_texts = frame_texts or {}
+        self._sequence: Optional[FileSequence] = None
+
+    def frame_text(self, frame: int) -> str:
+        """Get the frame string of a frame's file name, as it was listed"""
+        text = self._frame_texts.get(frame)
+        return text if text is not None else str(frame).zfill(self._padding)
+
+    def frame_file_name(self, frame: int) -> str:
+        """Get the file name of a frame, as it was listed"""
+        frame_text = self.frame_text(frame)
+        return f"{self._prefix}{self._delimiter}{frame_text}{self._suffix}.{self._extension}"
+
+    @property
+    def sequence(self) -> FileSequence:  # type: ignore
+        if self._sequence is None:
+            self._sequence = FileSequence(
+                [
+                    Item(
+                        self._prefix,
+                        self.frame_text(frame),
+                        self._extension,
+                        self._delimiter,
+                        self._suffix,
+                        self._directory,
+                    )
+                    for frame in self._frames
+                ]
+            )
+        return self._sequence
+
+    @sequence.setter
+    def sequence(self, sequence: FileSequence) -> None:
+        self._sequence = sequence
+
+    def get_path(self) -> Path:
+        if self._sequence is not None:
+            return super().get_path()
+        padding = "#" * self._padding
+        return self._directory / f"{self._prefix}{self._delimiter}{padding}{self._suffix}.{self._extension}"
+
+    def get_user_text(self) -> str:
+        if self._sequence is not None:
+            return super().get_user_text()
+        return f"{self.get_path()} {self.first_frame()}-{self.last_frame()}"
+
+    def first_frame(self) -> int:
+        if self._sequence is not None:
+            return super().first_frame()
+        return self._frames.first
+
+    def last_frame(self) -> int:
+        if self._sequence is not None:
+            return super().last_frame()
+        return self._frames.last
+
+    def existing_frames(self) -> List[int]:
+        if self._sequence is not None:
+            return super().existing_frames()
+        return list(self._frames)
+
+    def frame_set(self) -> FrameSet:
+        if self._sequence is not None:
+            return super().frame_set()
+        return self._frames
+
+    def offset_frames(self, offset: int, node: nuke.Node, virtual: bool = False) -> "ImageFile":  # type: ignore
+        if self._sequence is not None or not virtual:
+            return super().offset_frames(offset, node, virtual=virtual)
+        # A preview only moves the runs, no Item is created
+        if self._frames.first + offset < 0:
+            raise ValueError("offset would yield negative frame numbers")
+        return LazySequenceFile(
+            self._directory,
+            self._prefix,
+            self._delimiter,
+            max(self._padding, len(str(self._frames.last + offset))),
+            self._suffix,
+            self._extension,
+            self._frames.offset(offset),
+        )
+
+    @property
+    def directory(self) -> Path:
+        if self._sequence is not None:
+            return super().directory
+        return self._directory
+
+    @property
+    def name(self) -> str:
+        if self._sequence is not None:
+            return super().name
+        return self._prefix
+
+    @property
+    def extension(self) -> str:
+        if self._sequence is not None:
+            return super().extension
+        return self._extension
+
+    @property
+    def frame_count(self) -> int:
+        if self._sequence is not None:
+            return super().frame_count
+        return self._frames.span
+
+    @property
+    def suffix(self) -> str | None:
+        if self._sequence is not None:
+            return super().suffix
+        return self._suffix
+
+    @property
+    def delimiter(self) -> str:
+        if self._sequence is not None:
+            return super().delimiter
+        return self._delimiter
+
+    @property
+    def padding(self) -> int:
+        if self._sequence is not None:
+            return super().padding
+        return self._padding
+
+    @property
+    def frame_texts(self) -> Dict[int, str]:
+        if self._sequence is not None:
+            return super().frame_texts
+        return self._frame_texts
+
 
 class SingleFile(ImageFile):
     """Handler for single image files"""
 
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, check_exists: bool = True):
         print("init single file")
         self.path = path
-        if not path.exists():
+        if check_exists and not path.exists():
             raise ValueError(f"File {path} does not exist")
 
     def get_path(self) -> Path:
@@ -363,11 +551,13 @@ class SingleFile(ImageFile):
 class MovieFile(SingleFile):
     """Handler for movie files that have multiple frames"""
 
-    def __init__(self, path: Path):
-        super().__init__(path)
+    def __init__(self, path: Path, check_exists: bool = True):
+        super().__init__(path, check_exists)
         print("init movie file")
         self._first_frame = 1
-        self._last_frame = -1  # Will be updated by ReadWrapper
+        self._last_frame = -1  # Will be updated by probe() or ReadWrapper
+        self.frame_rate: Optional[float] = None
+        self.timecode: Optional[str] = None
 
     def get_user_text(self) -> str:
         # For movie files, we return just the path
@@ -385,6 +575,24 @@ class MovieFile(SingleFile):
         self._last_frame = last_frame
         return self
 
+    def set_movie_info(self, info: MovieInfo) -> "MovieFile":
+        """Take the frame range, frame rate and start timecode of a probed movie"""
+        self.set_frame_range(*info.frame_range)
+        self.frame_rate = info.frame_rate
+        self.timecode = info.timecode
+        return self
+
+    def probe(self) -> "MovieFile":
+        """Read the frame range from the movie's atoms, it stays unknown if they can't be read"""
+        try:
+            info = probe_movie(str(self.path))
+        except (OSError, ValueError) as e:
+            print(f"could not probe {self.path}: {e}")
+            return self
+        if info is not None:
+            self.set_movie_info(info)
+        return self
+
     def copy_to(
         self, components: Components, target_dir: Optional[Path], virtual: bool = False
     ) -> "ImageFile":
@@ -401,6 +609,8 @@ class MovieFile(SingleFile):
             shutil.copy2(self.path, new_path)
         new_movie = MovieFile(new_path)
         new_movie.set_frame_range(self._first_frame, self._last_frame)
+        new_movie.frame_rate = self.frame_rate
+        new_movie.timecode = self.timecode
         return new_movie
 
     def offset_frames(self, offset: int, node: nuke.Node, virtual: bool = False) -> "ImageFile":  # type: ignore
@@ -1,3 +1,10 @@
-from .recursive_loader import show
+# Imported lazily so the scanning modules can be used without Qt or nuke
+def __getattr__(name):
+    if name == "show":
+        from .recursive_loader import show
+
+        return show
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["show"]
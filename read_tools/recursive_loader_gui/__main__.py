@@ -0,0 +1,165 @@
+"""
+Headless scanner, usable on farm nodes and in cron jobs
+
+    python -m nhp.read_tools.recursive_loader_gui /show/shots /show/assets
+    python -m nhp.read_tools.recursive_loader_gui /show/shots --format manifest > shots.json
+    python -m nhp.read_tools.recursive_loader_gui /show/shots --manifest shots.json.gz --format none
+
+Only the model layer is imported, neither nuke nor PySide2 are required. Scans
+go through the same persistent index as the loader, so running this ahead of
+time warms the index for artist sessions.
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from nhp.read_tools.recursive_loader_gui import manifest, scan_client, scan_index, scanner
+from nhp.read_tools.recursive_loader_gui.model import (
+    DirectoryTree,
+    Model,
+    format_frame_range,
+    format_header,
+    format_movie,
+)
+from nhp.read_tools.recursive_loader_gui.scanner import ScanOptions
+
+
+def format_tree(node: DirectoryTree, prefix: str = "", is_last: bool = True) -> Iterator[str]:
+    """Yield the lines of a directory tree, drawn like the loader's Tree column"""
+    if node.name:
+        yield f"{prefix}{'└── ' if is_last else '├── '}{node.name}/"
+        prefix += "    " if is_last else "│   "
+
+    subdirs = sorted(node.subdirs, key=lambda x: x.name)
+    for i, subdir in enumerate(subdirs):
+        yield from format_tree(subdir, prefix, i == len(subdirs) - 1 and not node.files)
+
+    for i, file in enumerate(node.files):
+        branch = "└── " if i == len(node.files) - 1 else "├── "
+        line = f"{prefix}{branch}[{file.extension.upper()}] {file.name}  {format_frame_range(file)}"
+        if file.header is not None:
+            line += f"  {format_header(file.header)}"
+        if file.movie is not None:
+            line += f"  {format_movie(file.movie)}"
+        yield line
+
+
+def _split_list(values: Optional[List[str]]) -> List[str]:
+    """Accept both repeated flags and comma separated values"""
+    return [part for value in values or [] for part in value.split(",") if part]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m nhp.read_tools.recursive_loader_gui",
+        description="Scan directories for image sequences without Nuke.",
+    )
+    parser.add_argument("roots", nargs="+", type=Path, help="directories to scan")
+    parser.add_argument(
+        "--format",
+        choices=["tree", "manifest", "none"],
+        default="tree",
+        help="what to print to stdout (default: tree)",
+    )
+    parser.add_argument("--manifest", type=Path, help="write a manifest file, single root only")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=scanner.DEFAULT_MAX_WORKERS,
+        help=f"directories listed at once (default: {scanner.DEFAULT_MAX_WORKERS})",
+    )
+    parser.add_argument("--index", type=Path, help="scan index file (default: user cache)")
+    parser.add_argument("--no-index", action="store_true", help="always list every directory")
+    parser.add_argument(
+        "--daemon", action="store_true", help="ask a running scan daemon first, see scan_daemon"
+    )
+    parser.add_argument("--ext", action="append", help="extensions to keep, e.g. exr,dpx")
+    parser.add_argument("--ignore", action="append", help="directory or file name globs to skip")
+    parser.add_argument("--max-depth", type=int, help="deepest directory level to list")
+    parser.add_argument("--min-frames", type=int, default=1, help="drop shorter sequences")
+    parser.add_argument(
+        "--no-follow-symlinks", action="store_true", help="don't walk into symlinked directories"
+    )
+    parser.add_argument(
+        "--frame-stats", action="store_true", help="stat every frame to find truncated ones"
+    )
+    parser.add_argument(
+        "--headers", action="store_true", help="read resolution and channels from EXR, DPX and TIFF"
+    )
+    parser.add_argument(
+        "--no-movie-probe", action="store_true", help="don't read frame ranges from MOV and MP4"
+    )
+
+    args = parser.parse_args(argv)
+    if args.manifest and len(args.roots) > 1:
+        parser.error("--manifest can only be used with a single root")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    index = None
+    if not args.no_index:
+        index = scan_index.ScanIndex(args.index) if args.index else scan_index.open_default_index()
+
+    extensions = frozenset(e.lstrip(".").lower() for e in _split_list(args.ext))
+    options = ScanOptions(
+        extensions=extensions or None,
+        ignore=tuple(_split_list(args.ignore)),
+        max_depth=args.max_depth,
+        min_frames=args.min_frames,
+        follow_symlinks=not args.no_follow_symlinks,
+        frame_stats=args.frame_stats,
+        read_headers=args.headers,
+        probe_movies=not args.no_movie_probe,
+    )
+
+    status = 0
+    for root in args.roots:
+        if not root.is_dir():
+            print(f"{root} is not a directory", file=sys.stderr)
+            status = 1
+            continue
+
+        daemon_socket = scan_client.default_socket_path() if args.daemon else None
+        model = Model(max_workers=args.workers, index=index, daemon_socket=daemon_socket)
+        start = time.perf_counter()
+        # The file handlers print progress chatter, keep stdout machine readable
+        with contextlib.redirect_stdout(sys.stderr):
+            model.scan_directory(root.resolve(), options=options)
+        elapsed = time.perf_counter() - start
+
+        files = model.get_all_sequences()
+        if args.format == "tree":
+            print(f"{model.current_directory}/")
+            tree = model.build_directory_tree()
+            if tree:
+                for line in format_tree(tree):
+                    print(line)
+        elif args.format == "manifest":
+            data = manifest.build_manifest(model.current_directory, model.directories, files)
+            print(json.dumps(data, separators=(",", ":")))
+
+        if args.manifest:
+            model.save_manifest(args.manifest)
+
+        print(
+            f"{root}: {len(model.directories)} directories, {len(files)} files"
+            f" in {elapsed:.3f}s",
+            file=sys.stderr,
+        )
+        for alias, owner in sorted(model.aliases.items()):
+            print(f"  skipped {alias}, alias of {owner}", file=sys.stderr)
+
+    if index is not None:
+        index.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+Benchmarks of the scanning stages
+
+    python -m nhp.read_tools.recursive_loader_gui.benchmark grouping --frames 1000000
+    python -m nhp.read_tools.recursive_loader_gui.benchmark grouping --directory /show/renders/flat
+    python -m nhp.read_tools.recursive_loader_gui.benchmark tree --files 1000000 --directories 100000
+
+Only the model layer is imported, neither nuke nor PySide2 are required.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from nhp.pysequitur.file_sequence import FileSequence, SequenceFactory
+from nhp.read_tools.frame_set import FrameSet
+from nhp.read_tools.read_wrapper import FileHandlerType, LazySequenceFile
+from nhp.read_tools.recursive_loader_gui import grouping
+from nhp.read_tools.recursive_loader_gui.model import DirectoryTree
+from nhp.read_tools.recursive_loader_gui.records import FileRecord
+
+
+def synthetic_names(frames: int, frames_per_sequence: int = 100) -> List[str]:
+    """
+    Names shaped like a render directory, shuffled the way listings come back from a filer
+    Most are frames of versioned sequences, some use other delimiters or no
+    padding, and one in a hundred is a movie or a stray file.
+    """
+    names = []
+    for i in range(frames // frames_per_sequence):
+        shot, layer = divmod(i, 10)
+        stem = f"sh{shot:04d}_comp_v{layer % 3 + 1:03d}_l{layer}"
+        for frame in range(1001, 1001 + frames_per_sequence):
+            if i % 5 == 1:
+                names.append(f"{stem}_{frame}.exr")
+            elif i % 5 == 2:
+                names.append(f"{stem}.{frame}_denoise.exr")
+            else:
+                names.append(f"{stem}.{frame:04d}.exr")
+        if i % 100 == 0:
+            names += [f"{stem}.mov", f"{stem}_notes.txt"]
+    random.Random(0).shuffle(names)
+    return names
+
+
+def _compact(sequence: FileSequence, directory: Path) -> LazySequenceFile:
+    """Keep the components and frame numbers of a parsed sequence, dropping its Items"""
+    first = sequence.items[0]
+    return LazySequenceFile(
+        directory,
+        first.prefix,
+        first.delimiter or "",
+        sequence.padding,
+        first.suffix or "",
+        first.extension,
+        [item.frame_number for item in sequence.items],
+        {
+            item.frame_number: item.frame_string
+            for item in sequence.items
+            if item.frame_string != str(item.frame_number).zfill(sequence.padding)
+        },
+    )
+
+
+def _per_file(names: List[str], directory: Path) -> Tuple[list, List[str]]:
+    """
+    The grouping the scanner used before, an Item per file through pysequitur
+    Sequences without an extension are left as single files, as grouping does.
+    """
+    sequences = [
+        seq for seq in SequenceFactory.from_filenames(names, directory) if seq.extension
+    ]
+    in_sequence = {item.filename for seq in sequences for item in seq.items}
+    compact = [_compact(seq, directory) for seq in sequences]
+    return compact, [name for name in names if name not in in_sequence]
+
+
+def _time(function: Callable, repeat: int) -> Tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _signature(result: Tuple[list, List[str]]) -> Tuple[list, List[str]]:
+    sequences, others = result
+    return sorted((str(seq.get_path()), seq.existing_frames()) for seq in sequences), others
+
+
+def bench_grouping(names: List[str], directory: Path, repeat: int) -> int:
+    print(f"{len(names)} names")
+    per_file, expected = _time(lambda: _per_file(names, directory), repeat)
+    print(f"  per file (pysequitur): {per_file:8.3f}s")
+    batch, result = _time(lambda: grouping.group_sequences(names, directory), repeat)
+    print(f"  batch:                 {batch:8.3f}s  {per_file / batch:.1f}x")
+
+    if _signature(result) != _signature(expected):
+        print("  batch grouping differs from pysequitur", file=sys.stderr)
+        return 1
+    print(f"  same {len(result[0])} sequences and {len(result[1])} other files")
+    return 0
+
+
+def synthetic_files(files: int, directories: int, width: int) -> Tuple[Path, List[FileRecord]]:
+    """Files spread evenly over directories, grouped width shot folders to a sequence folder"""
+    base = Path("/show/shots")
+    per_directory = max(1, files // directories)
+    records: List[FileRecord] = []
+    for i in range(directories):
+        directory = base / f"seq{i // width:04d}" / f"sh{i:06d}"
+        for j in range(per_directory):
+            frames = FrameSet.from_range(1001, 1100)
+            records.append(
+                FileRecord(FileHandlerType.SEQUENCE, directory, f"el{j}", "exr", frames, ".", 4)
+            )
+    return base, records
+
+
+def _build_linear(files: List[FileRecord], base_dir: Path) -> DirectoryTree:
+    """The tree builder the loader used before, looking children up by scanning the subdirectory list"""
+    root = DirectoryTree("", "")
+    dir_files: dict[str, List[FileRecord]] = {}
+    for image_file in files:
+        rel_path = str(image_file.directory.relative_to(base_dir))
+        dir_files.setdefault(rel_path, []).append(image_file)
+
+    for dir_path, files in dir_files.items():
+        if not dir_path:
+            root.files = files
+            continue
+        parts = Path(dir_path).parts
+        current = root
+        for i, part in enumerate(parts):
+            for subdir in current.subdirs:
+                if subdir.name == part:
+                    current = subdir
+                    break
+            else:
+                new_node = DirectoryTree(part, str(Path(*parts[: i + 1])))
+                current.add_subdir(new_node)
+                current = new_node
+        current.files = files
+    return root
+
+
+def _count(node: DirectoryTree) -> Tuple[int, int]:
+    directories, files = 1, len(node.files)
+    for subdir in node.subdirs:
+        sub_directories, sub_files = _count(subdir)
+        directories += sub_directories
+        files += sub_files
+    return directories, files
+
+
+def bench_tree(files: int, directories: int, width: int, reference_max: int, repeat: int) -> int:
+    """
+    Time the tree builders at a hundredth, a tenth and all of the size
+    "grouped" starts from files already grouped by directory, as the Model keeps them.
+    """
+    print(
+        f"{'files':>9} {'dirs':>8}  {'indexed':>9} {'per file':>9}  {'grouped':>9}"
+        f"  {'lazy':>9}  {'linear':>9}"
+    )
+    status = 0
+    for scale in (100, 10, 1):
+        count = max(1, directories // scale)
+        base, image_files = synthetic_files(files // scale, count, width)
+        by_directory: dict[Path, List[FileRecord]] = {}
+        for image_file in image_files:
+            by_directory.setdefault(image_file.directory, []).append(image_file)
+
+        indexed, tree = _time(lambda: DirectoryTree.build_from_files(image_files, base), repeat)
+        grouped, _ = _time(lambda: DirectoryTree.build_from_directories(by_directory, base), repeat)
+        lazy, _ = _time(
+            lambda: DirectoryTree.build_from_directories(by_directory, base, lazy=True), repeat
+        )
+        line = (
+            f"{len(image_files):>9} {count:>8}  {indexed:8.3f}s"
+            f" {indexed / len(image_files) * 1e6:7.2f}us  {grouped:8.3f}s  {lazy:8.3f}s"
+        )
+        if len(image_files) <= reference_max:
+            linear, expected = _time(lambda: _build_linear(image_files, base), 1)
+            line += f"  {linear:8.3f}s  {linear / indexed:.1f}x"
+            if _count(tree) != _count(expected):
+                print("  indexed tree differs from the linear one", file=sys.stderr)
+                status = 1
+        print(line)
+    return status
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m nhp.read_tools.recursive_loader_gui.benchmark",
+        description="Time the scanning stages against their reference implementations.",
+    )
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    grouping_parser = subparsers.add_parser(
+        "grouping", help="group file names into sequences, per file and in batch"
+    )
+    grouping_parser.add_argument(
+        "--frames", type=int, default=300_000, help="synthetic names (default: 300000)"
+    )
+    grouping_parser.add_argument(
+        "--directory", type=Path, help="group the listing of this directory instead"
+    )
+    grouping_parser.add_argument(
+        "--repeat", type=int, default=3, help="runs, the fastest is kept (default: 3)"
+    )
+
+    tree_parser = subparsers.add_parser(
+        "tree", help="build the loader's directory tree at growing sizes"
+    )
+    tree_parser.add_argument(
+        "--files", type=int, default=1_000_000, help="files at the largest size (default: 1000000)"
+    )
+    tree_parser.add_argument(
+        "--directories",
+        type=int,
+        default=100_000,
+        help="directories at the largest size (default: 100000)",
+    )
+    tree_parser.add_argument(
+        "--width", type=int, default=2000, help="shot folders per sequence folder (default: 2000)"
+    )
+    tree_parser.add_argument(
+        "--reference-max",
+        type=int,
+        default=100_000,
+        help="largest size the old linear builder is timed at (default: 100000)",
+    )
+    tree_parser.add_argument(
+        "--repeat", type=int, default=3, help="runs, the fastest is kept (default: 3)"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.benchmark == "grouping":
+        if args.directory:
+            directory = args.directory
+            names = [entry.name for entry in os.scandir(directory) if entry.is_file()]
+        else:
+            directory = Path("/renders")
+            names = synthetic_names(args.frames)
+        return bench_grouping(names, directory, args.repeat)
+    if args.benchmark == "tree":
+        return bench_tree(
+            args.files, args.directories, args.width, args.reference_max, args.repeat
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,14 @@
+import re
+from functools import partial
 from pathlib import Path
-from typing import List, Optional
-from nhp.read_tools.recursive_loader_gui import nuke_interface
+from typing import List, Optional, Set, Tuple
+from nhp.read_tools.recursive_loader_gui import nuke_interface, scan_index, scanner
 from nhp.read_tools.recursive_loader_gui.view import View
-from nhp.read_tools.recursive_loader_gui.model import Model
+from nhp.read_tools.recursive_loader_gui.model import Model, ScanDiff
+from nhp.read_tools.recursive_loader_gui.record_filter import RecordFilter
+from nhp.read_tools.recursive_loader_gui.directory_watcher import DirectoryWatcher
+from nhp.read_tools.recursive_loader_gui.scanner import ScanNode, VisitedDirectories
+from nhp.read_tools.recursive_loader_gui.scan_worker import ScanThread
 
 
 class Controller:
@@ -12,10 +18,38 @@ class Controller:
         
         # Connect signals
         self.view.directory_selected.connect(self._on_directory_selected)
+        self.view.directory_expanded.connect(self._on_directory_expanded)
+        self.view.root_added.connect(self._on_root_added)
         self.view.scan_requested.connect(self._on_scan_requested)
         self.view.load_requested.connect(self._on_load_requested)
         self.view.cancel_requested.connect(self._on_cancel_requested)
         self.view.select_all_requested.connect(self._on_select_all_requested)
+        self.view.manifest_open_requested.connect(self._on_manifest_open_requested)
+        self.view.manifest_save_requested.connect(self._on_manifest_save_requested)
+        self.view.watch_toggled.connect(self._on_watch_toggled)
+        self.view.search_requested.connect(self._on_search_requested)
+        self.view.filter_changed.connect(self._on_filter_changed)
+        self.view.closing.connect(self._stop_scan)
+
+        self._scan_thread: Optional[ScanThread] = None
+        # Results of a rescan of the current directory, applied as a diff once it completes
+        self._rescan_nodes: Optional[List[ScanNode]] = None
+        self._rescan_loaded: Optional[tuple] = None
+        # Set while directories left by a lazy scan are listed, with the load waiting for them
+        self._expanding = False
+        self._load_after_expansion: Optional[Tuple[List[int], List[Path]]] = None
+        # Load asked for while another scan was running, requested again once it finishes
+        self._queued_load: Optional[Tuple[List[int], List[Path]]] = None
+        # Directories expanded while another scan was running, listed once it finishes
+        self._queued_expansions: List[Path] = []
+        # Set when the filter bar changed while a scan was running, it is applied once it finishes
+        self._filter_pending = False
+        # Nodes of a walk of directories that changed on disk, applied as a diff once it completes
+        self._refresh_nodes: Optional[List[ScanNode]] = None
+        # Changed directories waiting for the running scan to finish
+        self._pending_refresh: Set[Path] = set()
+        self._watcher = DirectoryWatcher(parent=self.view)
+        self._watcher.directories_changed.connect(self._on_directories_changed)
         
         if path:
             self._on_directory_selected(path)
@@ -31,37 +65,401 @@ class Controller:
         if not self.model.current_directory:
             return
             
-        tree = self.model.build_directory_tree()
+        # Lazy, the tree model only walks the levels that are expanded
+        tree = self.model.build_directory_tree(lazy=True)
         if tree:
-            self.view.tree_presenter.display_tree(tree)
+            self.view.tree_presenter.display_tree(tree, self._visible_ids())
 
     def _on_directory_selected(self, directory: Path):
         """Handle directory selection"""
+        self._stop_scan()
+        self._watcher.clear()
+        self._pending_refresh.clear()
         self.model.clear()
         self.view.clear_list()
         self.view.set_path_text(str(directory))
-        self.model._current_directory = directory
-        # self.view.__row_counter = 0
-        self.view.id_lookup = {}
+
+    def _on_root_added(self, directory: Path):
+        """Scan another root into the list, the roots already shown are only patched"""
+        roots = self.view.get_paths()
+        if directory not in roots:
+            roots.append(directory)
+        self.view.set_paths(roots)
+        self._on_scan_requested()
 
     def _on_scan_requested(self):
-        """Handle scan request"""
+        """Handle scan request, the walk runs in a background thread"""
+        if self._scan_thread is not None:
+            return
+
+        roots = self.view.get_paths()
+        if not roots:
+            self.view.show_error("No directory to scan")
+            return
+        for root in roots:
+            if not root.is_dir():
+                self.view.show_error(f"{root} is not a directory")
+                return
+
+        # The walk supersedes the refreshes of changed directories
+        self._watcher.clear()
+        self._pending_refresh.clear()
+        self.model.options = self.view.get_scan_options()
+        self.model.lazy = self.view.checkbox_lazy.isChecked()
+
+        # Scanning roots that are already shown again patches the table instead of
+        # rebuilding it, which is also how added roots join the list
+        if self.model.sequence_count and set(roots) & set(self.model.roots):
+            self._rescan_nodes = []
+            self._rescan_loaded = None
+            visited = VisitedDirectories()
+        else:
+            self._rescan_nodes = None
+            self.model.begin_scan(roots)
+            self.view.clear_list()
+            visited = self.model.visited
+
+        thread = ScanThread(
+            roots,
+            self.model.max_workers,
+            self.model.index,
+            self.model.options,
+            visited,
+            self.model.daemon_socket,
+            expand=self.model.expand_filter(),
+        )
+        self._start_thread(thread)
+
+    def _on_directory_expanded(self, directory: Path):
+        """List a directory the lazy scan left for later, its subdirectories stay unscanned"""
+        if not self.model.is_unscanned(directory):
+            return
+        if self._scan_thread is not None:
+            if directory not in self._queued_expansions:
+                self._queued_expansions.append(directory)
+            return
+        self._start_expansion([directory], recursive=False)
+
+    def _start_expansion(self, directories: List[Path], recursive: bool):
+        """Scan unscanned directories in the background, adding them to the tree as they are listed"""
+        self._expanding = True
+        thread = ScanThread(
+            directories,
+            self.model.max_workers,
+            self.model.index,
+            self.model.options,
+            self.model.visited,
+            depths=[self.model.depth_of(directory) for directory in directories],
+            expand=None if recursive else scanner.skip_subdirectories,
+        )
+        self._start_thread(thread)
+
+    def _start_thread(self, thread: ScanThread):
+        """Route the results of a scan thread to the controller and start it"""
+        thread.batch_ready.connect(partial(self._on_scan_batch, thread))
+        thread.scan_loaded.connect(partial(self._on_scan_loaded, thread))
+        thread.scan_failed.connect(self.view.show_error)
+        thread.scan_finished.connect(partial(self._on_scan_finished, thread))
+        self._scan_thread = thread
+        self.view.set_scanning(True)
+        thread.start()
+
+    def _on_scan_batch(self, thread: ScanThread, nodes: List[ScanNode]):
+        """Show the files of freshly scanned directories while the walk continues"""
+        # Batches can still be queued from a scan that was stopped
+        if thread is not self._scan_thread or thread.cancelled:
+            return
+
+        if self._expanding:
+            self._apply_diff(self.model.apply_expansion(nodes))
+            return
+
+        if self._refresh_nodes is not None:
+            self._refresh_nodes.extend(nodes)
+            return
+
+        if self._rescan_nodes is not None:
+            self._rescan_nodes.extend(nodes)
+            return
+
+        several_roots = len(self.model.roots) > 1
+        record_filter = self._record_filter()
+        for node in nodes:
+            files = self.model.add_nodes([node])
+            if record_filter is not None:
+                files = [record for record in files if record_filter.matches(record)]
+            root = self.model.root_of(node.path)
+            if files and root is not None:
+                label = node.path if several_roots else node.path.relative_to(root)
+                self.view.tree_presenter.display_directory(label.as_posix(), files)
+
+    def _on_scan_loaded(self, thread: ScanThread, results: list):
+        """Take over the scans the daemon answered with"""
+        if thread is not self._scan_thread or thread.cancelled:
+            return
+        if self._rescan_nodes is not None:
+            self._rescan_loaded = results
+            return
+        self.model.load_scans(results)
+
+    def _on_scan_finished(self, thread: ScanThread, cancelled: bool):
+        """Replace the streamed rows with the full tree"""
+        thread.deleteLater()
+        if thread is not self._scan_thread:
+            return
+
+        self._scan_thread = None
+        self.view.set_scanning(False)
+        refreshing = self._refresh_nodes is not None
+        if refreshing:
+            self._finish_refresh(thread, cancelled)
+        elif self._expanding:
+            self._finish_expansion(cancelled)
+        else:
+            if self._rescan_nodes is not None:
+                self._finish_rescan(thread, cancelled)
+            else:
+                self.populate_list()
+            self._show_scan_status()
+            if self.view.checkbox_watch.isChecked():
+                self._watcher.watch(self.model.directories)
+
+        if self._filter_pending:
+            self._filter_pending = False
+            self._on_filter_changed()
+
+        load, self._queued_load = self._queued_load, None
+        if load is not None and not cancelled:
+            self._load_selection(*load)
+        expansions, self._queued_expansions = self._queued_expansions, []
+        # If the queued load started a scan, they wait for it to finish
+        expansions = [d for d in expansions if self.model.is_unscanned(d)]
+        if self._scan_thread is None and expansions:
+            self._start_expansion(expansions, recursive=False)
+        else:
+            self._queued_expansions = expansions
+        # A cancelled refresh waits for the next change rather than starting over
+        if self._scan_thread is None and not (refreshing and cancelled):
+            self._start_refresh()
+
+    def _finish_rescan(self, thread: ScanThread, cancelled: bool):
+        """Patch the model and table with a completed rescan, a partial one is dropped"""
+        nodes, loaded = self._rescan_nodes, self._rescan_loaded
+        self._rescan_nodes = None
+        self._rescan_loaded = None
+        # Nothing arrives when the root itself could not be read
+        if cancelled or not (nodes or loaded):
+            return
+
+        if loaded is not None:
+            diff = self.model.apply_loaded_rescan(loaded)
+        else:
+            diff = self.model.apply_rescan(thread.directories, nodes, thread.visited)
+        self._apply_diff(diff)
+
+    def _finish_refresh(self, thread: ScanThread, cancelled: bool):
+        """Patch the model and table with the walk of changed directories"""
+        nodes, self._refresh_nodes = self._refresh_nodes, None
+        if cancelled:
+            # The watcher only reports them again once they change again
+            self._pending_refresh.update(thread.directories)
+            return
+        self._apply_diff(self.model.apply_refresh(thread.directories, nodes))
+
+    def _finish_expansion(self, cancelled: bool):
+        """Run the load that was waiting for its directories to be scanned"""
+        self._expanding = False
+        load, self._load_after_expansion = self._load_after_expansion, None
+        self._show_scan_status()
+        if load is not None and not cancelled:
+            ids, directories = load
+            ids = ids + [record.id for record in self.model.files_below(directories)]
+            self._load(list(dict.fromkeys(ids)))
+
+    def _show_scan_status(self):
+        """Summarise the scan, listing collapsed aliases in the tooltip"""
+        aliases = self.model.aliases
+        status = f"{len(self.model.directories)} directories, {self.model.sequence_count} files"
+        unscanned = len(self.model.unscanned_directories)
+        if unscanned:
+            status += f", {unscanned} not scanned yet"
+        if aliases:
+            status += f", {len(aliases)} aliased directories skipped"
+        details = "\n".join(f"{alias} -> {owner}" for alias, owner in sorted(aliases.items()))
+        self.view.set_status(status, details)
+
+    def _stop_scan(self):
+        """Cancel a running scan and drop whatever it has not delivered yet"""
+        if self._scan_thread is None:
+            return
+        self._scan_thread.cancel()
+        self._scan_thread.wait()
+        if self._refresh_nodes is not None:
+            self._pending_refresh.update(self._scan_thread.directories)
+        self._scan_thread = None
+        self._rescan_nodes = None
+        self._rescan_loaded = None
+        self._expanding = False
+        self._load_after_expansion = None
+        self._queued_load = None
+        self._queued_expansions = []
+        self._refresh_nodes = None
+        self.view.set_scanning(False)
+
+    def _on_watch_toggled(self, enabled: bool):
+        """Start or stop following changes on disk"""
+        self._watcher.clear()
+        self._pending_refresh.clear()
+        if enabled and self._scan_thread is None:
+            self._watcher.watch(self.model.directories)
+
+    def _on_directories_changed(self, directories: List[Path]):
+        """Patch the model and table for directories that changed on disk"""
+        self._pending_refresh.update(directories)
+        if self._scan_thread is None:
+            self._start_refresh()
+
+    def _start_refresh(self):
+        """Walk the changed directories in the background, vanished ones are dropped right away"""
+        directories = sorted(d for d in self._pending_refresh if self.model.is_scanned(d))
+        self._pending_refresh.clear()
+        gone = [directory for directory in directories if not directory.is_dir()]
+        if gone:
+            self._apply_diff(self.model.remove_directories(gone))
+        # Removing a directory also drops the changed directories below it
+        directories = [d for d in directories if self.model.is_scanned(d)]
+        if not directories:
+            return
+
+        self._refresh_nodes = []
+        thread = ScanThread(
+            directories,
+            self.model.max_workers,
+            self.model.index,
+            self.model.options,
+            self.model.visited,
+            depths=[self.model.depth_of(directory) for directory in directories],
+            expand=self.model.refresh_filter(),
+        )
+        self._start_thread(thread)
+
+    def _apply_diff(self, diff: ScanDiff):
+        """Update only the affected rows, matched by key"""
+        if diff.is_empty():
+            return
+
+        structural = diff.added or diff.removed or diff.added_directories or diff.removed_directories
+        visible = self._visible_ids()
+        # Changed frames can also change what the filter lets through
+        if structural or visible is not None:
+            tree = self.model.build_directory_tree(lazy=True)
+            if tree:
+                self.view.tree_presenter.patch_tree(tree, visible)
+            else:
+                self.view.clear_list()
+        else:
+            for record in diff.changed:
+                self.view.tree_presenter.update_file(record)
+
+        if self.view.checkbox_watch.isChecked():
+            self._watcher.unwatch(diff.removed_directories)
+            self._watcher.watch(diff.added_directories)
+
+    def _record_filter(self) -> Optional[RecordFilter]:
+        """Get the filter of the filter bar, None when it is empty or its regex is invalid"""
+        record_filter = self.view.get_record_filter()
+        if record_filter.is_empty():
+            return None
+        try:
+            record_filter.validate()
+        except re.error as e:
+            self.view.set_status(f"Invalid filter pattern: {e}")
+            return None
+        return record_filter
+
+    def _visible_ids(self) -> Optional[Set[int]]:
+        """Get the ids of the files the filter bar lets through, None lets every file through"""
+        record_filter = self._record_filter()
+        if record_filter is None:
+            return None
+        return self.model.filter_records(record_filter)
+
+    def _on_filter_changed(self):
+        """Narrow the list to the files the filter bar lets through"""
+        if self._scan_thread is not None:
+            # New directories are filtered as they arrive, the rest once the scan finishes
+            self._filter_pending = True
+            return
+        visible = self._visible_ids()
+        self.view.tree_presenter.filter_tree(visible)
+        if visible is not None:
+            self.view.set_status(
+                f"{len(visible)} of {self.model.sequence_count} files match the filter"
+            )
+        elif self.view.get_record_filter().is_empty():
+            self._show_scan_status()
+
+    def _on_search_requested(self, query: str):
+        """Show the indexed files matching query, nothing is walked"""
+        if self.model.index is None:
+            self.view.show_error("Searching needs the scan index, which could not be opened")
+            return
+
+        self._stop_scan()
+        self._watcher.clear()
+        files = self.model.search(query)
+        self.populate_list()
+        status = f"{len(files)} indexed files matching '{query}'"
+        if len(files) >= scan_index.DEFAULT_SEARCH_LIMIT:
+            status += ", only the first ones are shown"
+        self.view.set_status(status)
+
+    def _on_manifest_open_requested(self, path: Path):
+        """Show a precomputed scan instead of walking the filesystem"""
+        self._stop_scan()
+        self._watcher.clear()
         try:
-            directory = Path(self.view.get_path_text())
-            self.model.scan_directory(directory)
-            self.populate_list()
+            self.model.load_manifest(path)
+        except Exception as e:
+            self.view.show_error(str(e))
+            return
+        self.view.set_paths(self.model.roots)
+        self.populate_list()
+        if self.view.checkbox_watch.isChecked():
+            self._watcher.watch(self.model.directories)
+
+    def _on_manifest_save_requested(self, path: Path):
+        """Write the current scan to a manifest"""
+        try:
+            self.model.save_manifest(path)
         except Exception as e:
             self.view.show_error(str(e))
 
     def _on_load_requested(self, id_list: List[int]):
-        """Handle load request"""
-        
-        if not self.model._node:
+        """Handle load request, selected directories that were not scanned yet are scanned first"""
+        self._load_selection(id_list, self.view.get_selected_directories())
+
+    def _load_selection(self, id_list: List[int], directories: List[Path]):
+        """Load the files, once the directories among them that were not scanned yet are"""
+        directories = [directory for directory in directories if self.model.is_unscanned(directory)]
+        if not directories:
+            self._load(id_list)
+            return
+        if self._scan_thread is not None:
+            self._queued_load = (id_list, directories)
+            self.view.set_status("Loading the selection once the running scan finishes")
+            return
+        self._load_after_expansion = (id_list, directories)
+        self._start_expansion(directories, recursive=True)
+
+    def _load(self, id_list: List[int]):
+        """Create Read nodes for the files"""
+        if not self.model.sequence_count:
             return
         
         try:
             r = nuke_interface.generate_read_nodes_2(
-                [self.model.ImageFileById[id] for id in id_list],
+                self.model.files_to_load(id_list, self.view.get_latest_count()),
                 self.node_count,
                 self.node_origin 
             )
@@ -73,7 +471,10 @@ class Controller:
             self.view.show_error(str(e))
 
     def _on_cancel_requested(self):
-        """Handle cancel request"""
+        """Handle cancel request, stopping a running scan before closing the window"""
+        if self._scan_thread is not None:
+            self._scan_thread.cancel()
+            return
         self.view.close()
 
     def _on_select_all_requested(self):
@@ -0,0 +1,61 @@
+from pathlib import Path
+from typing import Iterable
+
+from PySide2 import QtCore  # type: ignore
+from PySide2.QtCore import Signal  # type: ignore
+
+
+class DirectoryWatcher(QtCore.QObject):
+    """
+    Reports scanned directories whose entries changed
+
+    Backed by QFileSystemWatcher, which uses inotify on Linux. Renders write many
+    frames per second, so changes are collected and emitted at most once per delay.
+    """
+
+    # Signals
+    directories_changed = Signal(list)
+
+    def __init__(self, delay_ms: int = 500, parent=None):
+        super().__init__(parent)
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._dirty: set[str] = set()
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self._flush)
+
+    def watch(self, directories: Iterable[Path]) -> None:
+        """Start watching directories"""
+        paths = [str(d) for d in directories]
+        if paths:
+            self._watcher.addPaths(paths)
+
+    def unwatch(self, directories: Iterable[Path]) -> None:
+        """Stop watching directories"""
+        watched = set(self._watcher.directories())
+        paths = [str(d) for d in directories if str(d) in watched]
+        if paths:
+            self._watcher.removePaths(paths)
+
+    def clear(self) -> None:
+        """Stop watching everything and drop pending changes"""
+        watched = self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+        self._dirty.clear()
+        self._timer.stop()
+
+    def _on_directory_changed(self, path: str) -> None:
+        self._dirty.add(path)
+        # Not restarted on every event, a render landing frames would starve it
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _flush(self) -> None:
+        # Sorted so parents are refreshed before their subdirectories
+        dirty = sorted(self._dirty)
+        self._dirty.clear()
+        self.directories_changed.emit([Path(p) for p in dirty])
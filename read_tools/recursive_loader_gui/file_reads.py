@@ -0,0 +1,72 @@
+"""
+The thread pool of the scan stages that stat or read single files
+
+Frame sizes, image headers and movie probes are network bound like listings. They
+share one pool, separate from the walk's so listings never wait behind file reads.
+Reads can be cached in the scan index by file path and mtime, see read_files.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence, TypeVar
+
+if TYPE_CHECKING:
+    from nhp.read_tools.recursive_loader_gui.scan_index import ScanIndex
+
+READ_WORKERS = 32
+
+T = TypeVar("T")
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def read_pool() -> ThreadPoolExecutor:
+    """Get the shared pool, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(READ_WORKERS, thread_name_prefix="file_reads")
+        return _pool
+
+
+def _cached_read(
+    path: str,
+    read: Callable[[str], Optional[T]],
+    index: Optional["ScanIndex"],
+    table: Optional[str],
+) -> Optional[T]:
+    """Read a file unless the index has what was read from it at its current mtime"""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        if index is not None and table is not None:
+            cached = index.lookup_file(table, path, mtime_ns)
+            if cached is not None:
+                return cached  # type: ignore
+        value = read(path)
+    except (OSError, ValueError) as e:
+        print(f"could not read {path}: {e}")
+        return None
+    if value is not None and index is not None and table is not None:
+        index.store_file(table, path, mtime_ns, value)  # type: ignore
+    return value
+
+
+def read_files(
+    paths: Sequence[str],
+    read: Callable[[str], Optional[T]],
+    index: Optional["ScanIndex"] = None,
+    table: Optional[str] = None,
+) -> List[Optional[T]]:
+    """
+    Read several files at once through the shared pool
+    Args:
+        paths: Files to read
+        read: Reads one file, raising OSError or ValueError if it can't
+        index: Optional scan index, files are only read when their mtime changed
+        table: The index's FILE_TABLES entry the results are kept in
+    Returns what was read from each path, None where nothing was or it could not be read.
+    """
+    pool = read_pool()
+    futures = [pool.submit(_cached_read, path, read, index, table) for path in paths]
+    return [future.result() for future in futures]
@@ -0,0 +1,107 @@
+"""
+Frame size statistics of scanned sequences
+
+Crashed farm jobs leave empty or half-written frames that look like any other
+frame in a listing. Stat'ing every frame finds them: frames far smaller than the
+median frame of their sequence are reported as truncated. Stats go through the file
+reads pool in chunks, so the latency of a network filer overlaps across frames.
+"""
+import os
+from dataclasses import dataclass
+from typing import Iterable, List, Sequence
+
+from nhp.read_tools.frame_set import FrameSet
+from nhp.read_tools.read_wrapper import LazySequenceFile
+from nhp.read_tools.recursive_loader_gui.file_reads import read_pool
+
+# Frames stat'ed by one task, large enough that the pool's overhead doesn't show
+STAT_CHUNK = 256
+# Frames smaller than this fraction of their sequence's median are truncated
+TRUNCATED_FRACTION = 0.5
+
+
+@dataclass(frozen=True)
+class SequenceStats:
+    """
+    Sizes of the frames of a sequence
+    Attributes:
+        total_bytes: Size of every frame together
+        median_bytes: Size of the median frame
+        truncated: Frames far smaller than the median, empty or vanished ones included
+    """
+    total_bytes: int
+    median_bytes: int
+    truncated: FrameSet
+
+    def to_json(self) -> list:
+        return [self.total_bytes, self.median_bytes, self.truncated.runs]
+
+    @classmethod
+    def from_json(cls, data: list) -> "SequenceStats":
+        total_bytes, median_bytes, runs = data
+        return cls(total_bytes, median_bytes, FrameSet.from_runs(runs))
+
+
+def _sizes(paths: List[str]) -> List[int]:
+    """Stat a chunk of files, a file that can't be stat'ed counts as empty"""
+    sizes = []
+    for path in paths:
+        try:
+            sizes.append(os.stat(path).st_size)
+        except OSError:
+            sizes.append(0)
+    return sizes
+
+
+def frame_paths(sequence: LazySequenceFile, frames: Iterable[int]) -> List[str]:
+    """Get the path of every frame of a sequence, under the file names it was listed with"""
+    head = os.path.join(sequence.directory, f"{sequence.name}{sequence.delimiter or ''}")
+    tail = f"{sequence.suffix or ''}.{sequence.extension}"
+    frame_text = sequence.frame_text
+    return [f"{head}{frame_text(frame)}{tail}" for frame in frames]
+
+
+def summarize(frames: FrameSet, sizes: Sequence[int]) -> SequenceStats:
+    """Sum up the sizes of the frames of a sequence, sizes are in frame order"""
+    median = sorted(sizes)[len(sizes) // 2]
+    threshold = median * TRUNCATED_FRACTION
+    truncated = [frame for frame, size in zip(frames, sizes) if size == 0 or size < threshold]
+    return SequenceStats(sum(sizes), median, FrameSet.from_sorted(truncated))
+
+
+def measure(sequences: Sequence[Sequence[str]]) -> List[List[int]]:
+    """
+    Stat the frames of several sequences at once
+    Args:
+        sequences: The frame paths of every sequence, as returned by frame_paths
+    Returns the frame sizes of each sequence, in the order of its paths.
+    """
+    pool = read_pool()
+    # Chunks of every sequence go to the pool before any result is waited for
+    futures = [
+        [
+            pool.submit(_sizes, list(paths[i : i + STAT_CHUNK]))
+            for i in range(0, len(paths), STAT_CHUNK)
+        ]
+        for paths in sequences
+    ]
+    return [[size for future in chunks for size in future.result()] for chunks in futures]
+
+
+def measure_sequences(sequences: Sequence[LazySequenceFile]) -> List[SequenceStats]:
+    """Stat every frame of sequences and sum up their sizes"""
+    frame_sets = [sequence.frame_set() for sequence in sequences]
+    paths = [frame_paths(sequence, frames) for sequence, frames in zip(sequences, frame_sets)]
+    return [summarize(frames, sizes) for frames, sizes in zip(frame_sets, measure(paths))]
+
+
+def format_size(size: int) -> str:
+    """Format a byte count, e.g. 12.3 MB"""
+    if size < 1000:
+        return f"{size} B"
+    value = float(size)
+    for unit in ("KB", "MB", "GB"):
+        value /= 1000
+        if value < 1000:
+            return f"{value:.1f} {unit}"
+    return f"{value / 1000:.1f} TB"
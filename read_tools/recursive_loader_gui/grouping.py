@@ -0,0 +1,160 @@
+"""
+Batch grouping of a directory's file names into sequences
+
+Gives the same sequences as pysequitur's SequenceFactory.from_filenames, which parses
+one Item per file, but splits the whole listing with a single precompiled pattern and
+builds the compact sequences straight from the frame strings. The frame numbers of a
+sequence are sorted once and split into runs by FrameSet.from_sorted, so its gaps are
+known from the listing alone. Frame strings that the padding doesn't rebuild are kept
+with the sequence, so its file names stay the ones listed.
+"""
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from nhp.read_tools.frame_set import FrameSet
+from nhp.read_tools.read_wrapper import LazySequenceFile
+
+# Extensions pysequitur's ItemParser keeps whole
+COMPOUND_EXTENSIONS = frozenset({"tar.gz", "tar.bz2", "log.gz"})
+
+# Matched against the reversed file name: the extension, the digit-free suffix, the
+# last run of digits and at most one delimiter. Longer delimiter runs stay in the
+# prefix, as in pysequitur. Names without an extension stay single files, unlike in
+# pysequitur, whose sequence string of them ends in a dot.
+_REVERSED_NAME = re.compile(r"([^.]+)\.(\D*)(\d+)([^a-zA-Z\d]?)")
+_REVERSED_STEM = re.compile(r"(\D*)(\d+)([^a-zA-Z\d]?)")
+
+# (prefix, delimiter, suffix, extension)
+GroupKey = Tuple[str, str, str, str]
+
+
+def split_name(name: str) -> Tuple[str, str]:
+    """Split a file name into its stem and extension the way pysequitur does"""
+    stem, dot, extension = name.rpartition(".")
+    if not dot:
+        return name, ""
+    if extension in ("gz", "bz2"):
+        head, dot, middle = stem.rpartition(".")
+        if dot and f"{middle}.{extension}" in COMPOUND_EXTENSIONS:
+            return head, f"{middle}.{extension}"
+    return stem, extension
+
+
+def _split_compound(name: str) -> Optional[Tuple[GroupKey, str]]:
+    """Parse a name with a compound extension, returning its group key and frame string"""
+    stem, extension = split_name(name)
+    found = _REVERSED_STEM.match(stem[::-1])
+    if found is None:
+        return None
+    suffix, frame, delimiter = found.groups()
+    return (stem[: len(stem) - found.end()], delimiter, suffix[::-1], extension), frame[::-1]
+
+
+def group_names(
+    file_names: List[str],
+) -> Tuple[Dict[GroupKey, Tuple[List[str], List[str]]], List[str]]:
+    """
+    Group file names by their components
+    Returns the frame strings and file names of every group, in listing order,
+    and the names without a frame number.
+    """
+    groups: Dict[GroupKey, Tuple[List[str], List[str]]] = {}
+    unnumbered: List[str] = []
+    match = _REVERSED_NAME.match
+    for name in file_names:
+        # Each name is split by a single match, from its end
+        found = match(name[::-1])
+        if found is not None:
+            extension, suffix, frame, delimiter = found.groups()
+            key = (
+                name[: len(name) - found.end()],
+                delimiter,
+                suffix[::-1],
+                extension[::-1],
+            )
+            frame = frame[::-1]
+            if key[3] in ("gz", "bz2"):
+                found = _split_compound(name)
+                if found is not None:
+                    key, frame = found
+        if found is None:
+            unnumbered.append(name)
+            continue
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = ([], [])
+        group[0].append(frame)
+        group[1].append(name)
+    return groups, unnumbered
+
+
+def _split_duplicates(frames: List[Tuple[int, str]]) -> List[List[Tuple[int, str]]]:
+    """
+    Split the sorted frames of a group in which some frame numbers appear with several paddings
+    The most common padding keeps the duplicated frame numbers, every other padding
+    becomes a sequence of its own.
+    """
+    nominal = Counter(len(text) for _, text in frames).most_common(1)[0][0]
+    counts = Counter(number for number, _ in frames)
+    main: List[Tuple[int, str]] = []
+    anomalous: Dict[int, List[Tuple[int, str]]] = {}
+    for frame in frames:
+        if counts[frame[0]] == 1 or len(frame[1]) == nominal:
+            main.append(frame)
+        else:
+            anomalous.setdefault(len(frame[1]), []).append(frame)
+    return [main, *anomalous.values()]
+
+
+def group_sequences(
+    file_names: List[str], directory: Path
+) -> Tuple[List[LazySequenceFile], List[str]]:
+    """
+    Group the files of a directory into sequences
+    Args:
+        file_names: Names of the files in directory
+        directory: Directory the sequences are created in
+    Returns the sequences and, in listing order, the names that are in none of them.
+    """
+    groups, unnumbered = group_names(file_names)
+    sequences: List[LazySequenceFile] = []
+    leftover = set(unnumbered)
+    for (prefix, delimiter, suffix, extension), (texts, names) in groups.items():
+        if len(texts) < 2:
+            leftover.update(names)
+            continue
+
+        frames = sorted(zip(map(int, texts), texts), key=lambda frame: frame[0])
+        runs = [frames]
+        if len({number for number, _ in frames}) < len(frames):
+            runs = _split_duplicates(frames)
+
+        for run in runs:
+            if len(run) < 2:
+                leftover.update(names[texts.index(text)] for _, text in run)
+                continue
+            padding = Counter(len(text) for _, text in run).most_common(1)[0][0]
+            # Only the strings padding doesn't rebuild are kept, unpadded 1 to 9 for example
+            frame_texts = {
+                number: text
+                for number, text in run
+                if len(text) != padding and text != str(number).zfill(padding)
+            }
+            sequences.append(
+                LazySequenceFile(
+                    directory,
+                    prefix,
+                    delimiter,
+                    padding,
+                    suffix,
+                    extension,
+                    FrameSet.from_sorted([number for number, _ in run]),
+                    frame_texts,
+                )
+            )
+
+    if not leftover:
+        return sequences, []
+    return sequences, [name for name in file_names if name in leftover]
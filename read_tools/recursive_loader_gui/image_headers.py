@@ -0,0 +1,296 @@
+"""
+Resolution, channels, compression and pixel type of image files, read from their headers
+
+Only the first HEADER_BYTES of a file are read, more only when an EXR header is
+longer. OpenEXR, DPX and classic TIFF headers are parsed in pure Python, other
+files have no header.
+"""
+import struct
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Enough for the header of a typical EXR, DPX or TIFF
+HEADER_BYTES = 64 * 1024
+# EXRs with many layers or much metadata have longer headers, but not longer than this
+MAX_HEADER_BYTES = 4 * 1024 * 1024
+
+# Extensions read_header parses, lowercase
+HEADER_EXTENSIONS = frozenset({"exr", "sxr", "dpx", "tif", "tiff"})
+
+EXR_MAGIC = 20000630
+EXR_COMPRESSIONS = (
+    "none",
+    "rle",
+    "zips",
+    "zip",
+    "piz",
+    "pxr24",
+    "b44",
+    "b44a",
+    "dwaa",
+    "dwab",
+)
+EXR_PIXEL_TYPES = ("uint", "half", "float")
+# Version field flag of files with several parts
+EXR_MULTIPART = 0x1000
+
+# Channels of the DPX image element descriptors
+DPX_CHANNELS: Dict[int, Tuple[str, ...]] = {
+    1: ("R",),
+    2: ("G",),
+    3: ("B",),
+    4: ("A",),
+    6: ("Y",),
+    50: ("R", "G", "B"),
+    51: ("R", "G", "B", "A"),
+    52: ("A", "B", "G", "R"),
+}
+
+TIFF_COMPRESSIONS = {
+    1: "none",
+    5: "lzw",
+    7: "jpeg",
+    8: "deflate",
+    32773: "packbits",
+    32946: "deflate",
+}
+# Byte sizes of the TIFF field types
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+# Order of the single letter channels in a layer name, others go last
+CHANNEL_ORDER = "RGBAYZ"
+
+class HeaderTruncated(Exception):
+    """The bytes read end before the header does"""
+
+
+@dataclass(frozen=True)
+class ImageHeader:
+    """
+    What a file's header says about its image
+    Attributes:
+        width: Width of the display window, or of the image for formats without one
+        height: Height, likewise
+        channels: Channel names, layer.channel for the layers of an EXR
+        compression: Lowercase compression name, e.g. zip or none
+        pixel_type: Channel data type, e.g. half, float or 10-bit. Mixed types are joined by /
+    """
+    width: int
+    height: int
+    channels: Tuple[str, ...]
+    compression: str
+    pixel_type: str
+
+    def to_json(self) -> list:
+        return [self.width, self.height, list(self.channels), self.compression, self.pixel_type]
+
+    @classmethod
+    def from_json(cls, data: list) -> "ImageHeader":
+        width, height, channels, compression, pixel_type = data
+        return cls(width, height, tuple(channels), compression, pixel_type)
+
+    @property
+    def resolution(self) -> str:
+        return f"{self.width}x{self.height}"
+
+    @property
+    def layers(self) -> List[str]:
+        """Get the layer names in channel order, single letter channels without a layer count as one"""
+        layers: Dict[str, None] = {}
+        base = [channel for channel in self.channels if "." not in channel]
+        if base and all(len(channel) == 1 for channel in base):
+            # EXRs store channels sorted by name, A before R
+            base.sort(key=lambda channel: CHANNEL_ORDER.find(channel) % (len(CHANNEL_ORDER) + 1))
+            layers["".join(base).lower()] = None
+        else:
+            layers.update(dict.fromkeys(base))
+        for channel in self.channels:
+            if "." in channel:
+                layers[channel.rsplit(".", 1)[0]] = None
+        return list(layers)
+
+
+class _Reader:
+    """Reads fields from the bytes of a header, raising HeaderTruncated past their end"""
+
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = data
+        self.offset = offset
+
+    def take(self, size: int) -> bytes:
+        end = self.offset + size
+        if end > len(self.data):
+            raise HeaderTruncated()
+        chunk = self.data[self.offset : end]
+        self.offset = end
+        return chunk
+
+    def unpack(self, fmt: str) -> tuple:
+        return struct.unpack(fmt, self.take(struct.calcsize(fmt)))
+
+    def string(self) -> str:
+        end = self.data.find(b"\0", self.offset)
+        if end < 0:
+            raise HeaderTruncated()
+        text = self.data[self.offset : end].decode("latin-1")
+        self.offset = end + 1
+        return text
+
+
+def _exr_channels(value: bytes) -> List[Tuple[str, int]]:
+    """Parse a chlist attribute into channel names and pixel types"""
+    reader = _Reader(value)
+    channels = []
+    while True:
+        name = reader.string()
+        if not name:
+            return channels
+        # Pixel type, linear flag, three reserved bytes and the x and y sampling
+        channels.append((name, reader.unpack("<iB3sii")[0]))
+
+
+def _exr_part(reader: _Reader) -> Dict[str, bytes]:
+    """Read the attributes of one header, up to the empty name that ends it"""
+    attributes = {}
+    while True:
+        name = reader.string()
+        if not name:
+            return attributes
+        reader.string()  # Type name, every attribute read here has a fixed type
+        (size,) = reader.unpack("<i")
+        attributes[name] = reader.take(size)
+
+
+def parse_exr(data: bytes) -> ImageHeader:
+    """Parse the header of an OpenEXR file, every part of a multi-part file"""
+    reader = _Reader(data)
+    magic, version = reader.unpack("<ii")
+    if magic != EXR_MAGIC:
+        raise ValueError("Not an OpenEXR file")
+
+    parts = [_exr_part(reader)]
+    if version & EXR_MULTIPART:
+        while True:
+            part = _exr_part(reader)
+            if not part:
+                break
+            parts.append(part)
+
+    channels: List[str] = []
+    pixel_types: Dict[str, None] = {}
+    for part in parts:
+        # Parts are named after their layer, their channels may not repeat it
+        layer = part["name"].rstrip(b"\0").decode("latin-1") if "name" in part else ""
+        for name, pixel_type in _exr_channels(part.get("channels", b"\0")):
+            if layer and len(parts) > 1 and not name.startswith(f"{layer}."):
+                name = f"{layer}.{name}"
+            channels.append(name)
+            pixel_types[EXR_PIXEL_TYPES[pixel_type] if 0 <= pixel_type < 3 else "?"] = None
+
+    first = parts[0]
+    window = first.get("displayWindow") or first.get("dataWindow")
+    width = height = 0
+    if window is not None:
+        x_min, y_min, x_max, y_max = struct.unpack("<iiii", window[:16])
+        width, height = x_max - x_min + 1, y_max - y_min + 1
+    compression = first.get("compression", b"\0")[0]
+    return ImageHeader(
+        width,
+        height,
+        tuple(channels),
+        EXR_COMPRESSIONS[compression] if compression < len(EXR_COMPRESSIONS) else "?",
+        "/".join(pixel_types),
+    )
+
+
+def parse_dpx(data: bytes) -> ImageHeader:
+    """Parse the file and image information headers of a DPX file, its first image element"""
+    if data[:4] == b"SDPX":
+        order = ">"
+    elif data[:4] == b"XPDS":
+        order = "<"
+    else:
+        raise ValueError("Not a DPX file")
+    reader = _Reader(data, 768)
+    _, elements, width, height = reader.unpack(f"{order}HHII")
+    if elements < 1:
+        raise ValueError("DPX file without image elements")
+    # First image element: sign, reference levels, then the descriptor and layout
+    reader.take(20)
+    descriptor, _, _, bit_size, _, encoding = reader.unpack(f"{order}BBBBHH")
+    channels = DPX_CHANNELS.get(descriptor, tuple(f"c{i}" for i in range(elements)))
+    pixel_type = f"{bit_size}-bit" + (" float" if bit_size in (32, 64) else "")
+    return ImageHeader(width, height, channels, "rle" if encoding == 1 else "none", pixel_type)
+
+
+def parse_tiff(data: bytes) -> ImageHeader:
+    """Parse the first image file directory of a classic TIFF file"""
+    if data[:4] == b"II*\0":
+        order = "<"
+    elif data[:4] == b"MM\0*":
+        order = ">"
+    else:
+        raise ValueError("Not a classic TIFF file")
+    (offset,) = struct.unpack(f"{order}I", data[4:8])
+    reader = _Reader(data, offset)
+    (count,) = reader.unpack(f"{order}H")
+
+    tags: Dict[int, List[int]] = {}
+    for _ in range(count):
+        tag, field_type, values, value = reader.unpack(f"{order}HHI4s")
+        size = TIFF_TYPE_SIZES.get(field_type, 1) * values
+        if field_type not in (3, 4):
+            continue
+        if size > 4:
+            (value_offset,) = struct.unpack(f"{order}I", value)
+            value = _Reader(data, value_offset).take(size)
+        fmt = f"{order}{values}{'H' if field_type == 3 else 'I'}"
+        tags[tag] = list(struct.unpack(fmt, value[:size]))
+
+    samples = tags.get(277, [1])[0]
+    bits = tags.get(258, [1])
+    sample_format = tags.get(339, [1])[0]
+    # Photometric interpretation 2 is RGB, the samples past the colors are extra ones
+    colors = ("R", "G", "B") if tags.get(262, [1])[0] == 2 else ("Y",)
+    extra = ("A", *(f"c{i}" for i in range(len(colors) + 1, samples)))
+    channels = (colors + extra)[:samples]
+    compression = tags.get(259, [1])[0]
+    return ImageHeader(
+        tags.get(256, [0])[0],
+        tags.get(257, [0])[0],
+        tuple(channels),
+        TIFF_COMPRESSIONS.get(compression, str(compression)),
+        f"{bits[0]}-bit" + (" float" if sample_format == 3 else ""),
+    )
+
+
+PARSERS: Dict[str, Callable[[bytes], ImageHeader]] = {
+    "exr": parse_exr,
+    "sxr": parse_exr,
+    "dpx": parse_dpx,
+    "tif": parse_tiff,
+    "tiff": parse_tiff,
+}
+
+
+def read_header(path: str) -> Optional[ImageHeader]:
+    """
+    Read the header of an image file, None if its extension has no parser
+    Raises OSError if the file can't be read and ValueError if it isn't what its
+    extension says.
+    """
+    parser = PARSERS.get(path.rsplit(".", 1)[-1].lower())
+    if parser is None:
+        return None
+    size = HEADER_BYTES
+    with open(path, "rb") as f:
+        data = f.read(size)
+        while True:
+            try:
+                return parser(data)
+            except (HeaderTruncated, struct.error, IndexError):
+                # A short read is the whole file, only a long header is worth reading on
+                if len(data) < size or size >= MAX_HEADER_BYTES:
+                    raise ValueError("Truncated header") from None
+            data += f.read(size)
+            size *= 2
@@ -0,0 +1,166 @@
+import gzip
+import json
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from nhp.read_tools.frame_set import FrameSet
+from nhp.read_tools.movie_probe import MovieInfo
+from nhp.read_tools.read_wrapper import FileHandlerType
+from nhp.read_tools.recursive_loader_gui.frame_stats import SequenceStats
+from nhp.read_tools.recursive_loader_gui.image_headers import ImageHeader
+from nhp.read_tools.recursive_loader_gui.records import FileRecord
+
+MANIFEST_VERSION = 2
+# Version 1 manifests are version 2 manifests without frame sizes, headers and movie probes
+READABLE_VERSIONS = (1, 2)
+
+# File records are stored as flat lists to keep large manifests small:
+#   [directory, "sequence", prefix, delimiter, padding, suffix, extension, frame runs, stats,
+#    header, frame texts]
+#   [directory, "movie", file name, first frame, last frame, movie]
+#   [directory, "single", file name, header]
+# directory indexes the manifest's relative directory list and frame runs are
+# flattened inclusive (start, end) pairs. stats is SequenceStats.to_json, header
+# ImageHeader.to_json and movie MovieInfo.to_json, or null when they were not
+# measured, read or probed. frame texts are the [frame, string] pairs of the listed
+# frame strings padding doesn't rebuild, null when there are none.
+
+
+def _open(path: Path, mode: str):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _header_json(record: FileRecord) -> Optional[list]:
+    return record.header.to_json() if record.header is not None else None
+
+
+def _read_header(data: Optional[list]) -> Optional[ImageHeader]:
+    return ImageHeader.from_json(data) if data is not None else None
+
+
+def build_manifest(root: Path, directories: List[Path], files: List[FileRecord]) -> dict:
+    """
+    Build the JSON serializable manifest of a scan
+    Args:
+        root: Root directory of the scan
+        directories: Every scanned directory
+        files: Every file found by the scan
+    """
+    relative = sorted({d.relative_to(root).as_posix() for d in directories})
+    relative = ["" if d == "." else d for d in relative]
+    directory_ids = {d: i for i, d in enumerate(relative)}
+
+    def directory_id(directory: Path) -> int:
+        rel = directory.relative_to(root).as_posix()
+        return directory_ids.setdefault("" if rel == "." else rel, len(directory_ids))
+
+    records: List[list] = []
+    for record in files:
+        dir_id = directory_id(record.directory)
+        if record.kind is FileHandlerType.MOVIE:
+            records.append(
+                [
+                    dir_id,
+                    "movie",
+                    record.file_name,
+                    record.first_frame(),
+                    record.last_frame(),
+                    record.movie.to_json() if record.movie is not None else None,
+                ]
+            )
+        elif record.kind is FileHandlerType.SINGLE:
+            records.append([dir_id, "single", record.file_name, _header_json(record)])
+        else:
+            records.append(
+                [
+                    dir_id,
+                    "sequence",
+                    record.name,
+                    record.delimiter,
+                    record.padding,
+                    record.suffix,
+                    record.extension,
+                    record.frames.runs,
+                    record.stats.to_json() if record.stats is not None else None,
+                    _header_json(record),
+                    sorted(record.frame_texts.items()) if record.frame_texts else None,
+                ]
+            )
+
+    return {
+        "version": MANIFEST_VERSION,
+        "root": str(root),
+        "directories": list(directory_ids),
+        "files": records,
+    }
+
+
+def save_manifest(
+    path: Path, root: Path, directories: List[Path], files: List[FileRecord]
+) -> None:
+    """Write a scan to a manifest file, gzip compressed if path ends in .gz"""
+    with _open(path, "w") as f:
+        json.dump(build_manifest(root, directories, files), f, separators=(",", ":"))
+
+
+def load_manifest(path: Path) -> Tuple[Path, List[Path], List[FileRecord]]:
+    """
+    Read a manifest without touching the scanned filesystem
+    Returns the root, the scanned directories and the files, in that order.
+    """
+    with _open(path, "r") as f:
+        return read_manifest(json.load(f))
+
+
+def read_manifest(manifest: dict) -> Tuple[Path, List[Path], List[FileRecord]]:
+    """Rebuild the root, directories and files of a manifest built by build_manifest"""
+    if manifest.get("version") not in READABLE_VERSIONS:
+        raise ValueError(f"Unsupported manifest version {manifest.get('version')}")
+
+    root = Path(manifest["root"])
+    directories = [root / d if d else root for d in manifest["directories"]]
+
+    files: List[FileRecord] = []
+    for record in manifest["files"]:
+        directory = directories[record[0]]
+        kind = record[1]
+        if kind == "sequence":
+            prefix, delimiter, padding, suffix, extension, runs = record[2:8]
+            stats = record[8] if len(record) > 8 else None
+            header = record[9] if len(record) > 9 else None
+            frame_texts = record[10] if len(record) > 10 else None
+            files.append(
+                FileRecord(
+                    FileHandlerType.SEQUENCE,
+                    directory,
+                    prefix,
+                    extension,
+                    FrameSet.from_runs(runs),
+                    delimiter,
+                    padding,
+                    suffix,
+                    stats=SequenceStats.from_json(stats) if stats is not None else None,
+                    header=_read_header(header),
+                    frame_texts=dict(frame_texts) if frame_texts else None,
+                )
+            )
+        elif kind == "movie":
+            movie = record[5] if len(record) > 5 else None
+            files.append(
+                FileRecord.from_file_name(
+                    directory,
+                    record[2],
+                    FileHandlerType.MOVIE,
+                    (record[3], record[4]),
+                    movie=MovieInfo.from_json(movie) if movie is not None else None,
+                )
+            )
+        elif kind == "single":
+            header = _read_header(record[3] if len(record) > 3 else None)
+            files.append(FileRecord.from_file_name(directory, record[2], header=header))
+        else:
+            raise ValueError(f"Unknown manifest record type {kind}")
+
+    return root, directories, files
@@ -1,136 +1,872 @@
-from dataclasses import dataclass
+import os
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional
-import pysequitur
-from pysequitur import crawl
-from pysequitur.crawl import Node
-from nhp.read_tools.read_wrapper import ImageFile
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from nhp.read_tools.frame_set import FrameSet
+from nhp.read_tools.movie_probe import MovieInfo, format_frame_rate
+from nhp.read_tools.read_wrapper import FileHandlerType, ImageFile
+from nhp.read_tools.recursive_loader_gui import manifest, scan_client, scanner
+from nhp.read_tools.recursive_loader_gui.frame_stats import format_size
+from nhp.read_tools.recursive_loader_gui.image_headers import ImageHeader
+from nhp.read_tools.recursive_loader_gui.record_filter import FilterIndex, RecordFilter
+from nhp.read_tools.recursive_loader_gui.records import FileRecord, RecordStore
+from nhp.read_tools.recursive_loader_gui.scan_index import ScanIndex
+from nhp.read_tools.recursive_loader_gui.scanner import ScanNode, ScanOptions, VisitedDirectories
+from nhp.read_tools.recursive_loader_gui.versions import VersionIndex
+
+# Levels below the roots listed by a lazy scan, deeper directories are listed when expanded
+LAZY_DEPTH = 1
+
+
+# Runs of missing or truncated frames listed in the Range column, the rest are
+# summed up by the count
+MAX_LISTED_RUNS = 3
+
+
+def format_runs(frames: FrameSet, limit: Optional[int] = None) -> str:
+    """Format the runs of a frame set, e.g. 1107, 1180-1181, at most limit of them"""
+    runs = frames.ranges()
+    text = ", ".join(
+        str(start) if start == end else f"{start}-{end}" for start, end in runs[:limit]
+    )
+    if limit is not None and len(runs) > limit:
+        text += ", ..."
+    return text
+
+
+def format_frame_range(file: FileRecord) -> str:
+    """Get frame range string for a file, with the missing and truncated frames of a sequence"""
+    if file.frame_count > 1:
+        text = f"{file.first_frame()}-{file.last_frame()}"
+        missing = file.frames.missing
+        if missing:
+            text += f" ({missing} missing: {format_runs(file.frames.gaps(), MAX_LISTED_RUNS)})"
+        if file.stats is not None and file.stats.truncated:
+            truncated = file.stats.truncated
+            text += f" ({len(truncated)} truncated: {format_runs(truncated, MAX_LISTED_RUNS)})"
+        return text
+    elif file.frame_count == -1:
+        return "Unknown"
+    else:
+        return "Single Frame"
+
+
+def format_movie(movie: MovieInfo) -> str:
+    """Get the frame rate and start timecode of a movie, e.g. 24 fps from 01:00:00:00"""
+    text = format_frame_rate(movie.frame_rate)
+    if movie.timecode is not None:
+        text += f" from {movie.timecode}"
+    return text
+
+
+def format_frame_details(file: FileRecord) -> str:
+    """
+    Get every missing and truncated frame of a file and its frame sizes, or the frame
+    rate and timecode of a movie, empty if there are none
+    """
+    lines = []
+    if file.movie is not None:
+        lines.append(format_movie(file.movie))
+    if file.frames.missing:
+        lines.append(f"Missing: {format_runs(file.frames.gaps())}")
+    stats = file.stats
+    if stats is not None:
+        if stats.truncated:
+            lines.append(f"Truncated: {format_runs(stats.truncated)}")
+        lines.append(
+            f"{format_size(stats.total_bytes)} in {len(file.frames)} frames,"
+            f" median {format_size(stats.median_bytes)}"
+        )
+    return "\n".join(lines)
+
+
+# Layers named in the Channels column, the rest are summed up by the count
+MAX_LISTED_LAYERS = 4
+
+
+def format_layers(header: ImageHeader) -> str:
+    """Get the layers of an image, e.g. rgba, diffuse, specular (+3)"""
+    layers = header.layers
+    text = ", ".join(layers[:MAX_LISTED_LAYERS])
+    if len(layers) > MAX_LISTED_LAYERS:
+        text += f" (+{len(layers) - MAX_LISTED_LAYERS})"
+    return text
+
+
+def format_header(header: ImageHeader) -> str:
+    """Get a header as one line, e.g. 2048x1080 rgba half zip"""
+    return f"{header.resolution} {format_layers(header)} {header.pixel_type} {header.compression}"
+
+
+# Contents still to be placed below a lazily built node: the path parts below
+# it, the files of that directory and its path if it was not scanned yet
+_PendingEntry = Tuple[Tuple[str, ...], List[FileRecord], Optional[Path]]
 
 
-@dataclass
 class DirectoryTree:
-    """Represents a directory in the file system with its contents"""
-    name: str
-    path: str
-    subdirs: List['DirectoryTree']
-    files: List[ImageFile]
+    """
+    Represents a directory in the file system with its contents
+
+    Children are indexed by name, so building a tree is linear in the number of
+    directories however wide it is. A tree built lazily only creates the
+    subdirectories of a node the first time they are asked for.
+    """
+
+    __slots__ = ("name", "path", "files", "unscanned", "_children", "_subdirs", "_pending")
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        subdirs: Optional[List['DirectoryTree']] = None,
+        files: Optional[List[FileRecord]] = None,
+        unscanned: Optional[Path] = None,
+    ):
+        self.name = name
+        self.path = path
+        self.files: List[FileRecord] = files if files is not None else []
+        # Absolute path of a directory a lazy scan found but has not listed yet
+        self.unscanned = unscanned
+        self._children: dict[str, DirectoryTree] = {}
+        self._subdirs: List[DirectoryTree] = []
+        self._pending: Optional[List[_PendingEntry]] = None
+        for subdir in subdirs or ():
+            self.add_subdir(subdir)
+
+    def __repr__(self) -> str:
+        return f"DirectoryTree({self.name!r}, {self.path!r})"
+
+    @property
+    def subdirs(self) -> List['DirectoryTree']:
+        """Get the subdirectories, use add_subdir to add one"""
+        if self._pending is not None:
+            self._materialize()
+        return self._subdirs
+
+    def add_subdir(self, subdir: 'DirectoryTree') -> None:
+        if self._pending is not None:
+            self._materialize()
+        self._children[subdir.name] = subdir
+        self._subdirs.append(subdir)
+
+    def child(self, name: str) -> 'DirectoryTree':
+        """Get the subdirectory called name, creating it if needed"""
+        node = self._children.get(name)
+        if node is None:
+            node = DirectoryTree(name, f"{self.path}{os.sep}{name}" if self.path else name)
+            self._children[name] = node
+            self._subdirs.append(node)
+        return node
+
+    def walk(self) -> Iterator['DirectoryTree']:
+        """Yield this node and every node below it, parents before their children"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.subdirs))
+
+    def _materialize(self) -> None:
+        """Create the subdirectories of the pending entries, deferring what lies below them"""
+        pending, self._pending = self._pending, None
+        for parts, files, unscanned in pending or ():
+            node = self.child(parts[0])
+            if len(parts) == 1:
+                node.files = files
+                node.unscanned = unscanned
+                continue
+            if node._pending is None:
+                node._pending = []
+            node._pending.append((parts[1:], files, unscanned))
 
     @classmethod
-    def build_from_files(cls, files: List[ImageFile], base_dir: Path) -> 'DirectoryTree':
-        """Build a directory tree from a list of files"""
-        # Create root node
-        root = cls("", "", [], [])
-        
+    def build_from_files(
+        cls,
+        files: List[FileRecord],
+        base_dir: Path,
+        unscanned: Iterable[Path] = (),
+        lazy: bool = False,
+    ) -> 'DirectoryTree':
+        """
+        Build a directory tree from a list of files
+        The directories in unscanned are added as empty nodes that still need to be listed.
+        """
         # First, organize files by directory
-        dir_files: dict[str, List[ImageFile]] = {}
+        dir_files: dict[Path, List[FileRecord]] = {}
         for image_file in files:
-            rel_path = str(image_file.directory.relative_to(base_dir))
-            if rel_path not in dir_files:
-                dir_files[rel_path] = []
-            dir_files[rel_path].append(image_file)
-        
-        # Build the tree structure
-        for dir_path, files in dir_files.items():
-            if not dir_path:  # Root directory
-                root.files = files
-                continue
-            
-            parts = Path(dir_path).parts
-            current = root
-            
-            # Create path in tree
-            for i, part in enumerate(parts):
-                # Find or create subdirectory
-                found = False
-                for subdir in current.subdirs:
-                    if subdir.name == part:
-                        current = subdir
-                        found = True
-                        break
-                
-                if not found:
-                    path = str(Path(*parts[:i+1]))
-                    new_node = cls(part, path, [], [])
-                    current.subdirs.append(new_node)
-                    current = new_node
-            
-            # Add files to the current directory
-            current.files = files
-            
+            directory = image_file.directory
+            if directory not in dir_files:
+                dir_files[directory] = []
+            dir_files[directory].append(image_file)
+        return cls.build_from_directories(dir_files, base_dir, unscanned, lazy)
+
+    @classmethod
+    def build_from_directories(
+        cls,
+        directories: dict[Path, List[FileRecord]],
+        base_dir: Path,
+        unscanned: Iterable[Path] = (),
+        lazy: bool = False,
+    ) -> 'DirectoryTree':
+        """
+        Build a directory tree from files grouped by directory
+        Args:
+            directories: Files of each directory, directories without files are left out
+            base_dir: Directory of the root node, every directory must be below it
+            unscanned: Directories added as empty nodes that still need to be listed
+            lazy: Only create the subdirectories of a node when they are first asked for
+        """
+        root = cls("", "")
+        base_parts = base_dir.parts
+        depth = len(base_parts)
+
+        def relative_parts(directory: Path) -> Tuple[str, ...]:
+            # Compared once per directory instead of calling relative_to for every file
+            parts = directory.parts
+            if parts[:depth] != base_parts:
+                raise ValueError(f"{directory} is not in the subpath of {base_dir}")
+            return parts[depth:]
+
+        entries: List[_PendingEntry] = [
+            (relative_parts(directory), files, None)
+            for directory, files in directories.items()
+            if files
+        ]
+        entries.extend((relative_parts(directory), [], directory) for directory in unscanned)
+
+        root._pending = []
+        for entry in entries:
+            if entry[0]:
+                root._pending.append(entry)
+            else:  # Root directory
+                root.files = entry[1]
+                root.unscanned = entry[2]
+
+        if not lazy:
+            # Breadth first so every node is materialized once, after all its entries arrived
+            level = [root]
+            while level:
+                level = [child for node in level for child in node.subdirs]
         return root
 
 
+@dataclass
+class ScanDiff:
+    """Changes made to the Model by refreshing part of a scan"""
+    added: List[FileRecord] = field(default_factory=list)
+    removed: List[FileRecord] = field(default_factory=list)
+    changed: List[FileRecord] = field(default_factory=list)
+    added_directories: List[Path] = field(default_factory=list)
+    removed_directories: List[Path] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (
+            self.added
+            or self.removed
+            or self.changed
+            or self.added_directories
+            or self.removed_directories
+        )
+
+
 class Model:
-    def __init__(self):
-        self._ImageFiles: List[ImageFile] = []
-        self._current_directory: Optional[Path] = None
-        self._node: Optional[Node] = None
-        self._display_order: List[ImageFile] = []  #
-        self.ImageFileById: dict[int, ImageFile] = {}
-
-    def scan_directory(self, directory: Path) -> None:
-        """Scan directory for sequences"""
-        self._current_directory = directory
-        self._ImageFiles.clear()
-        self._display_order.clear()
-        
-        root_node = pysequitur.crawl.recursive_scan(directory)
-        crawl.visualize_tree(root_node)
-        
-        id = 0
-        
-        # First collect all files
-        for results in crawl.traverse_nodes(root_node):
-            for sequence in results.sequences:
-                image_file = ImageFile.from_file_sequence(sequence)
-                image_file.id = id
-                self._ImageFiles.append(image_file)
-                self.ImageFileById[id] = image_file
-                id += 1
-            for movie in results.movs:
-                image_file = ImageFile.from_path(movie)
-                image_file.id = id
-                self._ImageFiles.append(image_file)
-                self.ImageFileById[id] = image_file
-                id += 1
-                # self._ImageFiles.append(ImageFile.from_path(movie))
-            for rogue in results.rogues:
-                image_file = ImageFile.from_path(rogue)
-                image_file.id = id
-                self._ImageFiles.append(image_file)
-                self.ImageFileById[id] = image_file
-                id += 1
-                # self._ImageFiles.append(ImageFile.from_path(rogue))
-            
-        # Then sort them by directory to match display order
-        self._display_order = sorted(self._ImageFiles, key=lambda x: str(x.get_path()))
-        self._node = root_node
-
-    def build_directory_tree(self) -> Optional[DirectoryTree]:
-        """Build a directory tree from the current files"""
-        if not self._current_directory or not self._ImageFiles:
+    def __init__(
+        self,
+        max_workers: int = scanner.DEFAULT_MAX_WORKERS,
+        index: Optional[ScanIndex] = None,
+        daemon_socket: Optional[Path] = None,
+    ):
+        self._roots: List[Path] = []
+        self.max_workers = max_workers
+        self.index = index
+        # Scans are asked from the scan daemon on this socket first, None scans directly
+        self.daemon_socket = daemon_socket
+        self.options = ScanOptions()
+        self.visited = VisitedDirectories()
+        # One compact record per file, handlers are only created for the files loaded
+        self.records = RecordStore()
+        self.versions = VersionIndex()
+        self.filters = FilterIndex()
+        self._files_by_directory: dict[Path, List[FileRecord]] = {}
+        # Only list LAZY_DEPTH levels, deeper directories wait in _unscanned until expanded
+        self.lazy = False
+        self._unscanned: set[Path] = set()
+
+    def scan_directory(
+        self,
+        directory: Path,
+        max_workers: Optional[int] = None,
+        options: Optional[ScanOptions] = None,
+    ) -> None:
+        """
+        Scan directory for sequences
+        Args:
+            directory: Root directory to scan
+            max_workers: Number of directories listed at once, defaults to the model's
+            options: Filters applied during the walk, they become the model's options
+        """
+        self.scan_directories([directory], max_workers, options)
+
+    def scan_directories(
+        self,
+        directories: List[Path],
+        max_workers: Optional[int] = None,
+        options: Optional[ScanOptions] = None,
+    ) -> None:
+        """
+        Scan several roots concurrently into one session, takes the same arguments as scan_directory
+        """
+        if options is not None:
+            self.options = options
+        if not self.lazy and self.query_daemon(directories):
+            return
+
+        self.begin_scan(directories)
+        nodes = scanner.iter_scan_roots(
+            directories,
+            max_workers or self.max_workers,
+            index=self.index,
+            options=self.options,
+            visited=self.visited,
+            expand=self.expand_filter(),
+        )
+        self.add_nodes(nodes)
+
+    def expand_filter(self) -> Optional[Callable[[Path, int], bool]]:
+        """
+        Get the expand filter for a walk of the roots, None walks everything
+        Lazy walks stop at LAZY_DEPTH but still list the directories expanded so far.
+        """
+        if not self.lazy:
+            return None
+        scanned = set(self._files_by_directory)
+        return lambda path, depth: depth <= LAZY_DEPTH or path in scanned
+
+    def expand_directories(self, directories: List[Path], recursive: bool = False) -> ScanDiff:
+        """
+        List directories a lazy scan left unscanned and add them to the model
+        Args:
+            directories: Unscanned directories to list, others are ignored
+            recursive: Walk everything below them, otherwise their own subdirectories stay unscanned
+        """
+        directories = [directory for directory in directories if directory in self._unscanned]
+        nodes = scanner.iter_scan_roots(
+            directories,
+            self.max_workers,
+            index=self.index,
+            options=self.options,
+            visited=self.visited,
+            depths=[self.depth_of(directory) for directory in directories],
+            expand=None if recursive else scanner.skip_subdirectories,
+        )
+        return self.apply_expansion(nodes)
+
+    def apply_expansion(self, nodes: Iterable[ScanNode]) -> ScanDiff:
+        """Add the nodes of a walk below the scanned directories, such as an expanded directory"""
+        diff = ScanDiff()
+        nodes = [node for node in nodes if node.path not in self._files_by_directory]
+        diff.added.extend(self.add_nodes(nodes))
+        diff.added_directories.extend(node.path for node in nodes)
+        return diff
+
+    def query_daemon(
+        self, directories: List[Path], cancel: Optional[threading.Event] = None
+    ) -> bool:
+        """
+        Replace the current scan with the scan daemon's scans of directories
+        Returns False, leaving the model untouched, unless the daemon answered for every root.
+        """
+        if self.daemon_socket is None:
+            return False
+        results = scan_client.query_scans(directories, self.options, self.daemon_socket, cancel)
+        if results is None:
+            return False
+        self.load_scans(results)
+        return True
+
+    def begin_scan(self, roots: List[Path]) -> None:
+        """Reset the model before the nodes of a new scan are added"""
+        self._roots = list(roots)
+        self.records.clear()
+        self.versions.clear()
+        self.filters.clear()
+        self._files_by_directory.clear()
+        self._unscanned.clear()
+        self.visited = VisitedDirectories()
+
+    def add_nodes(self, nodes: Iterable[ScanNode]) -> List[FileRecord]:
+        """Add the contents of scanned nodes and return the records created for them"""
+        added: List[FileRecord] = []
+
+        for results in nodes:
+            self._files_by_directory.setdefault(results.path, [])
+            self._unscanned.discard(results.path)
+            self._unscanned.update(results.path / name for name in results.unscanned)
+            for record in self._records_for(results):
+                added.append(self._add_record(record))
+
+        return added
+
+    def refresh_directory(self, directory: Path) -> ScanDiff:
+        """
+        Re-read a single scanned directory and patch the model to match it
+        Files keep their id when only their frame range changed. New subdirectories
+        are scanned in full, vanished ones are dropped with everything below them.
+        """
+        if directory not in self._files_by_directory:
+            return ScanDiff()
+        if not directory.is_dir():
+            return self.remove_directories([directory])
+
+        nodes = scanner.iter_scan_roots(
+            [directory],
+            self.max_workers,
+            index=self.index,
+            options=self.options,
+            visited=self.visited,
+            depths=[self.depth_of(directory)],
+            expand=self.refresh_filter(),
+        )
+        return self.apply_refresh([directory], list(nodes))
+
+    def refresh_filter(self) -> Callable[[Path, int], bool]:
+        """
+        Get the expand filter for a walk of changed directories
+        Only subdirectories the model doesn't know are walked, and only when it isn't lazy.
+        """
+        if self.lazy:
+            return scanner.skip_subdirectories
+        known = set(self._files_by_directory) | self._unscanned
+        return lambda path, depth: path not in known
+
+    def remove_directories(self, directories: List[Path]) -> ScanDiff:
+        """Drop scanned directories that are gone from disk, with everything below them"""
+        diff = ScanDiff()
+        for directory in directories:
+            if directory in self._files_by_directory:
+                self._remove_directory_tree(directory, diff)
+        return diff
+
+    def apply_refresh(self, directories: List[Path], nodes: List[ScanNode]) -> ScanDiff:
+        """
+        Patch the model with a walk of changed directories made with refresh_filter
+        Args:
+            directories: Changed directories, the roots of the walk
+            nodes: Every node of the walk, those below the roots are new subdirectories
+        """
+        diff = ScanDiff()
+        refreshed = {node.path: node for node in nodes if node.path in directories}
+        for directory, node in refreshed.items():
+            if directory not in self._files_by_directory:
+                continue
+            self._patch_directory(directory, self._records_for(node), diff)
+
+            subdirs = {child.path.name for child in node.dirs} | set(node.unscanned)
+            for known in list(self._files_by_directory):
+                if known.parent == directory and known.name not in subdirs:
+                    self._remove_directory_tree(known, diff)
+            self._forget_unscanned(
+                [d for d in self._unscanned if d.parent == directory and d.name not in subdirs],
+                diff,
+            )
+            for name in node.unscanned:
+                subdir = directory / name
+                if subdir not in self._files_by_directory and subdir not in self._unscanned:
+                    # Left for the user to expand, like the rest of a lazy scan
+                    self._unscanned.add(subdir)
+                    diff.added_directories.append(subdir)
+
+        new_nodes = [
+            node
+            for node in nodes
+            if node.path not in refreshed and node.path not in self._files_by_directory
+        ]
+        diff.added.extend(self.add_nodes(new_nodes))
+        diff.added_directories.extend(node.path for node in new_nodes)
+        return diff
+
+    def rescan(
+        self,
+        roots: Optional[List[Path]] = None,
+        max_workers: Optional[int] = None,
+        options: Optional[ScanOptions] = None,
+    ) -> ScanDiff:
+        """
+        Scan the roots again and patch the model to match them
+        Args:
+            roots: Roots of the new scan, defaults to the current ones. Files of
+                dropped roots are removed, added roots are scanned in full
+            max_workers: Number of directories listed at once, defaults to the model's
+            options: Filters applied during the walk, they become the model's options
+        """
+        roots = list(roots or self._roots)
+        if not roots:
+            raise ValueError("Nothing has been scanned")
+        if options is not None:
+            self.options = options
+
+        if self.daemon_socket is not None and not self.lazy:
+            results = scan_client.query_scans(roots, self.options, self.daemon_socket)
+            if results is not None:
+                return self.apply_loaded_rescan(results)
+
+        visited = VisitedDirectories()
+        nodes = scanner.iter_scan_roots(
+            roots,
+            max_workers or self.max_workers,
+            index=self.index,
+            options=self.options,
+            visited=visited,
+            expand=self.expand_filter(),
+        )
+        return self.apply_rescan(roots, list(nodes), visited)
+
+    def apply_rescan(
+        self, roots: List[Path], nodes: List[ScanNode], visited: VisitedDirectories
+    ) -> ScanDiff:
+        """
+        Patch the model to match a complete walk of roots
+        Args:
+            roots: Roots of the walk, they replace the model's
+            nodes: Every node of the walk
+            visited: Directories claimed by the walk, they replace the model's
+        """
+        files = [record for node in nodes for record in self._records_for(node)]
+        unscanned = [node.path / name for node in nodes for name in node.unscanned]
+        return self._apply_rescan(roots, [node.path for node in nodes], files, visited, unscanned)
+
+    def apply_loaded_rescan(
+        self, results: List[Tuple[Path, List[Path], List[FileRecord], dict[Path, Path]]]
+    ) -> ScanDiff:
+        """Patch the model to match the scans of its roots answered by the scan daemon"""
+        visited = VisitedDirectories()
+        directories: List[Path] = []
+        files: List[FileRecord] = []
+        for _, root_directories, root_files, aliases in results:
+            directories.extend(root_directories)
+            files.extend(root_files)
+            visited.aliases.update(aliases)
+        return self._apply_rescan([result[0] for result in results], directories, files, visited)
+
+    def _apply_rescan(
+        self,
+        roots: List[Path],
+        directories: List[Path],
+        files: List[FileRecord],
+        visited: VisitedDirectories,
+        unscanned: Iterable[Path] = (),
+    ) -> ScanDiff:
+        """Match the registered files to a fresh scan by key, files only changed in range keep their id"""
+        diff = ScanDiff()
+        unscanned = set(unscanned)
+        diff.removed_directories.extend(self._unscanned - unscanned - set(directories))
+        diff.added_directories.extend(unscanned - self._unscanned)
+        self._unscanned = unscanned
+        by_directory: dict[Path, List[FileRecord]] = {directory: [] for directory in directories}
+        for record in files:
+            by_directory.setdefault(record.directory, []).append(record)
+
+        for known in list(self._files_by_directory):
+            if known not in by_directory:
+                self._remove_directory(known, diff)
+
+        for directory, records in by_directory.items():
+            if directory not in self._files_by_directory:
+                diff.added_directories.append(directory)
+            self._patch_directory(directory, records, diff)
+
+        self._roots = list(roots)
+        self.visited = visited
+        return diff
+
+    def save_manifest(self, path: Path) -> None:
+        """Write the current scan to a manifest file, rooted at the common directory of the roots"""
+        if not self._roots:
+            raise ValueError("Nothing has been scanned")
+        root = Path(os.path.commonpath(self._roots))
+        manifest.save_manifest(path, root, self.directories, self.records.in_path_order())
+
+    def load_manifest(self, path: Path) -> None:
+        """Replace the current scan with the contents of a manifest, without touching the filesystem"""
+        self.load_scan(*manifest.load_manifest(path))
+
+    def search(self, query: str, root: Optional[Path] = None) -> List[FileRecord]:
+        """
+        Replace the current scan with the indexed files matching query, without walking the filesystem
+        Args:
+            query: Whitespace separated terms that must all appear in the file path
+            root: Only search below this directory, defaults to every indexed root
+        """
+        if self.index is None:
+            raise ValueError("Searching needs a scan index")
+        files = self.index.search(query, root)
+        directories = sorted({record.directory for record in files})
+        if root is None and directories:
+            root = Path(os.path.commonpath(directories))
+        self.load_scans([(root, directories, files, {})] if root else [])
+        return files
+
+    def load_scan(
+        self,
+        root: Path,
+        directories: List[Path],
+        files: List[FileRecord],
+        aliases: Optional[dict[Path, Path]] = None,
+    ) -> None:
+        """Replace the current scan with files scanned elsewhere"""
+        self.load_scans([(root, directories, files, aliases or {})])
+
+    def load_scans(
+        self, results: List[Tuple[Path, List[Path], List[FileRecord], dict[Path, Path]]]
+    ) -> None:
+        """Replace the current scan with the (root, directories, files, aliases) of roots scanned elsewhere"""
+        self.begin_scan([result[0] for result in results])
+        for _, directories, files, aliases in results:
+            self.visited.aliases.update(aliases)
+            for directory in directories:
+                self._files_by_directory.setdefault(directory, [])
+            for record in files:
+                self._add_record(record)
+
+    @property
+    def aliases(self) -> dict[Path, Path]:
+        """Get the directories that were skipped because they alias another walked directory"""
+        return dict(self.visited.aliases)
+
+    @property
+    def directories(self) -> List[Path]:
+        """Get every directory covered by the current scan"""
+        return list(self._files_by_directory)
+
+    def _records_for(self, node: ScanNode) -> List[FileRecord]:
+        """Create the records of a scanned node without registering them"""
+        # Every record of the node shares its directory Path
+        directory = node.path
+        records = []
+        for sequence in node.sequences:
+            name = sequence.get_path().name
+            records.append(
+                FileRecord.from_sequence(sequence, node.stats.get(name), node.headers.get(name))
+            )
+        records.extend(
+            FileRecord.from_file_name(
+                directory, movie.name, FileHandlerType.MOVIE, movie=node.movies.get(movie.name)
+            )
+            for movie in node.movs
+        )
+        records.extend(
+            FileRecord.from_file_name(
+                directory, rogue.name, header=node.headers.get(rogue.name)
+            )
+            for rogue in node.rogues
+        )
+        return records
+
+    def _add_record(self, record: FileRecord) -> FileRecord:
+        """Assign the next id to a record and register it"""
+        self.records.add(record)
+        self.versions.add(record)
+        self.filters.add(record)
+        self._files_by_directory.setdefault(record.directory, []).append(record)
+        return record
+
+    def _replace_record(self, old: FileRecord, new: FileRecord) -> FileRecord:
+        """Swap a registered record for a newer version of it, keeping its id"""
+        self.records.replace(old, new)
+        self.versions.remove(old)
+        self.versions.add(new)
+        self.filters.remove(old)
+        self.filters.add(new)
+        siblings = self._files_by_directory[old.directory]
+        siblings[siblings.index(old)] = new
+        return new
+
+    def _remove_record(self, record: FileRecord) -> None:
+        """Unregister a record"""
+        self.records.remove(record)
+        self.versions.remove(record)
+        self.filters.remove(record)
+        self._files_by_directory[record.directory].remove(record)
+
+    def _patch_directory(
+        self, directory: Path, records: List[FileRecord], diff: ScanDiff
+    ) -> None:
+        """Match the registered files of a directory to a fresh listing of it by key"""
+        previous = {self._file_key(f): f for f in self._files_by_directory.setdefault(directory, [])}
+        for record in records:
+            old = previous.pop(self._file_key(record), None)
+            if old is None:
+                diff.added.append(self._add_record(record))
+            elif self._contents(old) != self._contents(record):
+                diff.changed.append(self._replace_record(old, record))
+        for old in previous.values():
+            self._remove_record(old)
+            diff.removed.append(old)
+
+    def _remove_directory(self, directory: Path, diff: ScanDiff) -> None:
+        """Unregister a single directory and its files"""
+        for record in list(self._files_by_directory[directory]):
+            self._remove_record(record)
+            diff.removed.append(record)
+        del self._files_by_directory[directory]
+        diff.removed_directories.append(directory)
+
+    def _remove_directory_tree(self, directory: Path, diff: ScanDiff) -> None:
+        """Unregister a directory, its subdirectories and all of their files"""
+        for known in list(self._files_by_directory):
+            if known == directory or directory in known.parents:
+                self._remove_directory(known, diff)
+        self._forget_unscanned(
+            [d for d in self._unscanned if d == directory or directory in d.parents], diff
+        )
+        self.visited.forget(directory)
+
+    def _forget_unscanned(self, directories: List[Path], diff: ScanDiff) -> None:
+        """Drop unscanned directories that are gone"""
+        self._unscanned.difference_update(directories)
+        diff.removed_directories.extend(directories)
+
+    def depth_of(self, directory: Path) -> int:
+        """Get how many levels below its scanned root a directory is"""
+        root = self.root_of(directory)
+        if root is None:
+            return 0
+        return len(directory.relative_to(root).parts)
+
+    @staticmethod
+    def _file_key(record: FileRecord) -> str:
+        """Identify a file across scans by its path, which holds the frame pattern"""
+        return str(record.get_path())
+
+    @staticmethod
+    def _contents(record: FileRecord) -> tuple:
+        """
+        What a rescan compares, a record is replaced when its range, frame strings,
+        frame sizes, header or movie probe changed
+        """
+        return (
+            record.first_frame(),
+            record.last_frame(),
+            record.frame_count,
+            record.frame_texts,
+            record.stats,
+            record.header,
+            record.movie,
+        )
+
+    def build_directory_tree(self, lazy: bool = False) -> Optional[DirectoryTree]:
+        """
+        Build a directory tree from the current files
+        With several roots, each root is a sibling subtree named after its full path.
+        Args:
+            lazy: Only create the subdirectories of a node when they are first asked for
+        """
+        if not self._roots or not (self.records or self._unscanned):
             return None
-        return DirectoryTree.build_from_files(self._ImageFiles, self._current_directory)
+        # The files are already grouped by directory, in registration order
+        if len(self._roots) == 1:
+            return DirectoryTree.build_from_directories(
+                self._files_by_directory, self._roots[0], self._unscanned, lazy
+            )
+
+        directories_by_root: dict[Path, dict[Path, List[FileRecord]]] = {
+            root: {} for root in self._roots
+        }
+        for directory, files in self._files_by_directory.items():
+            if files:
+                directories_by_root[self.root_of(directory)][directory] = files
+        unscanned_by_root: dict[Path, List[Path]] = {root: [] for root in self._roots}
+        for directory in self._unscanned:
+            unscanned_by_root[self.root_of(directory)].append(directory)
 
-    def get_sequence(self, index: int) -> ImageFile:
+        tree = DirectoryTree("", "")
+        for root, directories in directories_by_root.items():
+            if not directories and not unscanned_by_root[root]:
+                continue
+            subtree = DirectoryTree.build_from_directories(
+                directories, root, unscanned_by_root[root], lazy
+            )
+            # Named after the root, the paths below stay relative to it
+            subtree.name = str(root)
+            tree.add_subdir(subtree)
+        return tree
+
+    def get_sequence(self, index: int) -> FileRecord:
         """Get sequence at specific index"""
-        return self._display_order[index]
+        return self.records.in_path_order()[index]
     
-    def get_all_sequences(self) -> List[ImageFile]:
+    def files_to_load(self, ids: List[int], latest: Optional[int] = None) -> List[ImageFile]:
+        """
+        Get the file handlers to create Read nodes for, only these handlers are created
+        Args:
+            ids: Ids of the files picked by the user
+            latest: Load only this many of the newest versions of each picked element,
+                None loads exactly the picked files
+        """
+        records = [self.records[id] for id in ids]
+        if latest is not None:
+            records = self.versions.latest(records, latest)
+        return [self.records.handler(record.id) for record in records]
+
+    def filter_records(self, record_filter: RecordFilter) -> set[int]:
+        """
+        Get the ids of the files the filter shows
+        Raises re.error if the filter's regex is invalid.
+        """
+        return self.filters.match(record_filter)
+
+    def files_below(self, directories: List[Path]) -> List[FileRecord]:
+        """Get the files of directories and of everything scanned below them"""
+        return [
+            record
+            for directory, files in self._files_by_directory.items()
+            if any(d == directory or d in directory.parents for d in directories)
+            for record in files
+        ]
+
+    def get_all_sequences(self) -> List[FileRecord]:
         """Get all found sequences in display order"""
-        return self._display_order
+        return self.records.in_path_order()
         
     def clear(self) -> None:
         """Clear all sequences"""
-        self._ImageFiles.clear()
-        self._current_directory = None
-        
+        self.records.clear()
+        self._files_by_directory.clear()
+        self.versions.clear()
+        self.filters.clear()
+        self._unscanned.clear()
+        self._roots = []
+
     @property
     def current_directory(self) -> Optional[Path]:
-        """Get current directory being scanned"""
-        return self._current_directory
+        """Get the first root being scanned"""
+        return self._roots[0] if self._roots else None
+
+    @property
+    def roots(self) -> List[Path]:
+        """Get every root being scanned"""
+        return list(self._roots)
+
+    @property
+    def unscanned_directories(self) -> List[Path]:
+        """Get the directories a lazy scan found but did not list yet"""
+        return sorted(self._unscanned)
+
+    def is_unscanned(self, directory: Path) -> bool:
+        return directory in self._unscanned
+
+    def is_scanned(self, directory: Path) -> bool:
+        return directory in self._files_by_directory
+
+    def root_of(self, directory: Path) -> Optional[Path]:
+        """Get the innermost root a directory was scanned under"""
+        for root in sorted(self._roots, key=lambda x: len(x.parts), reverse=True):
+            if root == directory or root in directory.parents:
+                return root
+        return None
     
     @property
     def sequence_count(self) -> int:
         """Get number of sequences found"""
-        return len(self._ImageFiles)
\ No newline at end of file
+        return len(self.records)
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+Filtering of scanned files for the list
+
+The fields a filter tests are computed once per record by the FilterIndex, so
+refiltering while the user types only compares strings and numbers. A filter that
+narrows the previous one is only tested against what the previous one let through.
+"""
+import re
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Iterable, Optional, Pattern, Set, Tuple
+
+from nhp.read_tools.recursive_loader_gui.records import FileRecord
+
+
+def frame_count_of(record: FileRecord) -> int:
+    """Get the number of frames a record has, a movie whose range is unknown still has one"""
+    return max(len(record.frames), 1)
+
+
+def has_gaps(record: FileRecord, frame_count: int) -> bool:
+    return frame_count < record.frames.span
+
+
+@dataclass(frozen=True)
+class RecordFilter:
+    """
+    What the list shows, files must pass every test that is set
+    Attributes:
+        text: Substring of the file name, case insensitive. Empty matches every name
+        regex: Search text as a regular expression instead
+        extensions: Lowercase extensions to show, without the dot. None shows every one
+        min_frames: Files with fewer frames are hidden
+        gaps_only: Only show sequences with missing frames
+    """
+    text: str = ""
+    regex: bool = False
+    extensions: Optional[frozenset[str]] = None
+    min_frames: int = 1
+    gaps_only: bool = False
+
+    def is_empty(self) -> bool:
+        return (
+            not self.text and self.extensions is None and self.min_frames <= 1 and not self.gaps_only
+        )
+
+    @cached_property
+    def pattern(self) -> Optional[Pattern[str]]:
+        """The compiled text, raises re.error for an invalid regex"""
+        if not self.text:
+            return None
+        return re.compile(self.text if self.regex else re.escape(self.text), re.IGNORECASE)
+
+    def validate(self) -> None:
+        """Raise re.error if the text is not a valid regex"""
+        self.pattern  # Compiled on first use
+
+    def matches(self, record: FileRecord) -> bool:
+        """Test a single record, FilterIndex.match tests a whole scan"""
+        if self.extensions is not None and record.extension.lower() not in self.extensions:
+            return False
+        frame_count = frame_count_of(record)
+        if frame_count < self.min_frames or (self.gaps_only and not has_gaps(record, frame_count)):
+            return False
+        return self.pattern is None or self.pattern.search(record.file_name) is not None
+
+    def narrows(self, other: "RecordFilter") -> bool:
+        """Check that everything this filter accepts, other accepts as well"""
+        if other.text and not (
+            (self.text == other.text and self.regex == other.regex)
+            or (not self.regex and not other.regex and other.text.lower() in self.text.lower())
+        ):
+            return False
+        if other.extensions is not None and (
+            self.extensions is None or not self.extensions <= other.extensions
+        ):
+            return False
+        return self.min_frames >= other.min_frames and (self.gaps_only or not other.gaps_only)
+
+
+class FilterIndex:
+    """
+    The filter fields of every record of a scan, kept up to date as files come and go
+    Each field is kept in a column of its own, a filter only walks the columns it tests.
+    Fields are computed on the first filtering after a record was added, so scans don't
+    pay for them.
+    """
+
+    def __init__(self):
+        # Lowercase file name, lowercase extension and frame count by id
+        self._names: Dict[int, str] = {}
+        self._extensions: Dict[int, str] = {}
+        self._frame_counts: Dict[int, int] = {}
+        # Ids of the sequences with missing frames
+        self._gaps: Set[int] = set()
+        self._pending: Dict[int, FileRecord] = {}
+        # The last filter and the ids it accepted, dropped when a record changes
+        self._last: Optional[Tuple[RecordFilter, Set[int]]] = None
+
+    def add(self, record: FileRecord) -> None:
+        self._pending[record.id] = record
+        self._last = None
+
+    def remove(self, record: FileRecord) -> None:
+        id = record.id
+        self._names.pop(id, None)
+        self._extensions.pop(id, None)
+        self._frame_counts.pop(id, None)
+        self._gaps.discard(id)
+        self._pending.pop(id, None)
+        self._last = None
+
+    def clear(self) -> None:
+        self._names.clear()
+        self._extensions.clear()
+        self._frame_counts.clear()
+        self._gaps.clear()
+        self._pending.clear()
+        self._last = None
+
+    def _index_pending(self) -> None:
+        for id, record in self._pending.items():
+            self._names[id] = record.file_name.lower()
+            self._extensions[id] = record.extension.lower()
+            frame_count = self._frame_counts[id] = frame_count_of(record)
+            if has_gaps(record, frame_count):
+                self._gaps.add(id)
+        self._pending.clear()
+
+    def match(self, record_filter: RecordFilter) -> Set[int]:
+        """
+        Get the ids of the records the filter accepts
+        Raises re.error if the filter's regex is invalid.
+        """
+        record_filter.validate()
+        if self._pending:
+            self._index_pending()
+
+        ids: Iterable[int] = self._names
+        if self._last is not None:
+            last_filter, last_ids = self._last
+            if record_filter == last_filter:
+                return set(last_ids)
+            if record_filter.narrows(last_filter):
+                ids = last_ids
+
+        # Cheapest tests first, each one only walks what the previous let through
+        if record_filter.gaps_only:
+            ids = self._gaps.intersection(ids)
+        if record_filter.extensions is not None:
+            extensions, accepted = self._extensions, record_filter.extensions
+            ids = [id for id in ids if extensions[id] in accepted]
+        if record_filter.min_frames > 1:
+            frame_counts, min_frames = self._frame_counts, record_filter.min_frames
+            ids = [id for id in ids if frame_counts[id] >= min_frames]
+        if record_filter.text:
+            names = self._names
+            if record_filter.regex:
+                search = record_filter.pattern.search
+                ids = [id for id in ids if search(names[id])]
+            else:
+                text = record_filter.text.lower()
+                ids = [id for id in ids if text in names[id]]
+
+        result = set(ids)
+        self._last = (record_filter, result)
+        return set(result)
@@ -0,0 +1,294 @@
+"""
+Compact records of scanned files
+
+A scan keeps one FileRecord per sequence, movie or single file instead of a file
+handler. The records of a directory share one directory Path and frame numbers are
+kept as a FrameSet, so a record stays small however many frames it covers. The
+ImageFile handler is only created for the records that are loaded or operated on.
+"""
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from nhp.read_tools.frame_set import FrameSet
+from nhp.read_tools.movie_probe import MovieInfo
+from nhp.read_tools.read_wrapper import (
+    FileHandlerType,
+    ImageFile,
+    LazySequenceFile,
+    MovieFile,
+    SequenceFile,
+    SingleFile,
+)
+from nhp.read_tools.recursive_loader_gui.frame_stats import SequenceStats
+from nhp.read_tools.recursive_loader_gui.image_headers import ImageHeader
+
+
+class FileRecord:
+    """
+    A scanned sequence, movie or single file, read-only
+
+    Answers the same questions as an ImageFile, which is what the tree, the
+    versions and the manifests ask. handler() builds the ImageFile itself.
+    """
+
+    __slots__ = (
+        "id",
+        "kind",
+        "name",
+        "delimiter",
+        "padding",
+        "suffix",
+        "extension",
+        "directory",
+        "frames",
+        "frame_texts",
+        "stats",
+        "header",
+        "movie",
+    )
+
+    def __init__(
+        self,
+        kind: FileHandlerType,
+        directory: Path,
+        name: str,
+        extension: str,
+        frames: FrameSet,
+        delimiter: str = "",
+        padding: int = 0,
+        suffix: str = "",
+        id: Optional[int] = None,
+        stats: Optional[SequenceStats] = None,
+        header: Optional[ImageHeader] = None,
+        movie: Optional[MovieInfo] = None,
+        frame_texts: Optional[Dict[int, str]] = None,
+    ):
+        """
+        Args:
+            kind: SEQUENCE, MOVIE or SINGLE
+            directory: Directory of the file, pass the same Path for every file of a directory
+            name: Prefix of a sequence, stem of any other file
+            extension: Extension without its dot, empty if the file has none
+            frames: Frames of a sequence, range of a movie, empty while it is unknown
+            stats: Frame sizes of a sequence, None unless they were measured
+            header: Image header of the file or of a frame of the sequence, None unless it was read
+            movie: Frame rate and start timecode of a movie, None unless it was probed
+            frame_texts: Listed frame strings of a sequence that padding doesn't rebuild,
+                e.g. the 1 to 9 of an unpadded sequence
+        """
+        self.id = id
+        self.kind = kind
+        self.name = name
+        self.delimiter = delimiter
+        self.padding = padding
+        self.suffix = suffix
+        self.extension = sys.intern(extension)
+        self.directory = directory if isinstance(directory, Path) else Path(directory)
+        self.frames = frames
+        # None rather than an empty dict, almost every sequence is padded throughout
+        self.frame_texts = frame_texts or None
+        self.stats = stats
+        self.header = header
+        self.movie = movie
+
+    def __repr__(self) -> str:
+        return f"FileRecord({self.kind.name}, {str(self.get_path())!r}, id={self.id})"
+
+    @classmethod
+    def from_sequence(
+        cls,
+        sequence: SequenceFile,
+        stats: Optional[SequenceStats] = None,
+        header: Optional[ImageHeader] = None,
+    ) -> "FileRecord":
+        return cls(
+            FileHandlerType.SEQUENCE,
+            sequence.directory,
+            sequence.name,
+            sequence.extension,
+            sequence.frame_set(),
+            sequence.delimiter or "",
+            sequence.padding,
+            sequence.suffix or "",
+            stats=stats,
+            header=header,
+            frame_texts=sequence.frame_texts,
+        )
+
+    @classmethod
+    def from_file_name(
+        cls,
+        directory: Path,
+        file_name: str,
+        kind: FileHandlerType = FileHandlerType.SINGLE,
+        frame_range: Optional[Tuple[int, int]] = None,
+        header: Optional[ImageHeader] = None,
+        movie: Optional[MovieInfo] = None,
+    ) -> "FileRecord":
+        """
+        Record a movie or single file
+        A movie's frame range is unknown, (1, -1), until it has been probed or loaded.
+        """
+        if frame_range is None and movie is not None:
+            frame_range = movie.frame_range
+        if frame_range is None:
+            frame_range = (1, -1) if kind is FileHandlerType.MOVIE else (1, 1)
+        # Split like Path.stem and Path.suffix
+        dot = file_name.rfind(".")
+        if 0 < dot < len(file_name) - 1:
+            name, extension = file_name[:dot], file_name[dot + 1 :]
+        else:
+            name, extension = file_name, ""
+        return cls(
+            kind,
+            directory,
+            name,
+            extension,
+            FrameSet.from_range(*frame_range),
+            header=header,
+            movie=movie,
+        )
+
+    @classmethod
+    def from_image_file(cls, image_file: ImageFile) -> "FileRecord":
+        """Record a file handler, keeping its id"""
+        if isinstance(image_file, MovieFile):
+            movie = None
+            if image_file.frame_rate is not None:
+                movie = MovieInfo(
+                    image_file.frame_count, image_file.frame_rate, image_file.timecode
+                )
+            record = cls.from_file_name(
+                image_file.path.parent,
+                image_file.path.name,
+                FileHandlerType.MOVIE,
+                (image_file.first_frame(), image_file.last_frame()),
+                movie=movie,
+            )
+        elif isinstance(image_file, SingleFile):
+            record = cls.from_file_name(image_file.path.parent, image_file.path.name)
+        elif isinstance(image_file, SequenceFile):
+            record = cls.from_sequence(image_file)
+        else:
+            raise TypeError(f"Cannot record {type(image_file).__name__}")
+        record.id = image_file.id
+        return record
+
+    def handler(self) -> ImageFile:
+        """Create the file handler of the record, nothing is read from disk"""
+        if self.kind is FileHandlerType.SEQUENCE:
+            handler: ImageFile = LazySequenceFile(
+                self.directory,
+                self.name,
+                self.delimiter,
+                self.padding,
+                self.suffix,
+                self.extension,
+                self.frames,
+                self.frame_texts,
+            )
+        elif self.kind is FileHandlerType.MOVIE:
+            handler = MovieFile(self.get_path(), check_exists=False)
+            handler.set_frame_range(self.first_frame(), self.last_frame())
+            if self.movie is not None:
+                handler.frame_rate = self.movie.frame_rate
+                handler.timecode = self.movie.timecode
+        else:
+            handler = SingleFile(self.get_path(), check_exists=False)
+        handler.id = self.id
+        return handler
+
+    @property
+    def file_name(self) -> str:
+        """Name of the file, with the frame number replaced by #s for a sequence"""
+        if self.kind is FileHandlerType.SEQUENCE:
+            padding = "#" * self.padding
+            return f"{self.name}{self.delimiter}{padding}{self.suffix}.{self.extension}"
+        return f"{self.name}.{self.extension}" if self.extension else self.name
+
+    def get_path(self) -> Path:
+        return self.directory / self.file_name
+
+    def get_user_text(self) -> str:
+        if self.kind is FileHandlerType.SEQUENCE:
+            return f"{self.get_path()} {self.first_frame()}-{self.last_frame()}"
+        return str(self.get_path())
+
+    # A movie whose range is unknown answers like MovieFile, 1 to -1
+
+    def first_frame(self) -> int:
+        return self.frames.first if self.frames else 1
+
+    def last_frame(self) -> int:
+        return self.frames.last if self.frames else -1
+
+    def existing_frames(self) -> List[int]:
+        return list(self.frames)
+
+    @property
+    def frame_count(self) -> int:
+        return self.frames.span if self.frames else -1
+
+
+class RecordStore:
+    """
+    The records of a scan by id, in the order they were added
+
+    Handlers are created on first use and kept until their record is replaced or removed.
+    """
+
+    def __init__(self):
+        self._records: Dict[int, FileRecord] = {}
+        self._handlers: Dict[int, ImageFile] = {}
+        self._path_order: Optional[List[FileRecord]] = None
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[FileRecord]:
+        return iter(self._records.values())
+
+    def __getitem__(self, id: int) -> FileRecord:
+        return self._records[id]
+
+    def add(self, record: FileRecord) -> FileRecord:
+        """Assign the next id to a record and store it"""
+        record.id = self._next_id
+        self._records[record.id] = record
+        self._path_order = None
+        self._next_id += 1
+        return record
+
+    def replace(self, old: FileRecord, new: FileRecord) -> FileRecord:
+        """Swap a record for a newer version of it, keeping its id"""
+        new.id = old.id
+        self._records[new.id] = new
+        self._handlers.pop(new.id, None)
+        self._path_order = None
+        return new
+
+    def remove(self, record: FileRecord) -> None:
+        del self._records[record.id]
+        self._handlers.pop(record.id, None)
+        self._path_order = None
+
+    def clear(self) -> None:
+        self._records.clear()
+        self._handlers.clear()
+        self._path_order = None
+        self._next_id = 0
+
+    def handler(self, id: int) -> ImageFile:
+        """Get the file handler of a record, creating it the first time"""
+        handler = self._handlers.get(id)
+        if handler is None:
+            handler = self._handlers[id] = self._records[id].handler()
+        return handler
+
+    def in_path_order(self) -> List[FileRecord]:
+        """Get the records sorted by path, sorted again only after a change"""
+        if self._path_order is None:
+            self._path_order = sorted(self._records.values(), key=lambda x: str(x.get_path()))
+        return self._path_order
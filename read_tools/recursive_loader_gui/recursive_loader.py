@@ -2,6 +2,8 @@ from typing import Optional
 from nhp.read_tools.recursive_loader_gui import view
 from nhp.read_tools.recursive_loader_gui import model
 from nhp.read_tools.recursive_loader_gui import controller
+from nhp.read_tools.recursive_loader_gui import scan_client
+from nhp.read_tools.recursive_loader_gui import scan_index
 from pathlib import Path
 # global to prevent from being removed
 VIEW = None
@@ -19,5 +21,8 @@ def show(path: Optional[Path] = None):
     VIEW.raise_()
     VIEW.show()
     
-    model_ = model.Model()
+    model_ = model.Model(
+        index=scan_index.open_default_index(),
+        daemon_socket=scan_client.default_socket_path(),
+    )
     CONTROLLER = controller.Controller(VIEW, model_, path)  
\ No newline at end of file
@@ -0,0 +1,164 @@
+import getpass
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from nhp.read_tools.recursive_loader_gui import manifest
+from nhp.read_tools.recursive_loader_gui.records import FileRecord
+from nhp.read_tools.recursive_loader_gui.scanner import ScanOptions
+
+PROTOCOL_VERSION = 4
+
+# Only used to notice that a daemon is gone, scans themselves can take minutes
+CONNECT_TIMEOUT = 0.5
+# Overall wait for the daemon's answers, after which the loader scans directly
+QUERY_TIMEOUT = 120.0
+
+
+def default_socket_path() -> Path:
+    """Return the per-user socket of the scan daemon"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(runtime_dir) / f"nhp-scan-daemon-{getpass.getuser()}.sock"
+
+
+def options_to_json(options: ScanOptions) -> dict:
+    return {
+        "extensions": sorted(options.extensions) if options.extensions is not None else None,
+        "ignore": list(options.ignore),
+        "max_depth": options.max_depth,
+        "min_frames": options.min_frames,
+        "follow_symlinks": options.follow_symlinks,
+        "frame_stats": options.frame_stats,
+        "read_headers": options.read_headers,
+        "probe_movies": options.probe_movies,
+    }
+
+
+def options_from_json(data: dict) -> ScanOptions:
+    extensions = data.get("extensions")
+    return ScanOptions(
+        extensions=frozenset(extensions) if extensions is not None else None,
+        ignore=tuple(data.get("ignore", ())),
+        max_depth=data.get("max_depth"),
+        min_frames=data.get("min_frames", 1),
+        follow_symlinks=data.get("follow_symlinks", True),
+        frame_stats=data.get("frame_stats", False),
+        read_headers=data.get("read_headers", False),
+        probe_movies=data.get("probe_movies", True),
+    )
+
+
+def send_message(connection: socket.socket, message: dict) -> None:
+    """Send a message as a single line of JSON"""
+    connection.sendall(json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n")
+
+
+def receive_message(
+    connection: socket.socket,
+    cancel: Optional[threading.Event] = None,
+    deadline: Optional[float] = None,
+) -> Optional[dict]:
+    """
+    Read a single line of JSON
+    Returns None if cancel was set or the connection closed before a full line arrived.
+    Raises TimeoutError if no full line arrived by deadline, a time.monotonic() value.
+    """
+    chunks: List[bytes] = []
+    while True:
+        if cancel is not None and cancel.is_set():
+            return None
+        try:
+            chunk = connection.recv(1 << 20)
+        except socket.timeout:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError("no answer in time") from None
+            continue
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        if chunk.endswith(b"\n"):
+            return json.loads(b"".join(chunks))
+
+
+def query_scan(
+    root: Path,
+    options: ScanOptions,
+    socket_path: Optional[Path] = None,
+    cancel: Optional[threading.Event] = None,
+    timeout: float = QUERY_TIMEOUT,
+) -> Optional[Tuple[Path, List[Path], List[FileRecord], dict[Path, Path]]]:
+    """
+    Ask the scan daemon for the contents of root
+    Args:
+        root: Directory to scan
+        options: Filters applied during the walk
+        socket_path: Socket of the daemon, defaults to default_socket_path()
+        cancel: Optional event that abandons the request when set
+        timeout: Seconds to wait for the answer before giving up on the daemon
+    Returns the root, the scanned directories, the files and the skipped aliases,
+    or None if no daemon is running or the request failed. Callers then scan directly.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+
+    path = Path(socket_path) if socket_path else default_socket_path()
+    deadline = time.monotonic() + timeout
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(CONNECT_TIMEOUT)
+            connection.connect(str(path))
+            send_message(
+                connection,
+                {
+                    "version": PROTOCOL_VERSION,
+                    "root": str(root),
+                    "options": options_to_json(options),
+                },
+            )
+            # Short timeouts so a cancel is noticed while the daemon is walking
+            connection.settimeout(0.1)
+            reply = receive_message(connection, cancel, deadline)
+    except (OSError, ValueError) as e:
+        if path.exists():
+            print(f"scan daemon at {path} unavailable: {e}")
+        return None
+
+    if reply is None:
+        return None
+    if not reply.get("ok"):
+        print(f"scan daemon could not scan {root}: {reply.get('error')}")
+        return None
+
+    try:
+        root, directories, files = manifest.read_manifest(reply["manifest"])
+    except (KeyError, ValueError) as e:
+        print(f"unreadable reply from scan daemon: {e}")
+        return None
+    aliases = {Path(alias): Path(owner) for alias, owner in reply.get("aliases", [])}
+    return root, directories, files, aliases
+
+
+def query_scans(
+    roots: List[Path],
+    options: ScanOptions,
+    socket_path: Optional[Path] = None,
+    cancel: Optional[threading.Event] = None,
+    timeout: float = QUERY_TIMEOUT,
+) -> Optional[List[Tuple[Path, List[Path], List[FileRecord], dict[Path, Path]]]]:
+    """
+    Ask the scan daemon for several roots, returning None unless it answered for all of them
+    The timeout covers all the roots together.
+    """
+    deadline = time.monotonic() + timeout
+    results = []
+    for root in roots:
+        result = query_scan(root, options, socket_path, cancel, deadline - time.monotonic())
+        if result is None:
+            return None
+        results.append(result)
+    return results
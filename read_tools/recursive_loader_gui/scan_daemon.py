@@ -0,0 +1,248 @@
+"""
+Local scan service shared by every Nuke session on a workstation
+
+    python -m nhp.read_tools.recursive_loader_gui.scan_daemon
+
+Loaders ask it for their scans over a Unix socket and scan directly when it is
+not running. Requests for the same root and filters that arrive while a walk is
+running are answered by that walk, and recently used roots are re-walked in the
+background so their index entries and the filer's caches stay warm.
+"""
+import argparse
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from nhp.read_tools.recursive_loader_gui import manifest, scan_client, scan_index, scanner
+from nhp.read_tools.recursive_loader_gui.model import Model
+from nhp.read_tools.recursive_loader_gui.scanner import ScanOptions
+
+DEFAULT_MAX_ROOTS = 8
+DEFAULT_REFRESH_INTERVAL = 60.0
+
+
+class ScanService:
+    """
+    Serves scans through one shared index file, walking each root one at a time
+    Walks of different roots run concurrently, each on its own connection to the index.
+    Args:
+        index: Scan index shared by every walk
+        max_workers: Maximum number of directories listed at the same time
+        max_roots: Number of recently used roots kept warm
+    """
+
+    def __init__(
+        self,
+        index: Optional[scan_index.ScanIndex] = None,
+        max_workers: int = scanner.DEFAULT_MAX_WORKERS,
+        max_roots: int = DEFAULT_MAX_ROOTS,
+    ):
+        self.index = index
+        self.max_workers = max_workers
+        self.max_roots = max_roots
+        # Guards _recent and _walk_locks, never held during a walk
+        self._lock = threading.Lock()
+        # (root, options) -> lock held while that root is walked
+        self._walk_locks: dict[Tuple[str, str], threading.Lock] = {}
+        # (root, options) -> (time the walk finished, options, reply)
+        self._recent: OrderedDict[Tuple[str, str], Tuple[float, ScanOptions, dict]] = OrderedDict()
+
+    def scan(self, root: Path, options: ScanOptions) -> dict:
+        """Return the reply for a scan of root, sharing a walk that was still running when asked"""
+        requested = time.monotonic()
+        key = (str(root), repr(options))
+        with self._walk_lock(key):
+            with self._lock:
+                recent = self._recent.get(key)
+                if recent is not None and recent[0] >= requested:
+                    self._recent.move_to_end(key)
+                    return recent[2]
+            return self._walk(key, root, options)
+
+    def refresh(self) -> None:
+        """Re-walk the recently used roots, requests for other roots are not held up"""
+        with self._lock:
+            keys = list(self._recent)
+        for key in keys:
+            with self._walk_lock(key):
+                with self._lock:
+                    recent = self._recent.get(key)
+                if recent is None:
+                    continue
+                try:
+                    self._walk(key, Path(key[0]), recent[1])
+                except OSError as e:
+                    print(f"dropping {key[0]} from the warm roots: {e}")
+                    with self._lock:
+                        self._recent.pop(key, None)
+
+    def _walk_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._walk_locks.setdefault(key, threading.Lock())
+
+    def _open_index(self) -> Optional[scan_index.ScanIndex]:
+        """Open a connection of its own for a walk, the index tracks one walk at a time"""
+        if self.index is None:
+            return None
+        return scan_index.ScanIndex(self.index.path)
+
+    def _walk(self, key: Tuple[str, str], root: Path, options: ScanOptions) -> dict:
+        index = self._open_index()
+        try:
+            model = Model(self.max_workers, index)
+            model.scan_directory(root, options=options)
+        finally:
+            if index is not None:
+                index.close()
+        reply = {
+            "ok": True,
+            "manifest": manifest.build_manifest(
+                model.current_directory, model.directories, model.get_all_sequences()
+            ),
+            "aliases": [[str(alias), str(owner)] for alias, owner in model.aliases.items()],
+        }
+        with self._lock:
+            self._recent[key] = (time.monotonic(), options, reply)
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_roots:
+                evicted, _ = self._recent.popitem(last=False)
+                self._walk_locks.pop(evicted, None)
+        return reply
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service: ScanService = self.server.service  # type: ignore
+        try:
+            request = scan_client.receive_message(self.request)
+            if request is None:
+                return
+            if request.get("version") != scan_client.PROTOCOL_VERSION:
+                raise ValueError(f"Unsupported protocol version {request.get('version')}")
+            root = Path(request["root"])
+            if not root.is_dir():
+                raise ValueError(f"{root} is not a directory")
+            reply = service.scan(root, scan_client.options_from_json(request["options"]))
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+
+        try:
+            scan_client.send_message(self.request, reply)
+        except OSError:
+            pass  # The loader gave up on the request
+
+
+class ScanServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, service: ScanService):
+        self.service = service
+        super().__init__(str(socket_path), _RequestHandler)
+
+
+def _remove_stale_socket(socket_path: Path) -> None:
+    """Delete a socket left behind by a daemon that died, refusing to replace a live one"""
+    if not socket_path.exists():
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(socket_path))
+        except OSError:
+            socket_path.unlink()
+            return
+    raise RuntimeError(f"A scan daemon is already listening on {socket_path}")
+
+
+def serve(
+    socket_path: Optional[Path] = None,
+    service: Optional[ScanService] = None,
+    refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+) -> None:
+    """
+    Serve scans until interrupted
+    Args:
+        socket_path: Socket to listen on, defaults to scan_client.default_socket_path()
+        service: Service answering the requests, defaults to one on the user's index
+        refresh_interval: Seconds between background walks of the recent roots, 0 disables them
+    """
+    socket_path = Path(socket_path) if socket_path else scan_client.default_socket_path()
+    service = service or ScanService(scan_index.open_default_index())
+    _remove_stale_socket(socket_path)
+
+    stop = threading.Event()
+
+    def keep_warm():
+        while not stop.wait(refresh_interval):
+            service.refresh()
+
+    # Other users must never reach the socket, so it is created private rather than chmodded after
+    umask = os.umask(0o177)
+    try:
+        server = ScanServer(socket_path, service)
+    finally:
+        os.umask(umask)
+
+    with server:
+        if refresh_interval > 0:
+            threading.Thread(target=keep_warm, daemon=True).start()
+        print(f"scan daemon listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            socket_path.unlink(missing_ok=True)
+            if service.index is not None:
+                service.index.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m nhp.read_tools.recursive_loader_gui.scan_daemon",
+        description="Serve directory scans to the Sequence Loaders of this workstation.",
+    )
+    parser.add_argument("--socket", type=Path, help="socket to listen on (default: per user)")
+    parser.add_argument("--index", type=Path, help="scan index file (default: user cache)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=scanner.DEFAULT_MAX_WORKERS,
+        help=f"directories listed at once (default: {scanner.DEFAULT_MAX_WORKERS})",
+    )
+    parser.add_argument(
+        "--max-roots",
+        type=int,
+        default=DEFAULT_MAX_ROOTS,
+        help=f"recently used roots kept warm (default: {DEFAULT_MAX_ROOTS})",
+    )
+    parser.add_argument(
+        "--refresh",
+        type=float,
+        default=DEFAULT_REFRESH_INTERVAL,
+        help=f"seconds between walks of the warm roots, 0 disables them"
+        f" (default: {DEFAULT_REFRESH_INTERVAL:g})",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    index = scan_index.ScanIndex(args.index) if args.index else scan_index.open_default_index()
+    service = ScanService(index, args.workers, args.max_roots)
+    try:
+        serve(args.socket, service, args.refresh)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,422 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from nhp.read_tools.frame_set import FrameSet
+from nhp.read_tools.movie_probe import MovieInfo
+from nhp.read_tools.read_wrapper import FileHandlerType, LazySequenceFile
+from nhp.read_tools.recursive_loader_gui.frame_stats import SequenceStats
+from nhp.read_tools.recursive_loader_gui.image_headers import ImageHeader
+from nhp.read_tools.recursive_loader_gui.records import FileRecord
+from nhp.read_tools.recursive_loader_gui.scanner import ScanNode
+
+# Bump whenever the stored payload changes shape, old indexes are then discarded
+SCHEMA_VERSION = 8
+
+# Tables of what was read from single files, image headers of representative
+# frames and movie probes, by the path and mtime of the file. The types have
+# to_json and from_json.
+FILE_TABLES = {"headers": ImageHeader, "movies": MovieInfo}
+FileValue = Union[ImageHeader, MovieInfo]
+
+DEFAULT_SEARCH_LIMIT = 1000
+
+
+def _encode(node: ScanNode) -> bytes:
+    """
+    Pack the parsed contents of a node as plain strings and frame runs
+    Frame sizes are packed with their sequence, None if they were not measured, and
+    so are the frame strings padding doesn't rebuild.
+    """
+    sequences = [
+        (
+            seq.name,
+            seq.delimiter,
+            seq.padding,
+            seq.suffix,
+            seq.extension,
+            seq.frame_set().runs,
+            _encode_stats(node.stats.get(seq.get_path().name)),
+            seq.frame_texts or None,
+        )
+        for seq in node.sequences
+    ]
+    movs = [path.name for path in node.movs]
+    rogues = [path.name for path in node.rogues]
+    return pickle.dumps((sequences, movs, rogues), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _encode_stats(stats: Optional[SequenceStats]) -> Optional[list]:
+    return stats.to_json() if stats is not None else None
+
+
+def _decode(node: ScanNode, payload: bytes) -> None:
+    """Rebuild the contents of a node packed by _encode"""
+    sequences, movs, rogues = pickle.loads(payload)
+    directory = node.path
+    node.sequences = []
+    node.stats = {}
+    for prefix, delimiter, padding, suffix, extension, runs, stats, frame_texts in sequences:
+        sequence = LazySequenceFile(
+            directory,
+            prefix,
+            delimiter,
+            padding,
+            suffix,
+            extension,
+            FrameSet.from_runs(runs),
+            frame_texts,
+        )
+        node.sequences.append(sequence)
+        if stats is not None:
+            node.stats[sequence.get_path().name] = SequenceStats.from_json(stats)
+    node.movs = [directory / name for name in movs]
+    node.rogues = [directory / name for name in rogues]
+
+
+def _records(node: ScanNode) -> List[tuple]:
+    """Flatten the parsed contents of a node into rows of the files table"""
+    directory = str(node.path)
+    records = [
+        (
+            directory,
+            "sequence",
+            seq.name,
+            seq.delimiter,
+            seq.padding,
+            seq.suffix,
+            seq.extension,
+            json.dumps(seq.frame_set().runs),
+            str(seq.get_path()),
+            json.dumps(sorted(seq.frame_texts.items())) if seq.frame_texts else None,
+        )
+        for seq in node.sequences
+    ]
+    for kind, paths in (("movie", node.movs), ("single", node.rogues)):
+        records.extend(
+            (directory, kind, path.name, "", 0, "", path.suffix.lstrip("."), "[]", str(path), None)
+            for path in paths
+        )
+    return records
+
+
+def _record_to_file(record: tuple) -> FileRecord:
+    """
+    Build the file record of a files table row, without touching the filesystem
+    The row may end with the cached probe of a movie, whatever the movie's mtime is now.
+    """
+    directory, kind, name, delimiter, padding, suffix, extension, frames = record[:8]
+    frame_texts = record[9] if len(record) > 9 else None
+    if kind == "sequence":
+        return FileRecord(
+            FileHandlerType.SEQUENCE,
+            directory,
+            name,
+            extension,
+            FrameSet.from_runs(json.loads(frames)),
+            delimiter,
+            padding,
+            suffix,
+            frame_texts=dict(json.loads(frame_texts)) if frame_texts is not None else None,
+        )
+    if kind == "movie":
+        data = record[10] if len(record) > 10 else None
+        movie = MovieInfo.from_json(json.loads(data)) if data is not None else None
+        return FileRecord.from_file_name(Path(directory), name, FileHandlerType.MOVIE, movie=movie)
+    return FileRecord.from_file_name(Path(directory), name)
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def default_index_path() -> Path:
+    """Return the location of the scan index in the user's cache directory"""
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_dir) / "nhp" / "scan_index.sqlite"
+
+
+class ScanIndex:
+    """
+    Persistent per-directory scan results, keyed by path and directory mtime
+
+    A directory's mtime changes whenever entries are added, removed or renamed,
+    so a matching mtime means the cached listing is still valid.
+
+    Every listed file is also kept as a row of a files table, which search()
+    queries across all indexed roots. Image headers and movie probes are kept by the
+    path and mtime of the file they were read from, files can be rewritten without a
+    listing change.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_index_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Shared by the scan workers, every access goes through the lock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._create_tables()
+
+        self._rows: dict[str, Tuple[int, str, bytes]] = {}
+        self._visited: set[str] = set()
+        self._writes: List[Tuple[str, int, str, bytes]] = []
+        self._records: dict[str, List[tuple]] = {}
+        self._files: dict[str, dict[str, Tuple[int, str]]] = {}
+        self._file_writes: dict[str, List[Tuple[str, str, int, str]]] = {}
+
+    def _create_tables(self) -> None:
+        with self._lock, self._connection:
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                for table in ("directories", "files_search", "files", *FILE_TABLES):
+                    self._connection.execute(f"DROP TABLE IF EXISTS {table}")
+                self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS directories (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    subdirs TEXT NOT NULL,
+                    payload BLOB NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    directory TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    delimiter TEXT NOT NULL,
+                    padding INTEGER NOT NULL,
+                    suffix TEXT NOT NULL,
+                    extension TEXT NOT NULL,
+                    frames TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    frame_texts TEXT
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS files_directory ON files (directory)"
+            )
+            for table in FILE_TABLES:
+                self._connection.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        path TEXT PRIMARY KEY,
+                        directory TEXT NOT NULL,
+                        mtime_ns INTEGER NOT NULL,
+                        data TEXT NOT NULL
+                    )
+                    """
+                )
+                self._connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_directory ON {table} (directory)"
+                )
+            self._fts = self._create_search_table()
+
+    def _create_search_table(self) -> bool:
+        """Create the trigram index of file paths, returning False if this SQLite has no trigram tokenizer"""
+        try:
+            self._connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS files_search"
+                " USING fts5(path, content='files', tokenize='trigram')"
+            )
+        except sqlite3.OperationalError:
+            return False
+        self._connection.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS files_insert AFTER INSERT ON files BEGIN
+                INSERT INTO files_search (rowid, path) VALUES (new.rowid, new.path);
+            END
+            """
+        )
+        self._connection.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS files_delete AFTER DELETE ON files BEGIN
+                INSERT INTO files_search (files_search, rowid, path)
+                VALUES ('delete', old.rowid, old.path);
+            END
+            """
+        )
+        return True
+
+    def begin(self, roots: List[Path]) -> None:
+        """Load every cached directory, image header and movie probe below the roots of a walk"""
+        self._rows = {}
+        self._files = {table: {} for table in FILE_TABLES}
+        for root in roots:
+            root_str = str(root)
+            prefix = root_str.rstrip(os.sep) + os.sep
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT path, mtime_ns, subdirs, payload FROM directories"
+                    " WHERE path = ? OR substr(path, 1, ?) = ?",
+                    (root_str, len(prefix), prefix),
+                ).fetchall()
+                files = {
+                    table: self._connection.execute(
+                        f"SELECT path, mtime_ns, data FROM {table}"
+                        " WHERE directory = ? OR substr(directory, 1, ?) = ?",
+                        (root_str, len(prefix), prefix),
+                    ).fetchall()
+                    for table in FILE_TABLES
+                }
+            self._rows.update(
+                (path, (mtime_ns, subdirs, payload)) for path, mtime_ns, subdirs, payload in rows
+            )
+            for table, file_rows in files.items():
+                self._files[table].update(
+                    (path, (mtime_ns, data)) for path, mtime_ns, data in file_rows
+                )
+        self._visited = set()
+        self._writes = []
+        self._records = {}
+        self._file_writes = {table: [] for table in FILE_TABLES}
+
+    def lookup(self, node: ScanNode, mtime_ns: int) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Fill node from the index if its mtime still matches
+        Returns the cached subdirectory and symlinked subdirectory names, or None on a miss.
+        """
+        key = str(node.path)
+        with self._lock:
+            self._visited.add(key)
+        row = self._rows.get(key)
+        if row is None or row[0] != mtime_ns:
+            return None
+
+        try:
+            _decode(node, row[2])
+        except Exception as e:
+            print(f"discarding unreadable index entry for {key}: {e}")
+            return None
+        subdirs = json.loads(row[1])
+        return subdirs["dirs"], subdirs["links"]
+
+    def store(self, node: ScanNode, mtime_ns: int, dirs: List[str], links: List[str]) -> None:
+        """Queue the freshly parsed contents of a directory for writing"""
+        payload = _encode(node)
+        subdirs = json.dumps({"dirs": dirs, "links": links})
+        records = _records(node)
+        with self._lock:
+            self._writes.append((str(node.path), mtime_ns, subdirs, payload))
+            self._records[str(node.path)] = records
+
+    def lookup_file(self, table: str, path: str, mtime_ns: int) -> Optional[FileValue]:
+        """
+        Get what was read from a file, None unless its mtime still matches
+        Args:
+            table: One of FILE_TABLES, which also names the type returned
+        """
+        row = self._files.get(table, {}).get(path)
+        if row is None or row[0] != mtime_ns:
+            return None
+        return FILE_TABLES[table].from_json(json.loads(row[1]))
+
+    def store_file(self, table: str, path: str, mtime_ns: int, value: FileValue) -> None:
+        """Queue what was freshly read from a file for writing, value is of the table's type"""
+        row = (path, os.path.dirname(path), mtime_ns, json.dumps(value.to_json()))
+        with self._lock:
+            self._file_writes.setdefault(table, []).append(row)
+
+    def end(self, complete: bool) -> None:
+        """
+        Write queued entries to disk
+        Args:
+            complete: True if the whole tree was walked, in which case directories
+                that no longer exist are dropped from the index
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?)", self._writes
+            )
+            self._connection.executemany(
+                "DELETE FROM files WHERE directory = ?", [(path,) for path in self._records]
+            )
+            self._connection.executemany(
+                "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [record for records in self._records.values() for record in records],
+            )
+            for table, file_writes in self._file_writes.items():
+                self._connection.executemany(
+                    f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?)", file_writes
+                )
+            if complete:
+                stale = [(path,) for path in self._rows.keys() - self._visited]
+                self._connection.executemany("DELETE FROM directories WHERE path = ?", stale)
+                self._connection.executemany("DELETE FROM files WHERE directory = ?", stale)
+                for table in FILE_TABLES:
+                    self._connection.executemany(
+                        f"DELETE FROM {table} WHERE directory = ?", stale
+                    )
+            self._rows = {}
+            self._visited = set()
+            self._writes = []
+            self._records = {}
+            self._files = {}
+            self._file_writes = {}
+
+    def search(
+        self, query: str, root: Optional[Path] = None, limit: int = DEFAULT_SEARCH_LIMIT
+    ) -> List[FileRecord]:
+        """
+        Find indexed files whose path contains every whitespace separated term of query
+        Args:
+            query: Terms matched case-insensitively anywhere in the path, e.g. "comp_v042 0120"
+            root: Only return files below this directory
+            limit: Maximum number of files returned
+        Only directories that were scanned are searched, nothing is read from disk.
+        """
+        terms = query.split()
+        if not terms:
+            return []
+
+        # Trigrams can't match terms shorter than three characters
+        if self._fts and all(len(term) >= 3 for term in terms):
+            match = " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+            sql = (
+                "SELECT files.*, movies.data FROM files_search"
+                " JOIN files ON files.rowid = files_search.rowid"
+                " LEFT JOIN movies ON movies.path = files.path"
+                " WHERE files_search MATCH ?"
+            )
+            params: list = [match]
+        else:
+            sql = (
+                "SELECT files.*, movies.data FROM files"
+                " LEFT JOIN movies ON movies.path = files.path WHERE "
+            ) + " AND ".join("files.path LIKE ? ESCAPE '\\'" for _ in terms)
+            params = [_like_pattern(term) for term in terms]
+
+        if root is not None:
+            root_str = str(root)
+            prefix = root_str.rstrip(os.sep) + os.sep
+            sql += " AND (files.directory = ? OR substr(files.directory, 1, ?) = ?)"
+            params.extend((root_str, len(prefix), prefix))
+        sql += " ORDER BY files.path LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            records = self._connection.execute(sql, params).fetchall()
+        return [_record_to_file(record) for record in records]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def open_default_index() -> Optional[ScanIndex]:
+    """Open the user's scan index, scanning still works without one"""
+    try:
+        return ScanIndex()
+    except (OSError, sqlite3.Error) as e:
+        print(f"scan index unavailable: {e}")
+        return None
@@ -0,0 +1,95 @@
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from PySide2 import QtCore  # type: ignore
+from PySide2.QtCore import Signal  # type: ignore
+
+from nhp.read_tools.recursive_loader_gui import scan_client, scanner
+from nhp.read_tools.recursive_loader_gui.scan_index import ScanIndex
+from nhp.read_tools.recursive_loader_gui.scanner import ScanNode, ScanOptions, VisitedDirectories
+
+
+class ScanThread(QtCore.QThread):
+    """
+    Runs a scan of one or more roots off the main thread and emits the nodes in batches
+    If the scan daemon answers for every root, its scans are emitted by scan_loaded instead.
+    Partial walks, given depths or an expand filter, are never asked from the daemon.
+    """
+
+    # Signals
+    batch_ready = Signal(list)
+    scan_loaded = Signal(list)  # (root, directories, files, aliases) per root from the scan daemon
+    scan_failed = Signal(str)
+    scan_finished = Signal(bool)  # True if the scan was cancelled
+
+    def __init__(
+        self,
+        directories: List[Path],
+        max_workers: int = scanner.DEFAULT_MAX_WORKERS,
+        index: Optional[ScanIndex] = None,
+        options: Optional[ScanOptions] = None,
+        visited: Optional[VisitedDirectories] = None,
+        daemon_socket: Optional[Path] = None,
+        batch_interval: float = 0.2,
+        depths: Optional[List[int]] = None,
+        expand: Optional[Callable[[Path, int], bool]] = None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.directories = directories
+        self.max_workers = max_workers
+        self.index = index
+        self.options = options
+        self.visited = visited
+        self.daemon_socket = daemon_socket
+        self.batch_interval = batch_interval
+        self.depths = depths
+        self.expand = expand
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        """Stop the walk, any nodes already listed are still emitted"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def run(self):
+        if self.daemon_socket is not None and self.depths is None and self.expand is None:
+            results = scan_client.query_scans(
+                self.directories, self.options or ScanOptions(), self.daemon_socket, self._cancel
+            )
+            if results is not None:
+                self.scan_loaded.emit(results)
+                self.scan_finished.emit(self.cancelled)
+                return
+
+        batch: List[ScanNode] = []
+        last_emit = time.monotonic()
+
+        try:
+            for node in scanner.iter_scan_roots(
+                self.directories,
+                self.max_workers,
+                self._cancel,
+                self.index,
+                self.options,
+                self.visited,
+                self.depths,
+                self.expand,
+            ):
+                batch.append(node)
+                # Batch by time so the table isn't redrawn for every directory
+                if time.monotonic() - last_emit >= self.batch_interval:
+                    self.batch_ready.emit(batch)
+                    batch = []
+                    last_emit = time.monotonic()
+        except Exception as e:
+            self.scan_failed.emit(str(e))
+
+        if batch:
+            self.batch_ready.emit(batch)
+        self.scan_finished.emit(self.cancelled)
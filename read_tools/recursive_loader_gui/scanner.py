@@ -0,0 +1,459 @@
+import fnmatch
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+
+from nhp.pysequitur.file_types import MOVIE_FILE_TYPES
+from nhp.read_tools import movie_probe
+from nhp.read_tools.movie_probe import MovieInfo
+from nhp.read_tools.read_wrapper import LazySequenceFile
+from nhp.read_tools.recursive_loader_gui import file_reads, frame_stats, grouping, image_headers
+from nhp.read_tools.recursive_loader_gui.frame_stats import SequenceStats
+from nhp.read_tools.recursive_loader_gui.image_headers import ImageHeader
+
+if TYPE_CHECKING:
+    from nhp.read_tools.recursive_loader_gui.scan_index import ScanIndex
+
+# Directory listings are network bound on the filers, so this is deliberately
+# higher than the number of cores
+DEFAULT_MAX_WORKERS = 16
+
+
+@dataclass
+class ScanNode:
+    """
+    A scanned directory, shaped like pysequitur.crawl.Node
+    Sequences are kept as components and frame numbers rather than an Item per frame.
+    Subdirectories the walk was told not to expand are named in unscanned.
+    Frame sizes of the sequences are in stats by file name, when they were measured,
+    image headers of the sequences and rogues in headers, when they were read, and the
+    probes of the movies in movies, when they were probed.
+    """
+    path: Path
+    sequences: List[LazySequenceFile] = field(default_factory=list)
+    movs: List[Path] = field(default_factory=list)
+    rogues: List[Path] = field(default_factory=list)
+    dirs: List["ScanNode"] = field(default_factory=list)
+    parent: Optional["ScanNode"] = None
+    depth: int = 0
+    alias_of: Optional[Path] = None
+    unscanned: List[str] = field(default_factory=list)
+    stats: Dict[str, SequenceStats] = field(default_factory=dict)
+    headers: Dict[str, ImageHeader] = field(default_factory=dict)
+    movies: Dict[str, MovieInfo] = field(default_factory=dict)
+
+
+@dataclass
+class ScanOptions:
+    """
+    Filters applied during the walk, pruned directories are never listed
+    Attributes:
+        extensions: Lowercase extensions to keep, without the dot. None keeps everything
+        ignore: Glob patterns matched against directory and file names
+        max_depth: Deepest directory level to list, the root is 0. None is unlimited
+        min_frames: Sequences and single files with fewer frames are dropped
+        follow_symlinks: Walk into symlinked directories, aliases of directories
+            that were already walked are skipped either way
+        frame_stats: Stat every frame of the sequences to find truncated ones, the
+            sizes are kept in the scan index with the listing
+        read_headers: Read the image header of one frame per sequence and of every
+            single image, headers are kept in the scan index by file mtime
+        probe_movies: Read the frame range, frame rate and start timecode of MOV and
+            MP4 movies from their atoms, probes are kept in the scan index by file mtime
+    """
+    extensions: Optional[frozenset[str]] = None
+    ignore: Tuple[str, ...] = ()
+    max_depth: Optional[int] = None
+    min_frames: int = 1
+    follow_symlinks: bool = True
+    frame_stats: bool = False
+    read_headers: bool = False
+    probe_movies: bool = True
+
+    @property
+    def prunes_directories(self) -> bool:
+        return bool(self.ignore) or self.max_depth is not None or not self.follow_symlinks
+
+    def below(self, depth: int) -> "ScanOptions":
+        """Return the options for a walk started depth levels below the original root"""
+        if self.max_depth is None:
+            return self
+        return replace(self, max_depth=self.max_depth - depth)
+
+    def is_ignored(self, name: str) -> bool:
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.ignore)
+
+    def filter_subdirs(self, names: List[str], links: List[str], depth: int) -> List[str]:
+        """Drop the subdirectories of a directory at depth that must not be walked"""
+        if self.max_depth is not None and depth >= self.max_depth:
+            return []
+        skipped = set() if self.follow_symlinks else set(links)
+        return [name for name in names if name not in skipped and not self.is_ignored(name)]
+
+    def filter_node(self, node: ScanNode) -> None:
+        """Drop the contents of a parsed node that don't pass the filters"""
+        if self.extensions is None and not self.ignore and self.min_frames <= 1:
+            return
+
+        node.sequences = [
+            seq
+            for seq in node.sequences
+            if len(seq.frame_set()) >= self.min_frames
+            and self._keeps_file(seq.get_path().name, seq.extension)
+        ]
+        node.movs = [p for p in node.movs if self._keeps_file(p.name, p.suffix)]
+        if self.min_frames > 1:
+            node.rogues = []
+        else:
+            node.rogues = [p for p in node.rogues if self._keeps_file(p.name, p.suffix)]
+
+    def _keeps_file(self, name: str, extension: str) -> bool:
+        extension = extension.lstrip(".").lower()
+        if self.extensions is not None and extension not in self.extensions:
+            return False
+        return not self.is_ignored(name)
+
+
+class VisitedDirectories:
+    """
+    Thread safe record of the (st_dev, st_ino) of every walked directory
+
+    Symlinks, bind mounts and loops make the same directory reachable through
+    several paths. Only the first path to claim a directory is walked, the
+    others are recorded as aliases of it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths: dict[Tuple[int, int], Path] = {}
+        self.aliases: dict[Path, Path] = {}
+
+    def claim(self, path: Path, stat: os.stat_result) -> Optional[Path]:
+        """Claim a directory for path, returning the path that owns it if it was already walked"""
+        with self._lock:
+            owner = self._paths.setdefault((stat.st_dev, stat.st_ino), path)
+            if owner == path:
+                return None
+            self.aliases[path] = owner
+            return owner
+
+    def forget(self, directory: Path) -> None:
+        """Release a directory and everything below it, after it was removed"""
+        with self._lock:
+            self._paths = {
+                key: path
+                for key, path in self._paths.items()
+                if path != directory and directory not in path.parents
+            }
+            self.aliases = {
+                alias: owner
+                for alias, owner in self.aliases.items()
+                if owner != directory and directory not in owner.parents
+            }
+
+
+def list_directory(path: Path) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Return the sorted file names, subdirectory names and symlinked subdirectory names
+    Entry types come from the d_type of the listing, only symlinks and file
+    systems that don't report it are stat'ed.
+    """
+    files: List[str] = []
+    dirs: List[str] = []
+    links: List[str] = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    dirs.append(entry.name)
+                    if entry.is_symlink():
+                        links.append(entry.name)
+                elif entry.is_file():
+                    files.append(entry.name)
+            except OSError:
+                continue
+    files.sort()
+    dirs.sort()
+    return files, dirs, links
+
+
+def parse_files(node: ScanNode, file_names: List[str]) -> None:
+    """
+    Split the files of a directory into sequences, movies and rogues
+    Names are grouped as plain strings, paths are only built for the results and
+    nothing is stat'ed.
+    """
+    # The whole listing is grouped at once, flat render folders hold hundreds of
+    # thousands of frames that would otherwise be parsed into an Item each
+    node.sequences, others = grouping.group_sequences(file_names, node.path)
+
+    for name in others:
+        if name.rsplit(".", 1)[-1].lower() in MOVIE_FILE_TYPES:
+            node.movs.append(node.path / name)
+        else:
+            node.rogues.append(node.path / name)
+
+
+def _scan_node(
+    node: ScanNode,
+    index: Optional["ScanIndex"] = None,
+    options: Optional[ScanOptions] = None,
+    visited: Optional[VisitedDirectories] = None,
+) -> Tuple[List[str], List[str]]:
+    """Fill a single node and return the names of the subdirectories to walk and of the symlinked ones"""
+    stat = os.stat(node.path)
+    if visited is not None:
+        node.alias_of = visited.claim(node.path, stat)
+        if node.alias_of is not None:
+            return [], []
+
+    # The index holds unfiltered results so it stays valid when the options change
+    measure = options is not None and options.frame_stats
+    dirs, links = _read_node(node, stat.st_mtime_ns, index, measure)
+    if options is None:
+        return dirs, links
+    options.filter_node(node)
+    if options.read_headers:
+        read_node_headers(node, index)
+    if options.probe_movies:
+        probe_node_movies(node, index)
+    return options.filter_subdirs(dirs, links, node.depth), links
+
+
+def _read_node(
+    node: ScanNode, mtime_ns: int, index: Optional["ScanIndex"] = None, measure: bool = False
+) -> Tuple[List[str], List[str]]:
+    """
+    Fill a single node from the index or from disk and return its subdirectory and link names
+    Frame sizes are measured as well if measure is set, unless the index has them already.
+    """
+    if index is not None:
+        # mtime is taken before listing, a change during the listing then shows up next time
+        cached = index.lookup(node, mtime_ns)
+        if cached is not None:
+            if measure and len(node.stats) < len(node.sequences):
+                measure_frames(node)
+                index.store(node, mtime_ns, *cached)
+            return cached
+
+    files, dirs, links = list_directory(node.path)
+    parse_files(node, files)
+    if measure:
+        measure_frames(node)
+    if index is not None:
+        index.store(node, mtime_ns, dirs, links)
+    return dirs, links
+
+
+def measure_frames(node: ScanNode) -> None:
+    """
+    Stat every frame of the sequences of a parsed node into its stats
+    Frames rewritten in place don't change the directory's mtime, so stats kept in
+    the index are only refreshed with the listing.
+    """
+    stats = frame_stats.measure_sequences(node.sequences)
+    node.stats = {seq.get_path().name: seq_stats for seq, seq_stats in zip(node.sequences, stats)}
+
+
+def read_node_headers(node: ScanNode, index: Optional["ScanIndex"] = None) -> None:
+    """
+    Read the image headers of a filtered node into its headers
+    A sequence is represented by its first frame that is not truncated, read under
+    the file name it was listed with.
+    """
+    names: List[str] = []
+    paths: List[str] = []
+    for seq in node.sequences:
+        if seq.extension.lower() not in image_headers.HEADER_EXTENSIONS:
+            continue
+        name = seq.get_path().name
+        frames = seq.frame_set()
+        stats = node.stats.get(name)
+        frame = frames.first
+        if stats is not None and stats.truncated:
+            frame = next((f for f in frames if f not in stats.truncated), frame)
+        names.append(name)
+        paths.append(os.path.join(seq.directory, seq.frame_file_name(frame)))
+    for rogue in node.rogues:
+        if rogue.suffix[1:].lower() in image_headers.HEADER_EXTENSIONS:
+            names.append(rogue.name)
+            paths.append(str(rogue))
+
+    headers = file_reads.read_files(paths, image_headers.read_header, index, "headers")
+    node.headers = {name: header for name, header in zip(names, headers) if header is not None}
+
+
+def probe_node_movies(node: ScanNode, index: Optional["ScanIndex"] = None) -> None:
+    """Probe the movies of a filtered node into its movies"""
+    movs = [mov for mov in node.movs if mov.suffix[1:].lower() in movie_probe.PROBE_EXTENSIONS]
+    paths = [str(mov) for mov in movs]
+    infos = file_reads.read_files(paths, movie_probe.probe_movie, index, "movies")
+    node.movies = {mov.name: info for mov, info in zip(movs, infos) if info is not None}
+
+
+def iter_scan(
+    directory: Path,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    cancel: Optional[threading.Event] = None,
+    index: Optional["ScanIndex"] = None,
+    options: Optional[ScanOptions] = None,
+    visited: Optional[VisitedDirectories] = None,
+) -> Iterator[ScanNode]:
+    """
+    Recursively scan a directory, yielding each node as soon as it is listed
+    Args:
+        directory: Root directory to scan
+        max_workers: Maximum number of directories listed at the same time
+        cancel: Optional event that stops the walk when set
+        index: Optional scan index, only directories whose mtime changed are listed
+        options: Optional filters, pruned subdirectories are never listed
+        visited: Directories walked so far, aliases of them are skipped and recorded
+    Parents are always yielded before their children, so the first node is the root.
+    """
+    return iter_scan_roots([directory], max_workers, cancel, index, options, visited)
+
+
+def iter_scan_roots(
+    directories: List[Path],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    cancel: Optional[threading.Event] = None,
+    index: Optional["ScanIndex"] = None,
+    options: Optional[ScanOptions] = None,
+    visited: Optional[VisitedDirectories] = None,
+    depths: Optional[List[int]] = None,
+    expand: Optional[Callable[[Path, int], bool]] = None,
+) -> Iterator[ScanNode]:
+    """
+    Recursively scan several directories in one walk, sharing the workers, index and visited directories
+    Takes the same arguments as iter_scan, and
+        depths: Level of each directory below the root it was found under, so
+            max_depth still counts from there. Defaults to 0
+        expand: Called with the path and level of each subdirectory, those it
+            rejects are recorded in their parent's unscanned instead of walked.
+            None walks everything
+    Each root is yielded before its children, roots that alias another root are skipped.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+
+    roots = [
+        ScanNode(Path(directory), depth=depths[i] if depths else 0)
+        for i, directory in enumerate(directories)
+    ]
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    if visited is None:
+        visited = VisitedDirectories()
+    complete = False
+
+    if index is not None:
+        index.begin([root.path for root in roots])
+
+    # Workers report completions through a queue, waiting on the pending set
+    # directly gets slower the more directories are queued
+    completed: queue.Queue = queue.Queue()
+    pending: dict[Future, ScanNode] = {}
+    # Symlinked directories are walked last, so the real path of a directory
+    # claims it and the link is the one reported as an alias
+    deferred: List[ScanNode] = []
+
+    def submit(node: ScanNode) -> None:
+        future = pool.submit(_scan_node, node, index, options, visited)
+        pending[future] = node
+        future.add_done_callback(completed.put)
+
+    try:
+        for root in roots:
+            submit(root)
+
+        while pending or deferred:
+            if cancel is not None and cancel.is_set():
+                return
+
+            if not pending:
+                for node in deferred:
+                    submit(node)
+                deferred.clear()
+
+            # Poll so a cancel request is noticed while a slow listing blocks
+            try:
+                future = completed.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            node = pending.pop(future)
+            try:
+                subdirs, links = future.result()
+            except OSError as e:
+                if node.parent is None:
+                    raise
+                print(f"could not scan {node.path}: {e}")
+                continue
+
+            if node.alias_of is not None:
+                if node.parent is not None:
+                    node.parent.dirs.remove(node)
+                continue
+
+            # Children are created here so they keep the sorted listing
+            # order regardless of which worker finishes first
+            for name in subdirs:
+                if expand is not None and not expand(node.path / name, node.depth + 1):
+                    node.unscanned.append(name)
+                    continue
+                child = ScanNode(node.path / name, parent=node, depth=node.depth + 1)
+                node.dirs.append(child)
+                if name in links:
+                    deferred.append(child)
+                else:
+                    submit(child)
+
+            yield node
+
+        complete = True
+    finally:
+        # Don't wait for listings already in flight, just drop the queue
+        pool.shutdown(wait=False, cancel_futures=True)
+        if index is not None:
+            # Pruned and unexpanded directories were not visited but are not gone either
+            pruned = expand is not None or (options is not None and options.prunes_directories)
+            index.end(complete and not pruned)
+
+
+def skip_subdirectories(path: Path, depth: int) -> bool:
+    """Expand filter of a walk that lists its roots without descending"""
+    return False
+
+
+def parallel_scan(
+    directory: Path,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    index: Optional["ScanIndex"] = None,
+    options: Optional[ScanOptions] = None,
+    visited: Optional[VisitedDirectories] = None,
+) -> Optional[ScanNode]:
+    """
+    Recursively scan a directory, listing subdirectories concurrently
+    Args:
+        directory: Root directory to scan
+        max_workers: Maximum number of directories listed at the same time
+        index: Optional scan index, only directories whose mtime changed are listed
+        options: Optional filters, pruned subdirectories are never listed
+        visited: Directories walked so far, aliases of them are skipped and recorded
+    Returns the root node, or None if the directory is an alias of one already in visited.
+    """
+    nodes = iter_scan(directory, max_workers, index=index, options=options, visited=visited)
+    root = next(nodes, None)
+    for _ in nodes:
+        pass
+    return root
+
+
+def traverse_nodes(node: ScanNode) -> Iterator[ScanNode]:
+    """Yield a node and all of its descendants, depth first"""
+    yield node
+    for child in node.dirs:
+        yield from traverse_nodes(child)
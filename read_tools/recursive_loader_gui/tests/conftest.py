@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    QtWidgets = pytest.importorskip("PySide2.QtWidgets")
+    pytest.importorskip("nuke")
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
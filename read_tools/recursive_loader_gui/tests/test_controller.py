@@ -0,0 +1,60 @@
+from nhp.read_tools.recursive_loader_gui.tests.util import make_sequence, wait_for_scan
+
+
+def make_controller(qapp, root, lazy=False):
+    from nhp.read_tools.recursive_loader_gui.controller import Controller
+    from nhp.read_tools.recursive_loader_gui.model import Model
+    from nhp.read_tools.recursive_loader_gui.view import View
+
+    view = View()
+    view.checkbox_lazy.setChecked(lazy)
+    controller = Controller(view, Model(), root)
+    wait_for_scan(qapp, controller)
+    return view, controller
+
+
+def test_filter_edited_during_a_scan_is_applied_once_it_finishes(qapp, tmp_path):
+    make_sequence(tmp_path / "a", "aseq.####.exr", range(1001, 1004))
+    make_sequence(tmp_path / "b", "bseq.####.exr", range(1001, 1004))
+    view, controller = make_controller(qapp, tmp_path)
+
+    # A refresh of an unchanged directory, its diff is empty
+    controller._on_directories_changed([tmp_path / "b"])
+    assert controller._scan_thread is not None
+    view.line_edit_filter.setText("bseq")
+    controller._on_filter_changed()
+    wait_for_scan(qapp, controller)
+
+    assert view.label_status.text() == "1 of 2 files match the filter"
+    assert view.tree_model.rowCount() == 1
+
+
+def test_directory_expanded_during_a_scan_is_listed_once_it_finishes(qapp, tmp_path):
+    make_sequence(tmp_path / "a" / "deep", "deepseq.####.exr", range(1001, 1004))
+    make_sequence(tmp_path / "b", "bseq.####.exr", range(1001, 1004))
+    view, controller = make_controller(qapp, tmp_path, lazy=True)
+    assert controller.model.unscanned_directories == [tmp_path / "a" / "deep"]
+
+    controller._on_directories_changed([tmp_path / "b"])
+    controller._on_directory_expanded(tmp_path / "a" / "deep")
+    wait_for_scan(qapp, controller)
+
+    assert controller.model.unscanned_directories == []
+    assert controller.model.sequence_count == 2
+
+
+def test_stopped_refresh_keeps_its_directories_pending(qapp, tmp_path):
+    make_sequence(tmp_path / "a", "aseq.####.exr", range(1001, 1004))
+    make_sequence(tmp_path / "b", "bseq.####.exr", range(1001, 1004))
+    view, controller = make_controller(qapp, tmp_path)
+
+    make_sequence(tmp_path / "b", "bseq.####.exr", range(1004, 1006))
+    controller._on_directories_changed([tmp_path / "b"])
+    controller._stop_scan()
+    assert controller._pending_refresh == {tmp_path / "b"}
+
+    controller._on_directories_changed([tmp_path / "a"])
+    wait_for_scan(qapp, controller)
+    assert controller._pending_refresh == set()
+    bseq = next(f for f in controller.model.get_all_sequences() if f.directory == tmp_path / "b")
+    assert (bseq.first_frame(), bseq.last_frame()) == (1001, 1005)
@@ -0,0 +1,22 @@
+from nhp.read_tools.recursive_loader_gui import scanner
+from nhp.read_tools.recursive_loader_gui.scanner import VisitedDirectories
+from nhp.read_tools.recursive_loader_gui.tests.util import make_sequence
+
+
+def test_parallel_scan_returns_the_root_node(tmp_path):
+    make_sequence(tmp_path / "shot", "plate.####.exr", range(1001, 1004))
+
+    root = scanner.parallel_scan(tmp_path)
+
+    assert root.path == tmp_path
+    assert [node.path for node in scanner.traverse_nodes(root)] == [tmp_path, tmp_path / "shot"]
+
+
+def test_parallel_scan_of_an_alias_of_a_walked_directory_returns_none(tmp_path):
+    make_sequence(tmp_path / "shot", "plate.####.exr", range(1001, 1004))
+    (tmp_path / "link").symlink_to(tmp_path / "shot")
+    visited = VisitedDirectories()
+    scanner.parallel_scan(tmp_path / "shot", visited=visited)
+
+    assert scanner.parallel_scan(tmp_path / "link", visited=visited) is None
+    assert visited.aliases == {tmp_path / "link": tmp_path / "shot"}
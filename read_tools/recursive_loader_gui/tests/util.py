@@ -0,0 +1,20 @@
+import time
+from pathlib import Path
+from typing import Iterable
+
+
+def make_sequence(directory: Path, name: str, frames: Iterable[int]) -> None:
+    """Write empty frames of name, e.g. "plate.####.exr" """
+    directory.mkdir(parents=True, exist_ok=True)
+    prefix, padding, extension = name.split(".")
+    for frame in frames:
+        (directory / f"{prefix}.{frame:0{len(padding)}d}.{extension}").touch()
+
+
+def wait_for_scan(qapp, controller, timeout: float = 10.0) -> None:
+    """Process events until the controller's scan thread has finished"""
+    deadline = time.monotonic() + timeout
+    while controller._scan_thread is not None:
+        assert time.monotonic() < deadline, "scan did not finish"
+        qapp.processEvents()
+    qapp.processEvents()
@@ -0,0 +1,466 @@
+"""
+Item model of the loader's directory tree
+
+Rows are created from the DirectoryTree one level at a time, when the view first
+expands a directory, and the top level is handed to the view in batches through
+fetchMore. Cells are formatted in data() when the view paints them, nothing is
+stored per cell.
+"""
+import difflib
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Union
+
+from PySide2 import QtCore, QtGui  # type: ignore
+
+from nhp.read_tools.recursive_loader_gui.model import (
+    DirectoryTree,
+    format_frame_details,
+    format_frame_range,
+    format_layers,
+)
+from nhp.read_tools.recursive_loader_gui.records import FileRecord
+
+ID_ROLE = QtCore.Qt.UserRole + 1
+COLUMNS = [
+    "Tree",
+    "Name",
+    "Type",
+    "Range",
+    "Resolution",
+    "Channels",
+    "Pixel Type",
+    "Compression",
+    "Path",
+]
+RANGE_COLUMN = 3
+RESOLUTION_COLUMN = 4
+CHANNELS_COLUMN = 5
+PIXEL_TYPE_COLUMN = 6
+COMPRESSION_COLUMN = 7
+# Filled from the image headers, empty unless they were read
+HEADER_COLUMNS = (RESOLUTION_COLUMN, CHANNELS_COLUMN, PIXEL_TYPE_COLUMN, COMPRESSION_COLUMN)
+PATH_COLUMN = 8
+# Range of sequences with truncated frames
+TRUNCATED_BRUSH = QtGui.QBrush(QtGui.QColor(230, 90, 70))
+# Top level rows handed to the view per fetchMore, the view asks for more as it scrolls
+FETCH_BATCH = 1000
+
+Entry = Union[DirectoryTree, FileRecord]
+
+
+class TreeItem:
+    """A displayed row, a directory node or a file record"""
+
+    __slots__ = ("parent", "row", "key", "node", "record", "children", "subdirs", "files")
+
+    def __init__(
+        self,
+        parent: Optional["TreeItem"],
+        row: int,
+        node: Optional[DirectoryTree] = None,
+        record: Optional[FileRecord] = None,
+    ):
+        self.parent = parent
+        self.row = row
+        self.node = node
+        self.record = record
+        self.key = entry_key(record if record is not None else node)
+        # Rows of a directory, None until the view first asks for them
+        self.children: Optional[List[TreeItem]] = None
+        # Subdirectories and files of node that are shown, taken when the children are created
+        self.subdirs: List[DirectoryTree] = []
+        self.files: List[FileRecord] = []
+
+    def entry_count(self) -> int:
+        """Get the number of rows the directory has, created or not"""
+        return len(self.subdirs) + len(self.files)
+
+    def entry(self, i: int) -> Entry:
+        """Get what row i shows, subdirectories come before files"""
+        if i < len(self.subdirs):
+            return self.subdirs[i]
+        return self.files[i - len(self.subdirs)]
+
+
+def entry_key(entry: Optional[Entry]) -> Union[int, str]:
+    """
+    Identify a row among its siblings
+    A file by its record id, which survives a refresh of its frames, a directory
+    by its name, which it keeps once it is scanned.
+    """
+    if isinstance(entry, FileRecord):
+        return entry.id
+    return entry.name if entry is not None else ""
+
+
+class TreeModel(QtCore.QAbstractItemModel):
+    """
+    Tree of directories and files over a DirectoryTree
+
+    Directories list their subdirectories before their files. A directory that
+    was not scanned yet can be expanded, it gets its rows once it is patched in.
+    With a filter, only the files it lets through and the directories above
+    them are shown, directories that were not scanned yet are hidden.
+    """
+
+    def __init__(self, parent: Optional[QtCore.QObject] = None):
+        super().__init__(parent)
+        self._root = TreeItem(None, 0, DirectoryTree("", ""))
+        self._root.children = []
+        # Created file rows by record id, to refresh a file in place
+        self._file_items: dict[int, TreeItem] = {}
+        # Ids of the records the filter lets through and id() of the nodes
+        # above them, None without a filter
+        self._visible_ids: Optional[Set[int]] = None
+        self._visible_nodes: Optional[Set[int]] = None
+
+    # Qt interface
+
+    def index(
+        self, row: int, column: int, parent: QtCore.QModelIndex = QtCore.QModelIndex()
+    ) -> QtCore.QModelIndex:
+        children = self.item(parent).children
+        if not children or not 0 <= row < len(children) or not 0 <= column < len(COLUMNS):
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, children[row])
+
+    def parent(self, index: QtCore.QModelIndex) -> QtCore.QModelIndex:  # type: ignore
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self._root:
+            return QtCore.QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        children = self.item(parent).children
+        return len(children) if children else 0
+
+    def columnCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return len(COLUMNS)
+
+    def hasChildren(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> bool:
+        item = self.item(parent)
+        node = item.node
+        if node is None or parent.column() > 0:
+            return False
+        if node.unscanned is not None:
+            # Expanding it is what asks for the scan
+            return True
+        if item.children is None:
+            if self._visible_nodes is not None:
+                return id(node) in self._visible_nodes
+            return bool(node.files or node.subdirs)
+        return bool(item.children) or len(item.children) < item.entry_count()
+
+    def canFetchMore(self, parent: QtCore.QModelIndex) -> bool:
+        item = self.item(parent)
+        if item.node is None:
+            return False
+        return item.children is None or len(item.children) < item.entry_count()
+
+    def fetchMore(self, parent: QtCore.QModelIndex) -> None:
+        """Create the rows of a directory, all at once below the top level"""
+        item = self.item(parent)
+        if item.node is None:
+            return
+        if item.children is None:
+            item.children = []
+            self._take_entries(item)
+        start = len(item.children)
+        end = item.entry_count()
+        if item is self._root:
+            end = min(end, start + FETCH_BATCH)
+        if end <= start:
+            return
+        self.beginInsertRows(parent, start, end - 1)
+        item.children.extend(self._create_item(item, i, item.entry(i)) for i in range(start, end))
+        self.endInsertRows()
+
+    def headerData(
+        self, section: int, orientation: QtCore.Qt.Orientation, role: int = QtCore.Qt.DisplayRole
+    ):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index: QtCore.QModelIndex, role: int = QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item: TreeItem = index.internalPointer()
+        if role == QtCore.Qt.DisplayRole:
+            return self._text(item, index.column())
+        if role == ID_ROLE:
+            return item.record.id if item.record is not None else -1
+        if role == QtCore.Qt.ToolTipRole and item.record is not None:
+            # The cells only list the first runs and layers
+            if index.column() == RANGE_COLUMN:
+                return format_frame_details(item.record) or None
+            if index.column() == CHANNELS_COLUMN and item.record.header is not None:
+                return "\n".join(item.record.header.channels) or None
+        if role == QtCore.Qt.ForegroundRole and index.column() == RANGE_COLUMN:
+            record = item.record
+            if record is not None and record.stats is not None and record.stats.truncated:
+                return TRUNCATED_BRUSH
+        return None
+
+    @staticmethod
+    def _text(item: TreeItem, column: int) -> str:
+        """Format one cell"""
+        record = item.record
+        if record is not None:
+            if column == 0:
+                return f"[{record.extension.upper()}]"
+            if column == 1:
+                # Figure spaces for exact width control
+                return record.name.replace(" ", "\u2007")
+            if column == 2:
+                return record.extension.upper()
+            if column == RANGE_COLUMN:
+                return format_frame_range(record)
+            if column == PATH_COLUMN:
+                return str(record.get_path())
+            header = record.header
+            if header is None:
+                return ""
+            if column == RESOLUTION_COLUMN:
+                return header.resolution
+            if column == CHANNELS_COLUMN:
+                return format_layers(header)
+            if column == PIXEL_TYPE_COLUMN:
+                return header.pixel_type
+            return header.compression
+
+        node = item.node
+        if column == 0:
+            return f"{node.name}/"
+        if node.unscanned is not None:
+            if column == RANGE_COLUMN:
+                return "Not Scanned"
+            if column == PATH_COLUMN:
+                return str(node.unscanned)
+        return ""
+
+    # Loader interface
+
+    def item(self, index: QtCore.QModelIndex) -> TreeItem:
+        """Get the item of an index, the invisible root for an invalid one"""
+        return index.internalPointer() if index.isValid() else self._root
+
+    def clear(self) -> None:
+        self.set_tree(None)
+
+    def set_tree(
+        self, tree: Optional[DirectoryTree], visible_ids: Optional[Set[int]] = None
+    ) -> None:
+        """
+        Show a new tree, nothing below the top level is created until it is expanded
+        Args:
+            visible_ids: Ids of the records the filter lets through, None shows every file
+        """
+        self.beginResetModel()
+        self._root = TreeItem(None, 0, tree if tree is not None else DirectoryTree("", ""))
+        self._root.children = []
+        self._set_visible(visible_ids)
+        self._take_entries(self._root)
+        self._file_items.clear()
+        self.endResetModel()
+        self.fetchMore(QtCore.QModelIndex())
+
+    def patch_tree(self, tree: DirectoryTree, visible_ids: Optional[Set[int]] = None) -> None:
+        """
+        Bring the created rows in line with tree, matching them by key level by level
+        Only rows that appeared, vanished or changed are touched, so the selection,
+        the expanded directories and the scroll position survive.
+        Args:
+            visible_ids: Ids of the records the filter lets through, None shows every file
+        """
+        self._root.node = tree
+        self._set_visible(visible_ids)
+        self._patch(self._root, QtCore.QModelIndex())
+
+    def set_filter(self, visible_ids: Optional[Set[int]]) -> None:
+        """Show only the records in visible_ids, or every record for None, by patching the rows"""
+        self.patch_tree(self._root.node, visible_ids)
+
+    def append_directory(self, label: str, files: List[FileRecord]) -> QtCore.QModelIndex:
+        """
+        Add a flat directory at the end of the top level, used while a scan is still running
+        Returns the index of its row, invalid while the top level is not fully fetched.
+        """
+        root = self._root
+        node = DirectoryTree(label, label, files=files)
+        root.node.add_subdir(node)
+        root.subdirs.append(node)
+        row = len(root.subdirs) - 1
+        if len(root.children) != row:
+            # Left for fetchMore
+            return QtCore.QModelIndex()
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        root.children.append(self._create_item(root, row, node))
+        self.endInsertRows()
+        return self.createIndex(row, 0, root.children[row])
+
+    def fetch_top_level(self) -> None:
+        """Create every top level row instead of a batch at a time"""
+        root = self._root
+        if len(root.children) < root.entry_count():
+            self.beginInsertRows(QtCore.QModelIndex(), len(root.children), root.entry_count() - 1)
+            root.children.extend(
+                self._create_item(root, i, root.entry(i))
+                for i in range(len(root.children), root.entry_count())
+            )
+            self.endInsertRows()
+
+    def update_record(self, record: FileRecord) -> None:
+        """Show the newer version of a record, a row that was not created yet needs nothing"""
+        item = self._file_items.get(record.id)
+        if item is None:
+            return
+        item.record = record
+        self.dataChanged.emit(
+            self.createIndex(item.row, 0, item), self.createIndex(item.row, len(COLUMNS) - 1, item)
+        )
+
+    def ids_below(self, items: Iterable[TreeItem]) -> List[int]:
+        """Get the ids of the file items and of every file in or below the directory items"""
+        ids: List[int] = []
+        visible = self._visible_ids
+        for item in items:
+            if item.record is not None:
+                ids.append(item.record.id)
+                continue
+            for node in item.node.walk():
+                ids.extend(
+                    record.id for record in node.files if visible is None or record.id in visible
+                )
+        return list(dict.fromkeys(ids))
+
+    def unscanned_below(self, items: Iterable[TreeItem]) -> List[Path]:
+        """Get the directories at or below the directory items that were not scanned yet"""
+        if self._visible_ids is not None:
+            # Hidden by the filter
+            return []
+        directories: List[Path] = []
+        for item in items:
+            if item.node is None:
+                continue
+            directories.extend(
+                node.unscanned for node in item.node.walk() if node.unscanned is not None
+            )
+        return list(dict.fromkeys(directories))
+
+    # Internals
+
+    def _set_visible(self, visible_ids: Optional[Set[int]]) -> None:
+        """Set the filtered ids and find the nodes with a visible file at or below them"""
+        self._visible_ids = visible_ids
+        if visible_ids is None:
+            self._visible_nodes = None
+            return
+        visible_nodes: Set[int] = set()
+        # Children before their parents
+        for node in reversed(list(self._root.node.walk())):
+            if any(id(subdir) in visible_nodes for subdir in node.subdirs) or any(
+                record.id in visible_ids for record in node.files
+            ):
+                visible_nodes.add(id(node))
+        self._visible_nodes = visible_nodes
+
+    def _take_entries(self, item: TreeItem) -> None:
+        """Take the subdirectories and files a directory shows from its node"""
+        subdirs = sorted(item.node.subdirs, key=lambda x: x.name)
+        if self._visible_ids is None:
+            # The node's own list, which the Model keeps up to date
+            item.subdirs, item.files = subdirs, item.node.files
+            return
+        item.subdirs = [subdir for subdir in subdirs if id(subdir) in self._visible_nodes]
+        item.files = [record for record in item.node.files if record.id in self._visible_ids]
+
+    def _create_item(self, parent: TreeItem, row: int, entry: Entry) -> TreeItem:
+        if isinstance(entry, FileRecord):
+            item = TreeItem(parent, row, record=entry)
+            self._file_items[entry.id] = item
+            return item
+        return TreeItem(parent, row, node=entry)
+
+    def _forget(self, items: Iterable[TreeItem]) -> None:
+        """Drop the removed items and everything created below them from the id lookup"""
+        stack = list(items)
+        while stack:
+            item = stack.pop()
+            if item.record is not None:
+                if self._file_items.get(item.record.id) is item:
+                    del self._file_items[item.record.id]
+            elif item.children:
+                stack.extend(item.children)
+
+    @staticmethod
+    def _renumber(children: List[TreeItem], start: int) -> None:
+        for row in range(start, len(children)):
+            children[row].row = row
+
+    def _patch(self, item: TreeItem, index: QtCore.QModelIndex) -> None:
+        """Patch the created rows below item, whose node was just replaced"""
+        if item.children is None:
+            # Never expanded, its rows will be created from the new node
+            return
+        children = item.children
+        self._take_entries(item)
+        old_keys = [child.key for child in children]
+        new_keys = [subdir.name for subdir in item.subdirs]
+        new_keys.extend(record.id for record in item.files)
+        created = len(children)
+        if new_keys[:created] == old_keys:
+            # Nothing moved, which is the common case and cheap to tell
+            opcodes = [
+                ("equal", 0, created, 0, created),
+                ("insert", created, created, created, len(new_keys)),
+            ]
+        else:
+            opcodes = difflib.SequenceMatcher(None, old_keys, new_keys, autojunk=False).get_opcodes()
+        # Bottom up so the row numbers of the blocks above stay valid
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            if tag == "equal":
+                for child, j in zip(children[i1:i2], range(j1, j2)):
+                    self._patch_child(child, item.entry(j))
+                continue
+
+            at_end = i2 == len(children)
+            if i2 > i1:
+                self.beginRemoveRows(index, i1, i2 - 1)
+                self._forget(children[i1:i2])
+                del children[i1:i2]
+                self._renumber(children, i1)
+                self.endRemoveRows()
+
+            if at_end and item is self._root:
+                # Top level rows past the created ones are left for fetchMore
+                j2 = min(j2, j1 + max(created, FETCH_BATCH) - len(children))
+            if j2 > j1:
+                self.beginInsertRows(index, i1, i1 + j2 - j1 - 1)
+                children[i1:i1] = [
+                    self._create_item(item, row, item.entry(j))
+                    for row, j in enumerate(range(j1, j2), i1)
+                ]
+                self._renumber(children, i1 + j2 - j1)
+                self.endInsertRows()
+
+    def _patch_child(self, child: TreeItem, entry: Entry) -> None:
+        """Swap the entry of a row whose key still matches, refreshing it if it changed"""
+        changed = False
+        if child.record is not None:
+            changed = child.record is not entry
+            child.record = entry
+            self._file_items[entry.id] = child
+        else:
+            changed = (child.node.unscanned is None) != (entry.unscanned is None)
+            child.node = entry
+            self._patch(child, self.createIndex(child.row, 0, child))
+        if changed:
+            self.dataChanged.emit(
+                self.createIndex(child.row, 0, child),
+                self.createIndex(child.row, len(COLUMNS) - 1, child),
+            )
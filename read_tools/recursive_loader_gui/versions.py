@@ -0,0 +1,85 @@
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from nhp.read_tools.recursive_loader_gui.records import FileRecord
+
+# v001, V12, comp_v042... but not the v of words like "prev1" or "dev01"
+VERSION_PATTERN = re.compile(r"(?<![A-Za-z])[vV](\d+)(?!\d)")
+VERSION_PLACEHOLDER = "v#"
+
+
+def parse_version(path: str) -> Optional[Tuple[str, int]]:
+    """
+    Split a path into its element key and version
+    The version is the last version token of the path. Every token is replaced in the
+    key, so comp/v003/comp_v003.####.exr and comp/v004/comp_v004.####.exr share a key.
+    Returns None for unversioned paths.
+    """
+    matches = list(VERSION_PATTERN.finditer(path))
+    if not matches:
+        return None
+    return VERSION_PATTERN.sub(VERSION_PLACEHOLDER, path), int(matches[-1].group(1))
+
+
+class VersionIndex:
+    """The versions of every element of a scan, kept up to date as files come and go"""
+
+    def __init__(self):
+        self._elements: dict[str, dict[int, List[FileRecord]]] = {}
+        # File id -> (element key, version)
+        self._keys: dict[int, Tuple[str, int]] = {}
+
+    def add(self, image_file: FileRecord) -> None:
+        parsed = parse_version(str(image_file.get_path()))
+        if parsed is None:
+            return
+        key, version = parsed
+        self._elements.setdefault(key, {}).setdefault(version, []).append(image_file)
+        self._keys[image_file.id] = parsed
+
+    def remove(self, image_file: FileRecord) -> None:
+        parsed = self._keys.pop(image_file.id, None)
+        if parsed is None:
+            return
+        key, version = parsed
+        versions = self._elements[key]
+        versions[version].remove(image_file)
+        if not versions[version]:
+            del versions[version]
+        if not versions:
+            del self._elements[key]
+
+    def clear(self) -> None:
+        self._elements.clear()
+        self._keys.clear()
+
+    @property
+    def element_count(self) -> int:
+        return len(self._elements)
+
+    def latest(self, image_files: Iterable[FileRecord], count: int = 1) -> List[FileRecord]:
+        """
+        Resolve image_files to the newest versions of their elements
+        Args:
+            image_files: Files picked by the user, any version of an element stands for it
+            count: Number of versions kept per element
+        Unversioned files are kept as they are.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+
+        resolved: List[FileRecord] = []
+        seen: set[str] = set()
+        for image_file in image_files:
+            parsed = self._keys.get(image_file.id)
+            if parsed is None:
+                resolved.append(image_file)
+                continue
+            key = parsed[0]
+            if key in seen:
+                continue
+            seen.add(key)
+            versions = self._elements[key]
+            for version in sorted(versions)[-count:]:
+                resolved.extend(versions[version])
+        return resolved
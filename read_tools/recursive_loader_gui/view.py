@@ -1,80 +1,54 @@
 from PySide2 import QtWidgets, QtCore, QtGui # type: ignore
 from PySide2.QtCore import Signal # type: ignore
+import os
 from pathlib import Path
-from typing import List
-from nhp.read_tools.read_wrapper import ImageFile
+from typing import List, Optional, Set
+from nhp.read_tools.recursive_loader_gui.records import FileRecord
 from .model import DirectoryTree
+from .record_filter import RecordFilter
+from .scanner import ScanOptions
+from .tree_model import COLUMNS, HEADER_COLUMNS, TreeItem, TreeModel
 import nuke
 
-ID_ROLE = QtCore.Qt.UserRole + 1
+# Milliseconds the filter waits for typing to pause before it is applied
+FILTER_DELAY_MS = 200
 
 
 class TreePresenter:
     def __init__(self, view: "View"):
         self.view = view
 
-    def display_tree(self, tree: DirectoryTree) -> None:
-        """Display the directory tree in the view"""
-        self._display_node(tree)
-
-    def _display_node(
-        self, node: DirectoryTree, prefix: str = "", is_last: bool = True
-    ) -> None:
-        """Recursively display a node and its children"""
-        # Skip displaying root directory
-        if node.name:
-            self.view.add_row(
-                self._format_directory(prefix, is_last, node.name),
-                "",  # name
-                "",  # type
-                "",  # range
-                "",  # path
-                -1,
-                selectable=False,
-            )
-
-        # Create new prefix for children
-        new_prefix = prefix
-        if node.name:  # Not for root
-            new_prefix = prefix + ("    " if is_last else "│   ")
-
-        # Process subdirectories first
-        for i, subdir in enumerate(sorted(node.subdirs, key=lambda x: x.name)):
-            is_last_dir = i == len(node.subdirs) - 1
-            is_last_item = is_last_dir and not node.files
-            self._display_node(subdir, new_prefix, is_last_item)
-
-        # Then process files
-        for i, file in enumerate(node.files):
-            is_last_file = i == len(node.files) - 1
-            file_prefix = new_prefix + ("└── " if is_last_file else "├── ")
-
-            if file.id is None:
-                raise ValueError(f"File {file.name} has no id")
-
-            self.view.add_row(
-                f"{file_prefix}[{file.extension.upper()}]",
-                file.name,
-                file.extension.upper(),
-                self._get_frame_range(file),
-                str(file.get_path()),
-                file.id,
-            )
-
-    @staticmethod
-    def _format_directory(prefix: str, is_last: bool, name: str) -> str:
-        """Format a directory name with the appropriate prefix"""
-        return f"{prefix}{'└── ' if is_last else '├── '}{name}/"
-
-    @staticmethod
-    def _get_frame_range(file: ImageFile) -> str:
-        """Get frame range string for an image file"""
-        if file.frame_count > 1:
-            return f"{file.first_frame()}-{file.last_frame()}"
-        elif file.frame_count == -1:
-            return "Unknown"
-        else:
-            return "Single Frame"
+    def display_tree(self, tree: DirectoryTree, visible_ids: Optional[Set[int]] = None) -> None:
+        """
+        Display the directory tree in the view
+        Args:
+            visible_ids: Ids of the files the filter lets through, None shows every file
+        """
+        self.view.tree_model.set_tree(tree, visible_ids)
+
+    def patch_tree(self, tree: DirectoryTree, visible_ids: Optional[Set[int]] = None) -> None:
+        """
+        Bring the displayed rows in line with tree, matching them by key
+        Only rows that appeared, vanished or whose frame range changed are
+        touched, so the selection, expansion and scroll position survive.
+        """
+        self.view.tree_model.patch_tree(tree, visible_ids)
+
+    def filter_tree(self, visible_ids: Optional[Set[int]]) -> None:
+        """Show only the files in visible_ids, None shows every file"""
+        self.view.tree_model.set_filter(visible_ids)
+
+    def display_directory(self, label: str, files: List[FileRecord]) -> None:
+        """Append a flat, expanded directory, used while a scan is still running"""
+        index = self.view.tree_model.append_directory(label, files)
+        if index.isValid():
+            self.view.tree_view.expand(index)
+
+    def update_file(self, file: FileRecord) -> None:
+        """Refresh the frame range shown for a file that is already displayed"""
+        if file.id is None:
+            raise ValueError(f"File {file.name} has no id")
+        self.view.tree_model.update_record(file)
 
 
 class NoMarginDelegate(QtWidgets.QStyledItemDelegate):
@@ -91,10 +65,18 @@ class NoMarginDelegate(QtWidgets.QStyledItemDelegate):
 class View(QtWidgets.QWidget):
     # Signals
     directory_selected = Signal(Path)
+    directory_expanded = Signal(Path)
+    root_added = Signal(Path)
     scan_requested = Signal()
     load_requested = Signal(list)
     cancel_requested = Signal()
     select_all_requested = Signal()
+    manifest_open_requested = Signal(Path)
+    manifest_save_requested = Signal(Path)
+    watch_toggled = Signal(bool)
+    search_requested = Signal(str)
+    filter_changed = Signal()
+    closing = Signal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -107,91 +89,220 @@ class View(QtWidgets.QWidget):
         # Create path selection layout
         path_layout = QtWidgets.QHBoxLayout()
         self.line_edit_path = QtWidgets.QLineEdit()
+        self.line_edit_path.setToolTip(f"Roots to scan, separated by '{os.pathsep}'")
         self.button_browse = QtWidgets.QPushButton("Browse")
+        self.button_add_root = QtWidgets.QPushButton("Add Root")
+        self.button_add_root.setToolTip("Scan another directory into the same list")
         self.button_scan = QtWidgets.QPushButton("Scan")
+        self.checkbox_watch = QtWidgets.QCheckBox("Watch")
+        self.checkbox_watch.setToolTip("Keep the list up to date while files change on disk")
 
         path_layout.addWidget(self.line_edit_path)
         path_layout.addWidget(self.button_browse)
+        path_layout.addWidget(self.button_add_root)
         path_layout.addWidget(self.button_scan)
-
-        # Create table widget
-        self.table = QtWidgets.QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["Tree", "Name", "Type", "Range", "Path"])
-
-        # Configure table properties
-        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
-        self.table.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
-        self.table.verticalHeader().setVisible(False)
-        self.table.setShowGrid(False)
+        path_layout.addWidget(self.checkbox_watch)
+
+        # Create scan options layout, these filters are applied during the walk
+        options_layout = QtWidgets.QHBoxLayout()
+        self.line_edit_extensions = QtWidgets.QLineEdit()
+        self.line_edit_extensions.setPlaceholderText("all")
+        self.line_edit_ignore = QtWidgets.QLineEdit()
+        self.line_edit_ignore.setPlaceholderText("tmp, .cache, _old*")
+        self.spin_max_depth = QtWidgets.QSpinBox()
+        self.spin_max_depth.setRange(-1, 99)
+        self.spin_max_depth.setValue(-1)
+        self.spin_max_depth.setSpecialValueText("Unlimited")
+        self.spin_min_frames = QtWidgets.QSpinBox()
+        self.spin_min_frames.setRange(1, 999999)
+        self.checkbox_follow_symlinks = QtWidgets.QCheckBox("Follow Symlinks")
+        self.checkbox_follow_symlinks.setChecked(True)
+        self.checkbox_frame_stats = QtWidgets.QCheckBox("Frame Sizes")
+        self.checkbox_frame_stats.setToolTip(
+            "Stat every frame to flag truncated ones, sizes are kept in the scan index"
+        )
+        self.checkbox_headers = QtWidgets.QCheckBox("Read Headers")
+        self.checkbox_headers.setToolTip(
+            "Read resolution, channels and compression from one frame per EXR, DPX or TIFF"
+            " sequence"
+        )
+        self.checkbox_movies = QtWidgets.QCheckBox("Probe Movies")
+        self.checkbox_movies.setChecked(True)
+        self.checkbox_movies.setToolTip(
+            "Read the frame range, frame rate and start timecode of MOV and MP4 files"
+        )
+        self.checkbox_lazy = QtWidgets.QCheckBox("Scan on Expand")
+        self.checkbox_lazy.setToolTip(
+            "Only list the top levels, deeper directories are scanned when"
+            " expanded or loaded"
+        )
+
+        options_layout.addWidget(QtWidgets.QLabel("Extensions:"))
+        options_layout.addWidget(self.line_edit_extensions, 1)
+        options_layout.addWidget(QtWidgets.QLabel("Ignore:"))
+        options_layout.addWidget(self.line_edit_ignore, 2)
+        options_layout.addWidget(QtWidgets.QLabel("Max Depth:"))
+        options_layout.addWidget(self.spin_max_depth)
+        options_layout.addWidget(QtWidgets.QLabel("Min Frames:"))
+        options_layout.addWidget(self.spin_min_frames)
+        options_layout.addWidget(self.checkbox_follow_symlinks)
+        options_layout.addWidget(self.checkbox_frame_stats)
+        options_layout.addWidget(self.checkbox_headers)
+        options_layout.addWidget(self.checkbox_movies)
+        options_layout.addWidget(self.checkbox_lazy)
+
+        # Create search layout, searches the scan index instead of walking
+        search_layout = QtWidgets.QHBoxLayout()
+        self.line_edit_search = QtWidgets.QLineEdit()
+        self.line_edit_search.setPlaceholderText("comp_v042 0120")
+        self.line_edit_search.setToolTip(
+            "Find sequences in every directory scanned before, all words must match the path"
+        )
+        self.button_search = QtWidgets.QPushButton("Search")
+
+        search_layout.addWidget(QtWidgets.QLabel("Search Index:"))
+        search_layout.addWidget(self.line_edit_search)
+        search_layout.addWidget(self.button_search)
+
+        # Create filter layout, narrows the list while typing
+        filter_layout = QtWidgets.QHBoxLayout()
+        self.line_edit_filter = QtWidgets.QLineEdit()
+        self.line_edit_filter.setPlaceholderText("comp_v00")
+        self.line_edit_filter.setToolTip("Only show files whose name contains this text")
+        self.checkbox_filter_regex = QtWidgets.QCheckBox("Regex")
+        self.checkbox_filter_regex.setToolTip("Search the file names with a regular expression")
+        self.line_edit_filter_extensions = QtWidgets.QLineEdit()
+        self.line_edit_filter_extensions.setPlaceholderText("all")
+        self.spin_filter_min_frames = QtWidgets.QSpinBox()
+        self.spin_filter_min_frames.setRange(1, 999999)
+        self.checkbox_filter_gaps = QtWidgets.QCheckBox("Has Gaps")
+        self.checkbox_filter_gaps.setToolTip("Only show sequences with missing frames")
+
+        filter_layout.addWidget(QtWidgets.QLabel("Filter:"))
+        filter_layout.addWidget(self.line_edit_filter, 2)
+        filter_layout.addWidget(self.checkbox_filter_regex)
+        filter_layout.addWidget(QtWidgets.QLabel("Extensions:"))
+        filter_layout.addWidget(self.line_edit_filter_extensions, 1)
+        filter_layout.addWidget(QtWidgets.QLabel("Min Frames:"))
+        filter_layout.addWidget(self.spin_filter_min_frames)
+        filter_layout.addWidget(self.checkbox_filter_gaps)
+
+        # Applied once typing pauses rather than on every key
+        self._filter_timer = QtCore.QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DELAY_MS)
+        self._filter_timer.timeout.connect(self.filter_changed.emit)
+
+        # Create tree view, its rows are created by the model as directories are expanded
+        self.tree_model = TreeModel(self)
+        self.tree_view = QtWidgets.QTreeView()
+        self.tree_view.setModel(self.tree_model)
+
+        # Configure tree properties
+        self.tree_view.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.tree_view.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        # Every row is as high as the first, so the view never measures the others
+        self.tree_view.setUniformRowHeights(True)
 
         # Set custom delegate to remove margins
-        delegate = NoMarginDelegate(self.table)
-        self.table.setItemDelegate(delegate)
+        delegate = NoMarginDelegate(self.tree_view)
+        self.tree_view.setItemDelegate(delegate)
 
         # Set spacing and margins
-        self.table.setContentsMargins(0, 0, 0, 0)
-        self.table.setStyleSheet("""
-            QTableWidget {
-                gridline-color: transparent;
+        self.tree_view.setContentsMargins(0, 0, 0, 0)
+        self.tree_view.setStyleSheet("""
+            QTreeView {
                 spacing: 0px;
             }
-            QTableWidget::item {
+            QTreeView::item {
                 padding: 0px;
                 margin: 0px;
                 border: none;
             }
         """)
 
-        # Adjust row height
-        self.table.verticalHeader().setDefaultSectionSize(20)  # Compact rows
-
         # Set font
         font = QtGui.QFont("Courier")
         font.setStyleHint(QtGui.QFont.Monospace)
-        self.table.setFont(font)
+        self.tree_view.setFont(font)
 
-        header = self.table.horizontalHeader()
+        header = self.tree_view.header()
+        # The header would check every row of a fully selected column, through the model,
+        # only to style its sections, it gets a selection of its own that stays empty
+        header.setSelectionModel(QtCore.QItemSelectionModel(self.tree_model, header))
         header.setSectionResizeMode(0, QtWidgets.QHeaderView.Interactive)
         header.setSectionResizeMode(1, QtWidgets.QHeaderView.Interactive)
         header.setSectionResizeMode(2, QtWidgets.QHeaderView.Interactive)
 
         # Set initial column widths
-        self.table.setColumnWidth(0, 400)  # Tree
-        self.table.setColumnWidth(1, 200)  # Name
-        self.table.setColumnWidth(2, 50)  # Type
-        self.table.setColumnWidth(3, 100)  # Range
-        self.table.setColumnWidth(4, 500)  # Path
+        widths = (400, 200, 50, 260, 90, 200, 70, 80, 500)
+        for column, width in zip(range(len(COLUMNS)), widths):
+            self.tree_view.setColumnWidth(column, width)
+        self._show_header_columns(False)
 
         # Create button layout
         button_layout = QtWidgets.QHBoxLayout()
         self.button_select_all = QtWidgets.QPushButton("Select All")
+        self.button_open_manifest = QtWidgets.QPushButton("Open Manifest")
+        self.button_save_manifest = QtWidgets.QPushButton("Save Manifest")
+        self.label_status = QtWidgets.QLabel()
+        self.combo_load_versions = QtWidgets.QComboBox()
+        self.combo_load_versions.addItems(["All Versions", "Latest Only", "Latest N"])
+        self.combo_load_versions.setToolTip(
+            "Versions created for the selection, the latest modes load the newest"
+            " versions of each selected element, wherever they are in the list"
+        )
+        self.spin_latest_count = QtWidgets.QSpinBox()
+        self.spin_latest_count.setRange(1, 999)
+        self.spin_latest_count.setValue(2)
+        self.spin_latest_count.setEnabled(False)
         self.button_load = QtWidgets.QPushButton("Load")
         self.button_cancel = QtWidgets.QPushButton("Cancel")
 
         button_layout.addWidget(self.button_select_all)
+        button_layout.addWidget(self.button_open_manifest)
+        button_layout.addWidget(self.button_save_manifest)
+        button_layout.addWidget(self.label_status)
         button_layout.addStretch()
+        button_layout.addWidget(self.combo_load_versions)
+        button_layout.addWidget(self.spin_latest_count)
         button_layout.addWidget(self.button_load)
         button_layout.addWidget(self.button_cancel)
 
         # Add all layouts to main layout
         main_layout.addLayout(path_layout)
-        main_layout.addWidget(self.table)
+        main_layout.addLayout(options_layout)
+        main_layout.addLayout(search_layout)
+        main_layout.addLayout(filter_layout)
+        main_layout.addWidget(self.tree_view)
         main_layout.addLayout(button_layout)
 
         # Connect signals
         self.button_browse.clicked.connect(self._on_browse_clicked)
+        self.button_add_root.clicked.connect(self._on_add_root_clicked)
         self.button_scan.clicked.connect(self._on_scan_clicked)
+        self.button_search.clicked.connect(self._on_search_clicked)
+        self.line_edit_search.returnPressed.connect(self._on_search_clicked)
         self.button_select_all.clicked.connect(self._on_select_all_clicked)
+        self.button_open_manifest.clicked.connect(self._on_open_manifest_clicked)
+        self.button_save_manifest.clicked.connect(self._on_save_manifest_clicked)
         self.button_load.clicked.connect(self._on_load_clicked)
         self.button_cancel.clicked.connect(self._on_cancel_clicked)
+        self.tree_view.expanded.connect(self._on_expanded)
+        self.checkbox_watch.toggled.connect(self.watch_toggled.emit)
+        self.line_edit_filter.textChanged.connect(self._on_filter_edited)
+        self.checkbox_filter_regex.toggled.connect(self._on_filter_edited)
+        self.line_edit_filter_extensions.textChanged.connect(self._on_filter_edited)
+        self.spin_filter_min_frames.valueChanged.connect(self._on_filter_edited)
+        self.checkbox_filter_gaps.toggled.connect(self._on_filter_edited)
+        self.checkbox_headers.toggled.connect(self._show_header_columns)
+        self.combo_load_versions.currentIndexChanged.connect(
+            lambda index: self.spin_latest_count.setEnabled(index == 2)
+        )
 
         # Set minimum size
         self.setMinimumSize(1400, 800)
 
-        # self.__row_counter = 0
-        self.id_lookup: dict[int, int] = {}
-
     def _on_browse_clicked(self):
         """Handle browse button click"""
         directory = Path(nuke.getFilename("Select Directory")) # type: ignore
@@ -208,14 +319,52 @@ class View(QtWidgets.QWidget):
             self.directory_selected.emit(directory)
         
 
+    def _on_add_root_clicked(self):
+        """Handle add root button click"""
+        filename = nuke.getFilename("Add Root")  # type: ignore
+        if not filename:
+            return
+        directory = Path(filename)
+        if not directory.is_dir():
+            directory = directory.parent
+        if directory.is_dir():
+            self.root_added.emit(directory)
+
     def _on_scan_clicked(self):
         """Handle scan button click"""
         self.scan_requested.emit()
 
+    def _on_search_clicked(self):
+        """Handle search button click"""
+        query = self.line_edit_search.text().strip()
+        if query:
+            self.search_requested.emit(query)
+
+    def _show_header_columns(self, show: bool) -> None:
+        """The header columns stay empty unless headers are read, they are hidden until then"""
+        for column in HEADER_COLUMNS:
+            self.tree_view.setColumnHidden(column, not show)
+
+    def _on_filter_edited(self, *args):
+        """Restart the wait for typing to pause"""
+        self._filter_timer.start()
+
     def _on_select_all_clicked(self):
         """Handle select all button click"""
         self.select_all_requested.emit()
 
+    def _on_open_manifest_clicked(self):
+        """Handle open manifest button click"""
+        filename = nuke.getFilename("Open Manifest", "*.json *.json.gz")  # type: ignore
+        if filename and Path(filename).is_file():
+            self.manifest_open_requested.emit(Path(filename))
+
+    def _on_save_manifest_clicked(self):
+        """Handle save manifest button click"""
+        filename = nuke.getFilename("Save Manifest", "*.json *.json.gz", type="save")  # type: ignore
+        if filename:
+            self.manifest_save_requested.emit(Path(filename))
+
     def _on_load_clicked(self):
         """Handle load button click"""
         self.load_requested.emit(self.get_selected_ids())
@@ -224,44 +373,30 @@ class View(QtWidgets.QWidget):
         """Handle cancel button click"""
         self.cancel_requested.emit()
 
-    def clear_list(self):
-        """Clear the table"""
-        self.table.setRowCount(0)
+    def _on_expanded(self, index: QtCore.QModelIndex):
+        """Scan a directory that was not scanned yet when it is expanded"""
+        node = self.tree_model.item(index).node
+        if node is not None and node.unscanned is not None:
+            self.directory_expanded.emit(node.unscanned)
+
+    def closeEvent(self, event):
+        """Let the controller stop any running scan before the window goes away"""
+        self.closing.emit()
+        super().closeEvent(event)
+
+    def set_scanning(self, scanning: bool):
+        """Toggle the widgets that must not be used while a scan is running"""
+        self.button_scan.setEnabled(not scanning)
+        self.button_browse.setEnabled(not scanning)
+        self.button_add_root.setEnabled(not scanning)
+        self.button_load.setEnabled(not scanning)
+        self.button_open_manifest.setEnabled(not scanning)
+        self.button_save_manifest.setEnabled(not scanning)
+        self.button_cancel.setToolTip("Stop the scan" if scanning else "Close the window")
 
-    def add_row(
-        self,
-        tree: str,
-        name: str,
-        type: str,
-        range: str,
-        path: str,
-        id: int,
-        selectable: bool = True,
-    ) -> list[QtWidgets.QTableWidgetItem]:
-        """Add a row to the table"""
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-
-        # Replace regular spaces with figure spaces for exact width control
-        name = name.replace(" ", "\u2007")
-
-        items = [
-            QtWidgets.QTableWidgetItem(tree),
-            QtWidgets.QTableWidgetItem(name),
-            QtWidgets.QTableWidgetItem(type),
-            QtWidgets.QTableWidgetItem(range),
-            QtWidgets.QTableWidgetItem(path),
-        ]
-
-        for col, item in enumerate(items):
-            if not selectable:
-                item.setFlags(item.flags() & ~QtCore.Qt.ItemIsSelectable)
-            self.table.setItem(row, col, item)
-            if col == 0:
-                item.setData(ID_ROLE, id)
-            self.table.setItem(row, col, item)
-        
-        return items
+    def clear_list(self):
+        """Clear the tree"""
+        self.tree_model.clear()
 
     def set_path_text(self, path: str):
         """Set the path display text"""
@@ -272,6 +407,59 @@ class View(QtWidgets.QWidget):
         """Get the path text"""
         return self.line_edit_path.text()
 
+    def get_paths(self) -> List[Path]:
+        """Get the roots in the path text, in order and without duplicates"""
+        paths = [Path(p.strip()) for p in self.get_path_text().split(os.pathsep) if p.strip()]
+        return list(dict.fromkeys(paths))
+
+    def set_paths(self, paths: List[Path]):
+        self.set_path_text(os.pathsep.join(str(path) for path in paths))
+
+    def get_scan_options(self) -> ScanOptions:
+        """Get the scan filters entered by the user"""
+        extensions = self._split_list(self.line_edit_extensions.text())
+        max_depth = self.spin_max_depth.value()
+        return ScanOptions(
+            extensions=frozenset(e.lstrip(".").lower() for e in extensions) or None,
+            ignore=tuple(self._split_list(self.line_edit_ignore.text())),
+            max_depth=None if max_depth < 0 else max_depth,
+            min_frames=self.spin_min_frames.value(),
+            follow_symlinks=self.checkbox_follow_symlinks.isChecked(),
+            frame_stats=self.checkbox_frame_stats.isChecked(),
+            read_headers=self.checkbox_headers.isChecked(),
+            probe_movies=self.checkbox_movies.isChecked(),
+        )
+
+    def get_record_filter(self) -> RecordFilter:
+        """Get the list filter entered by the user"""
+        extensions = self._split_list(self.line_edit_filter_extensions.text())
+        return RecordFilter(
+            text=self.line_edit_filter.text().strip(),
+            regex=self.checkbox_filter_regex.isChecked(),
+            extensions=frozenset(e.lstrip(".").lower() for e in extensions) or None,
+            min_frames=self.spin_filter_min_frames.value(),
+            gaps_only=self.checkbox_filter_gaps.isChecked(),
+        )
+
+    @staticmethod
+    def _split_list(text: str) -> List[str]:
+        """Split comma or space separated user input"""
+        return [part for part in text.replace(",", " ").split() if part]
+
+    def get_latest_count(self) -> Optional[int]:
+        """Get how many versions per element to load, None loads every selected version"""
+        mode = self.combo_load_versions.currentIndex()
+        if mode == 0:
+            return None
+        if mode == 1:
+            return 1
+        return self.spin_latest_count.value()
+
+    def set_status(self, text: str, details: str = ""):
+        """Show a one line status next to the buttons"""
+        self.label_status.setText(text)
+        self.label_status.setToolTip(details)
+
     def show_error(self, message: str):
         """Show error message to user"""
         QtWidgets.QMessageBox.critical(self, "Error", message)
@@ -281,22 +469,34 @@ class View(QtWidgets.QWidget):
         QtWidgets.QMessageBox.information(self, "Info", message)
 
     def select_all(self):
-        """Select all selectable items"""
-        self.table.selectAll()
-
-    def get_selected_indices(self) -> List[int]:
-        """Get indices of selected rows"""
-        selected_ranges = self.table.selectedRanges()
-        selected_rows = set()
-        for range_ in selected_ranges:
-            for row in range(range_.topRow(), range_.bottomRow() + 1):
-                # Check if the item in the first column is selectable
-                item = self.table.item(row, 0)
-                if item and item.flags() & QtCore.Qt.ItemIsSelectable:
-                    selected_rows.add(row)
-        return list(selected_rows)
+        """
+        Select every top level row, a selected directory stands for everything below it
+        One range instead of QTreeView.selectAll, which selects every expanded row one by one.
+        """
+        self.tree_model.fetch_top_level()
+        rows = self.tree_model.rowCount()
+        if not rows:
+            return
+        selection = QtCore.QItemSelection(
+            self.tree_model.index(0, 0),
+            self.tree_model.index(rows - 1, self.tree_model.columnCount() - 1),
+        )
+        self.tree_view.selectionModel().select(
+            selection, QtCore.QItemSelectionModel.ClearAndSelect | QtCore.QItemSelectionModel.Rows
+        )
+
+    def get_selected_items(self) -> List[TreeItem]:
+        """Get the items of the selected rows, taken a selection range at a time"""
+        items: List[TreeItem] = []
+        for selection_range in self.tree_view.selectionModel().selection():
+            children = self.tree_model.item(selection_range.parent()).children or []
+            items.extend(children[selection_range.top() : selection_range.bottom() + 1])
+        return items
 
     def get_selected_ids(self) -> List[int]:
-        """Get IDs of selected rows"""
-        selected_rows = self.get_selected_indices()
-        return [self.table.item(row, 0).data(ID_ROLE) for row in selected_rows]
+        """Get the ids of the selected files and of the files below the selected directories"""
+        return self.tree_model.ids_below(self.get_selected_items())
+
+    def get_selected_directories(self) -> List[Path]:
+        """Get the selected directories, and those below them, that were not scanned yet"""
+        return self.tree_model.unscanned_below(self.get_selected_items())